@@ -0,0 +1,84 @@
+import os
+
+SC_SERVER_URL = os.getenv("SC_SERVER_URL", "ws://localhost:8090/ws_json")
+
+# Сколько конструкций одновременно обрабатывается в одном процессе
+SC_MAX_CONCURRENT_CONSTRUCTIONS = int(os.getenv("SC_MAX_CONCURRENT_CONSTRUCTIONS", "4"))
+
+# Пул соединений с sc-server: сколько запросов одновременно держат соединение
+SC_POOL_SIZE = int(os.getenv("SC_POOL_SIZE", str(SC_MAX_CONCURRENT_CONSTRUCTIONS)))
+# Сколько секунд запрос ждёт свободное соединение
+SC_POOL_MAX_WAIT = float(os.getenv("SC_POOL_MAX_WAIT", "30"))
+# Период фоновой проверки соединения, секунды
+SC_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("SC_POOL_HEALTH_CHECK_INTERVAL", "10"))
+# Экспоненциальная задержка между попытками переподключения, секунды
+SC_RECONNECT_BACKOFF_BASE = float(os.getenv("SC_RECONNECT_BACKOFF_BASE", "0.5"))
+SC_RECONNECT_BACKOFF_MAX = float(os.getenv("SC_RECONNECT_BACKOFF_MAX", "30"))
+# Точки, фигуры и структура конструкции - анонимные узлы запроса с именем через nrel_scoped_idtf
+# (одинаковые имена в параллельных запросах не смешиваются, поиск сравнивает задачи по именам);
+# false - общие узлы по системным идентификаторам. Числа величин общие в обоих режимах
+SC_REQUEST_SCOPED = os.getenv("SC_REQUEST_SCOPED", "true").lower() in ("1", "true", "yes")
+
+# Кэш результатов разбора одинаковых конструкций
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+# Время жизни записи, секунды
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "86400"))
+# Файл SQLite для кэша, переживающего перезапуск; пустое значение - только память
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")
+
+# Асинхронные задания: число воркеров, размер очереди и время хранения результата (секунды)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(SC_MAX_CONCURRENT_CONSTRUCTIONS)))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+# Пул процессов агентов (server.py): число процессов и стратегия распределения действий
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "1"))
+AGENT_DISPATCH = os.getenv("AGENT_DISPATCH", "least_loaded")  # least_loaded или round_robin
+# Максимальная задержка перезапуска упавшего процесса, секунды
+AGENT_WORKER_RESTART_BACKOFF_MAX = float(os.getenv("AGENT_WORKER_RESTART_BACKOFF_MAX", "30"))
+# Сколько при старте ждать сигнала готовности процессов агентов, секунды
+AGENT_WORKER_READY_TIMEOUT = float(os.getenv("AGENT_WORKER_READY_TIMEOUT", "30"))
+
+# Завершение агентов отслеживается по событиям sc-server; опрос с этим периодом - запасной вариант, секунды
+AGENT_RESULT_FALLBACK_POLL_INTERVAL = float(os.getenv("AGENT_RESULT_FALLBACK_POLL_INTERVAL", "5"))
+
+# Общий бюджет времени запроса на загрузку и всю цепочку агентов, секунды; параметр timeout
+# запроса может его уменьшить или увеличить до REQUEST_DEADLINE_MAX
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "300"))
+REQUEST_DEADLINE_MAX = float(os.getenv("REQUEST_DEADLINE_MAX", "900"))
+
+# Режим запуска агентов: fused - одно действие action_solve_geometry_construction,
+# chain - три отдельных действия (поиск, извлечение, парсинг; удобно для отладки)
+AGENT_PIPELINE_MODE = os.getenv("AGENT_PIPELINE_MODE", "fused")
+
+# Сколько решений (найденных задач) разбирать на одну конструкцию: верхняя граница параметра max_solutions
+MAX_SOLUTIONS_LIMIT = int(os.getenv("MAX_SOLUTIONS_LIMIT", "10"))
+# Сколько найденных задач агент пайплайна извлекает и разбирает одновременно
+AGENT_SOLUTION_WORKERS = int(os.getenv("AGENT_SOLUTION_WORKERS", "4"))
+# Индекс задач агента поиска обновляется по событиям; полная перестройка не реже этого периода
+# (подхватывает изменения содержимого структур задач), секунды; 0 - только по событиям
+TASK_INDEX_REBUILD_INTERVAL = float(os.getenv("TASK_INDEX_REBUILD_INTERVAL", "300"))
+# Сколько структур-кандидатов держать в памяти для локального сопоставления паттернов; 0 - не кэшировать
+TASK_GRAPH_CACHE_SIZE = int(os.getenv("TASK_GRAPH_CACHE_SIZE", "1000"))
+# Отсев кандидатов по числам элементов каждого класса и отношения: counts - не меньше, чем во входе,
+# presence - только наличие, off - без отсева
+TASK_SIGNATURE_PREFILTER = os.getenv("TASK_SIGNATURE_PREFILTER", "counts")
+
+# Хранилище заданий pipeline_runner: число записей, объём результатов (байты), срок хранения (секунды)
+PIPELINE_JOB_MAX_ENTRIES = int(os.getenv("PIPELINE_JOB_MAX_ENTRIES", "1000"))
+PIPELINE_JOB_MAX_BYTES = int(os.getenv("PIPELINE_JOB_MAX_BYTES", str(256 * 1024 * 1024)))
+PIPELINE_JOB_TTL = float(os.getenv("PIPELINE_JOB_TTL", "3600"))
+# SQLite-файл заданий (общий для воркеров uvicorn и переживающий перезапуск); пусто - только память
+PIPELINE_JOB_STORE_PATH = os.getenv("PIPELINE_JOB_STORE_PATH", "")
+
+# Пайплайны pipeline_runner: число потоков, длина очереди ожидания и подсказка Retry-After (секунды) при отказе
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", str(SC_MAX_CONCURRENT_CONSTRUCTIONS)))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "50"))
+PIPELINE_RETRY_AFTER = int(os.getenv("PIPELINE_RETRY_AFTER", "10"))
+
+# Удаление временных элементов запросов из sc-памяти (действия, результаты, анонимные меры)
+SC_GC_ENABLED = os.getenv("SC_GC_ENABLED", "true").lower() in ("1", "true", "yes")
+# Период поиска временных элементов без владельца (0 - не искать; при нескольких процессах
+# искать только в одном) и их возраст до удаления, секунды
+SC_GC_SWEEP_INTERVAL = float(os.getenv("SC_GC_SWEEP_INTERVAL", "600"))
+SC_GC_ORPHAN_TTL = float(os.getenv("SC_GC_ORPHAN_TTL", "3600"))
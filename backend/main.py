@@ -1,8 +1,15 @@
+import asyncio
 from fastapi import FastAPI
-from services.endpoints import upload_construction
+from services.endpoints import upload_construction, get_job_status, get_job_result, stream_job_events, cancel_job
+from services.keynode_registry import KeynodeRegistry
+from services.async_sc_adapter import AsyncSCAdapter
+from services.sc_connection_pool import ScConnectionPool
+from services.result_cache import ResultCache
+from services.job_manager import JobManager
+from services.agent_worker_pool import AgentWorkerPool
+from services.action_completion import ActionCompletionNotifier
+from services.sc_garbage_collector import ScGarbageCollector
 from contextlib import asynccontextmanager
-import subprocess
-import sys
 
 # Описание для Swagger
 description = """
@@ -33,21 +40,37 @@ tags_metadata = [
     {
         "name": "validation", 
         "description": "Валидация геометрических данных",
+    },
+    {
+        "name": "admin",
+        "description": "Служебные операции",
     }
 ]
 
-server_process = None
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("Geometry Construction API started")
-    global server_process
-    server_process = subprocess.Popen([sys.executable, "server.py"])
+    # Агенты работают в пуле процессов server.py (AGENT_WORKERS) под супервизором
+    AgentWorkerPool.instance().start()
+    # Соединение с sc-server открывается один раз и переиспользуется всеми запросами
+    ScConnectionPool.instance().start()
+    # Запросы принимаются, когда агенты зарегистрированы (сигнал от server.py, не дольше AGENT_WORKER_READY_TIMEOUT);
+    # без сигнала запуск прерывается, как и в pipeline_runner
+    if not await asyncio.to_thread(AgentWorkerPool.instance().wait_ready):
+        AgentWorkerPool.instance().stop()
+        ScConnectionPool.instance().stop()
+        raise RuntimeError("Agent workers did not report readiness, startup aborted")
+    # Временные элементы запросов удаляются в фоне, сироты - периодической очисткой
+    ScGarbageCollector.instance().start()
+    JobManager.instance().start()
     yield
-    if server_process:
-        server_process.terminate()
-        server_process.wait()
+    await JobManager.instance().stop()
+    AsyncSCAdapter.shutdown()
+    ScGarbageCollector.instance().stop()
+    ActionCompletionNotifier.instance().unsubscribe()
+    ScConnectionPool.instance().stop()
+    AgentWorkerPool.instance().stop()
 
     print("Geometry Construction API stopped")
 
@@ -71,8 +94,67 @@ app = FastAPI(
 app.post("/upload-construction/", 
          tags=["constructions"],
          summary="Загрузка геометрической конструкции",
-         response_description="Результат обработки конструкции")(upload_construction)
+         response_description="Задание обработки конструкции (202) или результат при sync=true")(upload_construction)
+app.get("/jobs/{job_id}",
+        tags=["constructions"],
+        summary="Статус задания обработки конструкции")(get_job_status)
+app.get("/jobs/{job_id}/result",
+        tags=["constructions"],
+        summary="Результат задания обработки конструкции")(get_job_result)
+app.get("/jobs/{job_id}/events",
+        tags=["constructions"],
+        summary="Поток событий прогресса задания (SSE)")(stream_job_events)
+app.delete("/jobs/{job_id}",
+           tags=["constructions"],
+           summary="Отмена задания обработки конструкции")(cancel_job)
 
 @app.get("/", tags=["validation"])
 async def root():
     return {"message": "Geometry Construction API", "status": "active"}
+
+@app.get("/health", tags=["validation"])
+async def health_check():
+    """Готовность по закэшированному состоянию агентов и соединения, без запросов к sc-server"""
+    agents_ready = AgentWorkerPool.instance().ready
+    sc_connected = ScConnectionPool.instance().is_healthy()
+    return {
+        "status": "healthy" if (agents_ready and sc_connected) else "degraded",
+        "agents_ready": agents_ready,
+        "sc_connected": sc_connected
+    }
+
+@app.get("/metrics/keynodes", tags=["validation"])
+async def keynode_metrics():
+    return KeynodeRegistry.stats()
+
+@app.get("/metrics/sc-pool", tags=["validation"])
+async def sc_pool_metrics():
+    return ScConnectionPool.instance().metrics()
+
+@app.get("/metrics/result-cache", tags=["validation"])
+async def result_cache_metrics():
+    return ResultCache.instance().stats()
+
+@app.delete("/admin/result-cache", tags=["admin"])
+async def flush_result_cache():
+    return {"flushed": ResultCache.instance().flush()}
+
+@app.delete("/admin/result-cache/{cache_key}", tags=["admin"])
+async def invalidate_result_cache(cache_key: str):
+    return {"invalidated": ResultCache.instance().invalidate(cache_key)}
+
+@app.get("/metrics/jobs", tags=["validation"])
+async def job_metrics():
+    return JobManager.instance().stats()
+
+@app.get("/metrics/agent-workers", tags=["validation"])
+async def agent_worker_metrics():
+    return AgentWorkerPool.instance().stats()
+
+@app.get("/metrics/action-completion", tags=["validation"])
+async def action_completion_metrics():
+    return ActionCompletionNotifier.instance().stats()
+
+@app.get("/metrics/sc-gc", tags=["validation"])
+async def sc_gc_metrics():
+    return ScGarbageCollector.instance().stats()
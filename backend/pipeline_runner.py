@@ -5,90 +5,91 @@ import subprocess
 import time
 import threading
 from concurrent.futures import Future
+from typing import Optional
 import time
 import uvicorn
 import json
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from sc_client.client import connect, disconnect
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
 from sc_client.models import ScAddr, ScLinkContent, ScLinkContentType
 from sc_client.constants import sc_type
 from sc_kpm import ScKeynodes
 from sc_kpm.utils import generate_link, generate_connector, generate_node
 from services.sc_adapter import SCAdapter
+from services.sc_connection_pool import ScConnectionPool
+from services.agent_worker_pool import AgentWorkerPool
+from services.action_completion import ActionCompletionNotifier
+from services.pipeline_job_store import PipelineJobStore, PipelineJobStoreFull
+from services.bounded_executor import BoundedExecutor, ExecutorQueueFull
+from services.sc_garbage_collector import ScGarbage, ScGarbageCollector
+from services.request_deadline import RequestDeadline, attach_deadline, mark_cancelled
+from config import (
+    SC_SERVER_URL,
+    AGENT_RESULT_FALLBACK_POLL_INTERVAL,
+    PIPELINE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_RETRY_AFTER,
+    AGENT_WORKER_READY_TIMEOUT,
+    REQUEST_DEADLINE_MAX
+)
 from contextlib import asynccontextmanager
 
 # Глобальные переменные для управления процессом
-pipeline_processes = {}
-pipeline_results = {}
-sc_client_url = "ws://localhost:8090"
+sc_client_url = SC_SERVER_URL
+# Пайплайны выполняются фиксированным числом потоков; лишние загрузки получают 503
+pipeline_executor = BoundedExecutor(PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE, thread_name_prefix="pipeline")
 
-async def run_script_async(script_name):
-    """Асинхронный запуск Python скрипта"""
+async def start_servers():
+    """Запуск пула процессов с агентами (server.py) под супервизором"""
     try:
-        process = await asyncio.create_subprocess_exec(
-            'python3', script_name,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        pipeline_processes[script_name] = process
-        print(f"Запущен скрипт: {script_name}")
-        return process
+        AgentWorkerPool.instance().start()
     except Exception as e:
-        print(f"Ошибка запуска {script_name}: {e}")
-        return None
-
-async def start_servers():
-    """Запуск всех необходимых серверов"""
-    scripts = ['server.py']
-    
-    tasks = [run_script_async(script) for script in scripts]
-    await asyncio.gather(*tasks)
-    
-    # Даем время серверам запуститься
-    await asyncio.sleep(5)
+        print(f"Ошибка запуска воркеров агентов: {e}")
     print("Все серверы запущены")
 
 def check_servers_ready():
-    """Проверка готовности серверов - для WebSocket соединения"""
-    try:
-        # Пробуем подключиться к WebSocket серверу SC-памяти
-        from sc_client.client import connect, disconnect
-        connect("ws://localhost:8090")
-        disconnect()
-        return True
-    except Exception as e:
-        print(f"SC-сервер не готов: {e}")
-        return False
+    """
+    Готовность по закэшированному состоянию: сигналы готовности процессов агентов
+    и проверка соединения фоновым монитором пула (без запросов к sc-server на каждую пробу)
+    """
+    return AgentWorkerPool.instance().ready and ScConnectionPool.instance().is_healthy()
 
 async def wait_for_servers():
-    """Ожидание готовности серверов"""
-    max_attempts = 100
-    for attempt in range(max_attempts):
-        if check_servers_ready():
-            print("Серверы готовы к работе")
-            return True
-        print(f"Ожидание серверов... ({attempt + 1}/{max_attempts})")
-        await asyncio.sleep(2)
-    print("Таймаут ожидания серверов")
-    return False
+    """Ожидание сигнала готовности процессов агентов и соединения с SC-памятью"""
+    deadline = time.monotonic() + AGENT_WORKER_READY_TIMEOUT
+    # Процессы сообщают о регистрации агентов сами - ждём сигнала, а не фиксированную паузу
+    if not await asyncio.to_thread(AgentWorkerPool.instance().wait_ready, AGENT_WORKER_READY_TIMEOUT):
+        print("Таймаут ожидания серверов")
+        return False
+    # Агенты подключились к sc-server, значит и соединение пула должно установиться сразу
+    pool = ScConnectionPool.instance()
+    while not (pool.ensure_connected(raise_on_failure=False) and pool.check_health()):
+        if time.monotonic() >= deadline:
+            print("Таймаут ожидания SC-сервера")
+            return False
+        await asyncio.sleep(0.2)
+    print("Серверы готовы к работе")
+    return True
 
 async def initialize_pipeline():
     """Инициализация всего пайплайна"""
     print("=== ИНИЦИАЛИЗАЦИЯ ПАЙПЛАЙНА ===")
     
-    # Подключаемся к SC-памяти
+    # Подключаемся к SC-памяти: соединение пула живёт до остановки пайплайна
     try:
-        connect(sc_client_url)
+        ScConnectionPool.instance().start()
         print("Подключение к SC-памяти установлено")
     except Exception as e:
         print(f"Ошибка подключения к SC-памяти: {e}")
+    # Действия пайплайнов удаляются из SC-памяти после извлечения результата
+    ScGarbageCollector.instance().start()
     
     # Запускаем серверы
     await start_servers()
     
-    # Ждем готовности
+    # Ждем готовности; без неё запуск прерывается, как и в main.py
     if not await wait_for_servers():
-        raise Exception("Серверы не запустились")
+        AgentWorkerPool.instance().stop()
+        raise RuntimeError("Agent workers did not report readiness, startup aborted")
     
     print("Пайплайн инициализирован и готов к работе")
     return True
@@ -99,8 +100,12 @@ def generate_role_relation(src: ScAddr, trg: ScAddr, relation: ScAddr):
     generate_connector(sc_type.CONST_PERM_POS_ARC, relation, edge)
     return edge
 
-def start_agent(agent_identifier: str, agent_argument: ScAddr) -> ScAddr:
-    """Запускает агента с аргументом"""
+def start_agent(agent_identifier: str, agent_argument: ScAddr, worker_id: int = None,
+                deadline: RequestDeadline = None) -> ScAddr:
+    """
+    Запускает агента с аргументом; worker_id - воркер пула, которому адресовано действие,
+    deadline - срок пайплайна, который агент проверяет во время работы
+    """
     try:
         # Получаем системные узлы с указанием типов
         action_node = ScKeynodes.resolve('action', sc_type.CONST_NODE_CLASS)
@@ -142,6 +147,15 @@ def start_agent(agent_identifier: str, agent_argument: ScAddr) -> ScAddr:
         else:
             print("Предупреждение: аргумент невалиден или отсутствует")
         
+        # Адресуем действие воркеру пула (при одном воркере маршрутизации нет)
+        if worker_id is not None:
+            worker_class = ScKeynodes.resolve(AgentWorkerPool.worker_class_idtf(worker_id), sc_type.CONST_NODE_CLASS)
+            generate_connector(sc_type.CONST_PERM_POS_ARC, worker_class, agent_instance_node)
+            print(f"Действие адресовано воркеру {worker_id}")
+        
+        if deadline is not None:
+            attach_deadline(agent_instance_node, deadline)
+        
         # Помечаем как инициированное действие
         initiated_arc = generate_connector(sc_type.CONST_PERM_POS_ARC, action_initiated_node, agent_instance_node)
         print(f"Помечено как инициированное: {initiated_arc.value}")
@@ -155,15 +169,28 @@ def start_agent(agent_identifier: str, agent_argument: ScAddr) -> ScAddr:
         traceback.print_exc()
         return None
 
-def wait_for_agent_result(action_node: ScAddr, timeout: int = 300) -> dict:
-    """Ожидает результат выполнения агента - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
+def wait_for_agent_result(action_node: ScAddr, deadline: RequestDeadline = None) -> dict:
+    """
+    Ожидает результат выполнения агента: пробуждение по событию sc-server, опрос - запасной вариант.
+    Ждёт не дольше остатка срока пайплайна; по его истечении действие отмечается отменённым
+    """
+    deadline = deadline or RequestDeadline()
+    notifier = ActionCompletionNotifier.instance()
+    poll_interval = AGENT_RESULT_FALLBACK_POLL_INTERVAL if notifier.ensure_subscribed() else 2
+    with notifier.watch(action_node) as wakeup:
+        deadline.add_waiter(wakeup)
+        try:
+            return _wait_for_agent_result(action_node, deadline, wakeup, poll_interval)
+        finally:
+            deadline.remove_waiter(wakeup)
+
+def _wait_for_agent_result(action_node: ScAddr, deadline: RequestDeadline, wakeup: threading.Event,
+                           poll_interval: float) -> dict:
     try:
         from sc_client.client import search_by_template
         from sc_client.models import ScTemplate
         
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
+        while True:
             # ПЕРВОЕ: Проверяем статус выполнения действия
             finished_status = check_action_finished(action_node)
             
@@ -202,12 +229,15 @@ def wait_for_agent_result(action_node: ScAddr, timeout: int = 300) -> dict:
                 print(f"Действие {action_node.value} завершилось неудачно")
                 return {"status": "error", "result": "Action failed", "result_addr": None}
             
-            # Если действие еще выполняется, ждем
-            elapsed = int(time.time() - start_time)
-            print(f"Действие {action_node.value} выполняется... ({elapsed} сек)")
-            time.sleep(2)
-        
-        print(f"Таймаут ожидания результата для действия {action_node.value} ({timeout} сек)")
+            # Если действие еще выполняется, ждем события (или следующего опроса)
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                break
+            wakeup.wait(min(poll_interval, remaining))
+            wakeup.clear()
+        
+        print(f"Таймаут ожидания результата для действия {action_node.value} ({deadline.budget:g} сек на пайплайн)")
+        mark_cancelled(action_node)
         return {"status": "timeout", "result": None, "result_addr": None}
         
     except Exception as e:
@@ -250,24 +280,31 @@ def check_action_finished(action_node: ScAddr) -> str:
                 print(f"Действие {action_node.value} - статус: failed")
                 return "failed"
         
-        print(f"Действие {action_node.value} - статус: running")
         return "running"
         
     except Exception as e:
         print(f"Ошибка проверки статуса действия {action_node.value}: {e}")
         return "unknown"
 
-def _start_agent(agent_identifier: str, argument: ScAddr) -> dict:
+def _start_agent(agent_identifier: str, argument: ScAddr, garbage: ScGarbage = None,
+                 deadline: RequestDeadline = None) -> dict:
     """Запуск одного агента и ожидание результата, возвращает полную информацию"""
+    if deadline is not None and deadline.expired:
+        return {"status": "timeout", "message": f"Pipeline deadline of {deadline.budget:g} s exceeded"}
+    worker_pool = AgentWorkerPool.instance()
+    worker_id = worker_pool.dispatch()
     try:
         print(f"Запуск агента {agent_identifier} с аргументом {argument.value if argument else 'None'}")
-        action_node = start_agent(agent_identifier, argument)
+        action_node = start_agent(agent_identifier, argument, worker_id, deadline)
         if not action_node:
             print(f"Не удалось создать действие для агента {agent_identifier}")
             return {"status": "error", "message": f"Failed to start agent {agent_identifier}"}
+        if garbage is not None:
+            ScGarbageCollector.instance().mark(action_node)
+            garbage.add_action(action_node)
             
         print(f"Ожидание результата от агента {agent_identifier}...")
-        result = wait_for_agent_result(action_node)
+        result = wait_for_agent_result(action_node, deadline)
         
         return {
             "status": result["status"],
@@ -282,6 +319,8 @@ def _start_agent(agent_identifier: str, argument: ScAddr) -> dict:
         import traceback
         traceback.print_exc()
         return {"status": "error", "message": str(e)}
+    finally:
+        worker_pool.complete(worker_id)
 
 def find_link_in_structure(structure_addr: ScAddr):
     """Находит ссылку внутри структуры"""
@@ -385,24 +424,46 @@ def extract_json_from_result(result_addr: ScAddr):
         traceback.print_exc()
         return {"error": str(e)}
 
-def trigger_agent_pipeline(construction_data: dict, result_future: Future):
-    """Запуск пайплайна агентов для обработки конструкции"""
+def trigger_agent_pipeline(construction_data: dict, pipeline_id: str, deadline: RequestDeadline = None):
+    """Запуск пайплайна агентов для обработки конструкции; итог записывается в хранилище заданий"""
+    result_future = Future()
+    try:
+        # Соединение из пула удерживается на всю цепочку: загрузка и все агенты
+        with ScConnectionPool.instance().connection():
+            _run_agent_pipeline(construction_data, result_future, deadline or RequestDeadline())
+    except Exception as e:
+        print(f"ОШИБКА В ПАЙПЛАЙНЕ: {e}")
+        if not result_future.done():
+            result_future.set_exception(e)
+    
+    store = PipelineJobStore.instance()
+    if not result_future.done():
+        store.fail(pipeline_id, "Pipeline finished without result")
+    elif result_future.exception():
+        store.fail(pipeline_id, str(result_future.exception()))
+    else:
+        store.complete(pipeline_id, result_future.result())
+
+def _run_agent_pipeline(construction_data: dict, result_future: Future, deadline: RequestDeadline):
+    # Конструкция и действия цепочки (с результатами) удаляются, когда финальный JSON уже извлечён
+    garbage = None
     try:
         print("=== ЗАПУСК ПАЙПЛАЙНА АГЕНТОВ ===")
         
         # Шаг 1: Отправка конструкции в базу знаний
         print("Шаг 1: Отправка конструкции в SC-память...")
-        sc_adapter = SCAdapter()
+        # Только загрузка: цепочку агентов пайплайн запускает сам
+        sc_adapter = SCAdapter(solve=False, deadline=deadline)
         success, sc_addrs = sc_adapter.upload_construction(construction_data)
+        garbage = sc_adapter.garbage
         
         if not success:
             raise Exception("Ошибка загрузки конструкции в SC-памяти")
         
         print(f"Конструкция загружена, создано {len(sc_addrs)} элементов")
         
-        # Находим главный узел конструкции
-        construction_name = construction_data.get("name", "unnamed")
-        main_node = ScKeynodes.resolve(construction_name, sc_type.CONST_NODE_STRUCTURE)
+        # Главный узел конструкции этого запроса
+        main_node = sc_adapter.main_node
         
         if not main_node or not main_node.is_valid():
             print("Предупреждение: не удалось найти главный узел конструкции, используем первый элемент")
@@ -418,7 +479,7 @@ def trigger_agent_pipeline(construction_data: dict, result_future: Future):
         
         # Агент 1: Поиск геометрических конструкций
         print("=== Шаг 2: Активация GeometrySearchAgent ===")
-        first_agent_result = _start_agent("action_search_geometry_constructions", main_node)
+        first_agent_result = _start_agent("action_search_geometry_constructions", main_node, garbage, deadline)
         print(f"GeometrySearchAgent результат: {first_agent_result['status']}")
         
         if first_agent_result["status"] != "success":
@@ -426,7 +487,8 @@ def trigger_agent_pipeline(construction_data: dict, result_future: Future):
             
         # Агент 2: Извлечение последовательности
         print("=== Шаг 3: Активация GeometrySequenceExtractorAgent ===")
-        second_agent_result = _start_agent("action_extract_geometry_sequence", first_agent_result["result_addr"])
+        second_agent_result = _start_agent("action_extract_geometry_sequence", first_agent_result["result_addr"],
+                                           garbage, deadline)
         print(f"GeometrySequenceExtractorAgent результат: {second_agent_result['status']}")
         
         if second_agent_result["status"] != "success":
@@ -434,7 +496,8 @@ def trigger_agent_pipeline(construction_data: dict, result_future: Future):
             
         # Агент 3: Парсинг последовательности
         print("=== Шаг 4: Активация GeometrySequenceParserAgent ===")
-        third_agent_result = _start_agent("action_parse_geometry_sequence", second_agent_result["result_addr"])
+        third_agent_result = _start_agent("action_parse_geometry_sequence", second_agent_result["result_addr"],
+                                          garbage, deadline)
         print(f"GeometrySequenceParserAgent результат: {third_agent_result['status']}")
         
         if third_agent_result["status"] != "success":
@@ -474,6 +537,9 @@ def trigger_agent_pipeline(construction_data: dict, result_future: Future):
         import traceback
         traceback.print_exc()
         result_future.set_exception(e)
+    finally:
+        if garbage is not None:
+            ScGarbageCollector.instance().collect(garbage)
 
 # FastAPI приложение
 app = FastAPI(title="Geometry Pipeline API", version="1.0.0")
@@ -486,12 +552,13 @@ async def lifespan(app: FastAPI):
     yield
     # Остановка при завершении
     print("Остановка пайплайна...")
-    for script, process in pipeline_processes.items():
-        if process:
-            process.terminate()
+    pipeline_executor.shutdown()
+    ScGarbageCollector.instance().stop()
+    AgentWorkerPool.instance().stop()
     # Отключаемся от SC-памяти
     try:
-        disconnect()
+        ActionCompletionNotifier.instance().unsubscribe()
+        ScConnectionPool.instance().stop()
         print("Отключение от SC-памяти")
     except:
         pass
@@ -499,24 +566,28 @@ async def lifespan(app: FastAPI):
 app = FastAPI(lifespan=lifespan)
 
 @app.post("/upload-construction/")
-async def upload_construction_with_pipeline(construction_data: dict):
+async def upload_construction_with_pipeline(
+    construction_data: dict,
+    timeout: Optional[float] = Query(None, gt=0, le=REQUEST_DEADLINE_MAX)
+):
     """
-    Эндпоинт для загрузки конструкции с автоматическим запуском пайплайна агентов
+    Эндпоинт для загрузки конструкции с автоматическим запуском пайплайна агентов.
+    timeout - бюджет времени на очередь и всю цепочку агентов (по умолчанию REQUEST_DEADLINE)
     """
-    # Создаем Future для результата
-    result_future = Future()
-    pipeline_id = f"pipeline_{int(time.time())}"
-    
-    # Сохраняем Future для отслеживания
-    pipeline_results[pipeline_id] = result_future
+    deadline = RequestDeadline(timeout) if timeout else RequestDeadline()
+    # Регистрируем задание: уникальный идентификатор, место в ограниченном хранилище
+    store = PipelineJobStore.instance()
+    try:
+        pipeline_id = store.create()
+    except PipelineJobStoreFull as e:
+        raise _overloaded(str(e))
     
-    # Запускаем пайплайн в отдельном потоке
-    pipeline_thread = threading.Thread(
-        target=trigger_agent_pipeline, 
-        args=(construction_data, result_future)
-    )
-    pipeline_thread.daemon = True
-    pipeline_thread.start()
+    # Ставим пайплайн в очередь пула потоков
+    try:
+        pipeline_executor.submit(trigger_agent_pipeline, construction_data, pipeline_id, deadline)
+    except ExecutorQueueFull as e:
+        store.delete(pipeline_id)
+        raise _overloaded(str(e))
     
     return {
         "status": "processing",
@@ -525,31 +596,34 @@ async def upload_construction_with_pipeline(construction_data: dict):
         "timestamp": time.time()
     }
 
+def _overloaded(detail: str) -> HTTPException:
+    """Отказ при перегрузке: клиент повторяет запрос через Retry-After секунд"""
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(PIPELINE_RETRY_AFTER)}
+    )
+
 @app.get("/pipeline-result/{pipeline_id}")
 async def get_pipeline_result(pipeline_id: str):
     """
     Получение результата выполнения пайплайна
     """
-    if pipeline_id not in pipeline_results:
+    store = PipelineJobStore.instance()
+    job = store.get(pipeline_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Pipeline not found")
     
-    future = pipeline_results[pipeline_id]
-    
-    if future.done():
-        if future.exception():
-            error_msg = str(future.exception())
-            # Удаляем завершенный пайплайн
-            del pipeline_results[pipeline_id]
-            raise HTTPException(status_code=500, detail=f"Pipeline error: {error_msg}")
-        
-        result = future.result()
-        # Удаляем завершенный пайплайн
-        del pipeline_results[pipeline_id]
+    if job["status"] != "processing":
+        # Удаляем завершенный пайплайн (иначе его удалит TTL хранилища)
+        store.delete(pipeline_id)
+        if job["status"] == "error":
+            raise HTTPException(status_code=500, detail=f"Pipeline error: {job['error']}")
         
         return {
             "status": "completed",
             "pipeline_id": pipeline_id,
-            "result": result
+            "result": job["result"]
         }
     else:
         return {
@@ -564,12 +638,14 @@ async def get_all_pipelines_status():
     Получение статуса всех пайплайнов
     """
     statuses = {}
-    for pid, future in pipeline_results.items():
-        if future.done():
-            if future.exception():
-                statuses[pid] = {"status": "error", "error": str(future.exception())}
+    jobs = PipelineJobStore.instance().list()
+    for job in jobs:
+        pid = job["pipeline_id"]
+        if job["status"] != "processing":
+            if job["status"] == "error":
+                statuses[pid] = {"status": "error", "error": job["error"]}
             else:
-                result = future.result()
+                result = job["result"]
                 # Возвращаем готовый JSON результат, а не адреса
                 statuses[pid] = {
                     "status": "completed", 
@@ -583,40 +659,36 @@ async def get_all_pipelines_status():
             statuses[pid] = {"status": "processing"}
     
     return {
-        "active_pipelines": len(pipeline_results),
+        "active_pipelines": len(jobs),
         "pipelines": statuses
     }
 
 @app.get("/health")
 async def health_check():
     """Проверка здоровья системы"""
+    pool = ScConnectionPool.instance()
     servers_ready = check_servers_ready()
-    sc_connected = False
-    try:
-        from sc_client.client import check_connection
-        sc_connected = check_connection()
-    except:
-        pass
+    sc_connected = pool.is_healthy()
+    job_stats = PipelineJobStore.instance().stats()
         
     return {
         "status": "healthy" if (servers_ready and sc_connected) else "degraded",
         "servers_ready": servers_ready,
         "sc_connected": sc_connected,
-        "active_pipelines": len(pipeline_results)
+        "sc_pool": pool.metrics(),
+        "agent_workers": AgentWorkerPool.instance().stats(),
+        "active_pipelines": job_stats["entries"],
+        "job_store": job_stats,
+        "executor": pipeline_executor.stats(),
+        "sc_gc": ScGarbageCollector.instance().stats()
     }
 
 # Эндпоинт для ручного запуска серверов (на случай проблем)
 @app.post("/restart-servers/")
 async def restart_servers():
     """Перезапуск серверов пайплайна"""
-    global pipeline_processes
-    
     # Останавливаем текущие процессы
-    for script, process in pipeline_processes.items():
-        if process:
-            process.terminate()
-    
-    pipeline_processes = {}
+    AgentWorkerPool.instance().stop()
     
     # Перезапускаем
     await initialize_pipeline()
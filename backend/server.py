@@ -5,6 +5,7 @@ Distributed under the MIT License
 """
 
 import argparse
+import os
 from sc_kpm import ScServer
 from sc_client.models import ScAddr
 from sc_kpm.utils import get_element_system_identifier
@@ -13,22 +14,33 @@ from task_search_module.geometry_search_module import GeometrySearchModule
 SC_SERVER_PROTOCOL = "protocol"
 SC_SERVER_HOST = "host"
 SC_SERVER_PORT = "port"
+SC_SERVER_WORKER_ID = "worker_id"
+SC_SERVER_READY_FD = "ready_fd"
 
 SC_SERVER_PROTOCOL_DEFAULT = "ws"
 SC_SERVER_HOST_DEFAULT = "localhost"
 SC_SERVER_PORT_DEFAULT = "8090"
 
 
+def signal_ready(ready_fd: int) -> None:
+    """Сообщает запустившему процессу (AgentWorkerPool), что агенты зарегистрированы"""
+    if ready_fd is None:
+        return
+    with os.fdopen(ready_fd, "wb") as pipe:
+        pipe.write(b"ready\n")
+
+
 def main(args: dict):
     server = ScServer(
         f"{args[SC_SERVER_PROTOCOL]}://{args[SC_SERVER_HOST]}:{args[SC_SERVER_PORT]}")
 
     with server.connect():
         modules = [
-            GeometrySearchModule()
+            GeometrySearchModule(args[SC_SERVER_WORKER_ID])
         ]
         server.add_modules(*modules)
         with server.register_modules():
+            signal_ready(args[SC_SERVER_READY_FD])
             server.serve()
 
 
@@ -40,6 +52,12 @@ if __name__ == '__main__':
         '--host', type=str, dest=SC_SERVER_HOST, default=SC_SERVER_HOST_DEFAULT, help="sc-server host")
     parser.add_argument(
         '--port', type=int, dest=SC_SERVER_PORT, default=SC_SERVER_PORT_DEFAULT, help="sc-server port")
+    parser.add_argument(
+        '--worker-id', type=int, dest=SC_SERVER_WORKER_ID, default=None,
+        help="agent worker id in a worker pool; without it the agents handle every action")
+    parser.add_argument(
+        '--ready-fd', type=int, dest=SC_SERVER_READY_FD, default=None,
+        help="pipe descriptor to write a readiness line to once the agents are registered")
     args = parser.parse_args()
     
     main(vars(args))
@@ -1,5 +1,24 @@
-from .endpoints import upload_construction
+from .endpoints import upload_construction, get_job_status, get_job_result, stream_job_events, cancel_job
 from .sc_adapter import SCAdapter
 from .agent_chain_executor import AgentChainExecutor
+from .keynode_registry import KeynodeRegistry
+from .async_sc_adapter import AsyncSCAdapter
+from .sc_connection_pool import ScConnectionPool, ScConnectionPoolTimeout
+from .result_cache import ResultCache
+from .canonical_form import CanonicalForm, ConstructionCanonicalizer
+from .job_manager import Job, JobManager, JobQueueFull
+from .agent_worker_pool import AgentWorkerPool
+from .action_completion import ActionCompletionNotifier
+from .pipeline_job_store import PipelineJobStore, PipelineJobStoreFull
+from .bounded_executor import BoundedExecutor, ExecutorQueueFull
+from .sc_garbage_collector import ScGarbage, ScGarbageCollector
+from .request_deadline import RequestDeadline, DeadlineExceeded
 
-__all__ = ["upload_construction", "SCAdapter", "AgentChainExecutor"]
\ No newline at end of file
+__all__ = ["upload_construction", "get_job_status", "get_job_result", "stream_job_events", "cancel_job",
+           "SCAdapter", "AsyncSCAdapter", "AgentChainExecutor", "KeynodeRegistry",
+           "ScConnectionPool", "ScConnectionPoolTimeout",
+           "ResultCache", "CanonicalForm", "ConstructionCanonicalizer",
+           "Job", "JobManager", "JobQueueFull", "AgentWorkerPool",
+           "ActionCompletionNotifier", "PipelineJobStore", "PipelineJobStoreFull",
+           "BoundedExecutor", "ExecutorQueueFull", "ScGarbage", "ScGarbageCollector",
+           "RequestDeadline", "DeadlineExceeded"]
\ No newline at end of file
@@ -0,0 +1,141 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.constants.common import ScEventType
+from sc_client.models import ScAddr, ScEventSubscriptionParams, ScTemplate
+from sc_kpm import ScResult
+from .keynode_registry import KeynodeRegistry
+from .sc_connection_pool import ScConnectionPool
+
+# Классы завершённых действий: дуга из них в действие означает завершение
+FINISHED_CLASSES = ["action_finished", "action_finished_successfully", "action_finished_unsuccessfully"]
+
+
+class ActionCompletionNotifier:
+    """
+    Пробуждение ожидающих завершения действий по событиям sc-server.
+
+    Подписки на появление выходящих дуг из action_finished*, а также из nrel_result
+    (результат записан), создаются один раз на соединение и восстанавливаются
+    после переподключения. Ожидающий получает threading.Event, который
+    устанавливается при событии для его действия; опрос по таймауту остаётся
+    запасным вариантом на случай потерянного события.
+    """
+
+    _instance: Optional["ActionCompletionNotifier"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[int, List[threading.Event]] = {}
+        self._subscriptions = []
+        self._generation: Optional[int] = None
+
+        self.notifications = 0
+        self.subscribe_failures = 0
+
+    @classmethod
+    def instance(cls) -> "ActionCompletionNotifier":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    # --- Подписки ---
+    def ensure_subscribed(self) -> bool:
+        """Подписывается на события текущего соединения; False - работаем только опросом"""
+        generation = ScConnectionPool.instance().generation
+        if self._generation == generation and self._subscriptions:
+            return True
+        with self._lock:
+            if self._generation == generation and self._subscriptions:
+                return True
+            try:
+                params = [
+                    ScEventSubscriptionParams(
+                        KeynodeRegistry.resolve(idtf, sc_type.CONST_NODE_CLASS),
+                        ScEventType.AFTER_GENERATE_OUTGOING_ARC,
+                        self._on_action_finished
+                    )
+                    for idtf in FINISHED_CLASSES
+                ]
+                params.append(ScEventSubscriptionParams(
+                    KeynodeRegistry.resolve("nrel_result", sc_type.CONST_NODE_NON_ROLE),
+                    ScEventType.AFTER_GENERATE_OUTGOING_ARC,
+                    self._on_result_generated
+                ))
+                self._subscriptions = client.create_elementary_event_subscriptions(*params)
+                self._generation = generation
+            except Exception as e:
+                self.subscribe_failures += 1
+                self._subscriptions = []
+                print(f"Подписка на завершение действий недоступна, используется опрос: {e}")
+                return False
+        return True
+
+    def unsubscribe(self) -> None:
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, []
+            self._generation = None
+        if subscriptions and client.is_connected():
+            try:
+                client.destroy_elementary_event_subscriptions(*subscriptions)
+            except Exception as e:
+                print(f"Ошибка удаления подписок на завершение действий: {e}")
+
+    # --- Ожидание ---
+    @contextmanager
+    def watch(self, action: ScAddr) -> Iterator[threading.Event]:
+        """
+        Регистрирует ожидание действия. Регистрироваться нужно до первой проверки
+        его состояния, тогда событие между проверкой и ожиданием не теряется.
+        """
+        wakeup = threading.Event()
+        with self._lock:
+            self._waiters.setdefault(action.value, []).append(wakeup)
+        try:
+            yield wakeup
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(action.value, [])
+                if wakeup in waiters:
+                    waiters.remove(wakeup)
+                if not waiters:
+                    self._waiters.pop(action.value, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribed": bool(self._subscriptions),
+                "waiting": sum(len(waiters) for waiters in self._waiters.values()),
+                "notifications": self.notifications,
+                "subscribe_failures": self.subscribe_failures
+            }
+
+    # --- Обработчики событий (вызываются в потоках sc_client) ---
+    def _on_action_finished(self, _finished_class: ScAddr, _arc: ScAddr, action: ScAddr) -> ScResult:
+        self._wake(action)
+        return ScResult.OK
+
+    def _on_result_generated(self, _nrel_result: ScAddr, _arc: ScAddr, result_arc: ScAddr) -> ScResult:
+        # Дуга nrel_result указывает на дугу "действие -> результат"; ищем её начало
+        if not self._waiters:
+            return ScResult.OK
+        try:
+            template = ScTemplate()
+            template.triple(sc_type.VAR_NODE >> "_action", result_arc, sc_type.VAR_NODE)
+            for item in client.search_by_template(template):
+                self._wake(item.get("_action"))
+        except Exception as e:
+            print(f"Ошибка обработки события nrel_result: {e}")
+        return ScResult.OK
+
+    def _wake(self, action: ScAddr) -> None:
+        with self._lock:
+            waiters = list(self._waiters.get(action.value, []))
+            if waiters:
+                self.notifications += 1
+        for wakeup in waiters:
+            wakeup.set()
@@ -1,18 +1,80 @@
+import threading
 from sc_client.client import search_by_template, get_link_content
 from sc_kpm import ScKeynodes
 from sc_client import client
-from sc_kpm.utils import generate_connector, generate_node
+from sc_kpm.utils import generate_connector, generate_node, generate_link
 from sc_client.constants import sc_type
-from sc_client.models import ScAddr, ScTemplate, ScLinkContent, ScConstruction
+from sc_client.models import ScAddr, ScTemplate, ScLinkContent, ScLinkContentType, ScConstruction
 from sc_kpm.identifiers import ScAlias
-from typing import List
+from typing import Callable, List, Optional
+from .keynode_registry import KeynodeRegistry
+from .sc_batch import search_structure_members
+from .agent_worker_pool import AgentWorkerPool
+from .sc_connection_pool import ScConnectionPool
+from .action_completion import ActionCompletionNotifier
+from .sc_garbage_collector import ScGarbage, ScGarbageCollector
+from .request_deadline import RequestDeadline, attach_deadline, mark_cancelled
+from config import AGENT_RESULT_FALLBACK_POLL_INTERVAL, AGENT_PIPELINE_MODE
+
+# Этапы обработки, которые выполняет каждый агент (для отчёта о прогрессе)
+AGENT_STAGES = {
+    "action_search_geometry_constructions": ["search"],
+    "action_extract_geometry_sequence": ["extract"],
+    "action_parse_geometry_sequence": ["parse"],
+    "action_solve_geometry_construction": ["search", "extract", "parse"],
+}
 
 class AgentChainExecutor:
     """Класс для выполнения цепочки агентов"""
 
+    def __init__(self, progress: Optional[Callable[..., None]] = None, max_solutions: int = 1,
+                 garbage: Optional[ScGarbage] = None, deadline: Optional[RequestDeadline] = None):
+        self.progress = progress
+        # Сколько найденных задач решать (только в режиме fused)
+        self.max_solutions = max_solutions
+        # Действия и их аргументы-ссылки удаляются вместе с остальными временными элементами запроса
+        self.garbage = garbage
+        # Один бюджет времени на все этапы цепочки; агенты получают срок вместе с действием
+        self.deadline = deadline or RequestDeadline()
+
+    def _track(self, element: ScAddr, is_action: bool = False) -> None:
+        if self.garbage is None:
+            return
+        ScGarbageCollector.instance().mark(element)
+        if is_action:
+            self.garbage.add_action(element)
+        else:
+            self.garbage.add(element)
+
+    def _report(self, agent_identifier: str, state: str, details: Optional[dict] = None) -> None:
+        if self.progress is None:
+            return
+        for stage in AGENT_STAGES.get(agent_identifier, []):
+            self.progress(stage, state, details)
+
+    def _result_details(self, agent_identifier: str, result: ScAddr) -> Optional[dict]:
+        """Размер результата агента для отчёта: кандидаты поиска, элементы последовательности"""
+        if self.progress is None or "parse" in AGENT_STAGES.get(agent_identifier, []):
+            return None
+        members = len(search_structure_members(result))
+        if agent_identifier == "action_search_geometry_constructions":
+            return {"candidates": members}
+        return {"elements": members}
+
     def _execute_agent_chain(self, construction_structure: ScAddr) -> str:
         """Запускает цепочку агентов после загрузки конструкции"""
         parsedSolvingSteps = None
+        try:
+            with ScConnectionPool.instance().connection():
+                return self._run_agent_chain(construction_structure)
+        except Exception as e:
+            print(f"Ошибка при запуске цепочки агентов: {e}")
+        return parsedSolvingSteps
+
+    def _run_agent_chain(self, construction_structure: ScAddr) -> str:
+        if AGENT_PIPELINE_MODE == "fused":
+            return self._run_fused_agent(construction_structure)
+        parsedSolvingSteps = None
         try:
             # Запускаем первого агента
             first_agent_result = self._start_agent(
@@ -44,6 +106,19 @@ class AgentChainExecutor:
         except Exception as e:
             print(f"Ошибка при запуске цепочки агентов: {e}")
 
+    def _run_fused_agent(self, construction_structure: ScAddr) -> str:
+        """Весь пайплайн одним действием: результат агента - ссылка с JSON"""
+        extra_arguments = []
+        if self.max_solutions > 1:
+            max_solutions_link = generate_link(self.max_solutions, ScLinkContentType.INT)
+            self._track(max_solutions_link)
+            extra_arguments.append(max_solutions_link)
+        result = self._start_agent("action_solve_geometry_construction", construction_structure, *extra_arguments)
+        if not result:
+            print("Агент пайплайна не вернул результат")
+            return None
+        return self._find_and_save_link_content(result)
+
     def _find_and_save_link_content(self, result_node: ScAddr):
 
         template = ScTemplate()
@@ -62,47 +137,88 @@ class AgentChainExecutor:
         return content.data
 
 
-    def _start_agent(self, agent_identifier: str, agent_argument: ScAddr) -> ScAddr:
+    def _start_agent(self, agent_identifier: str, agent_argument: ScAddr, *extra_arguments: ScAddr) -> ScAddr:
         """Запускает агента и возвращает результат"""
+        if self.deadline.expired:
+            print(f"Агент {agent_identifier} не запущен: {self.deadline.reason or 'срок запроса истёк'}")
+            self._report(agent_identifier, "failed")
+            return None
         try:
-            action_node = ScKeynodes.resolve('action', sc_type.CONST_NODE_CLASS)
-            action_initiated_node = ScKeynodes.resolve('action_initiated', sc_type.CONST_NODE)
-            rrel_1_node = ScKeynodes.resolve('rrel_1', sc_type.CONST_NODE_ROLE)
-            agent_node = ScKeynodes.resolve(agent_identifier, sc_type.CONST_NODE_CLASS)
+            action_node = KeynodeRegistry.resolve('action', sc_type.CONST_NODE_CLASS)
+            action_initiated_node = KeynodeRegistry.resolve('action_initiated', sc_type.CONST_NODE)
+            rrel_1_node = KeynodeRegistry.resolve('rrel_1', sc_type.CONST_NODE_ROLE)
+            agent_node = KeynodeRegistry.resolve(agent_identifier, sc_type.CONST_NODE_CLASS)
             
             # Создаем экземпляр агента
             agent_instance_node = generate_node(sc_type.CONST_NODE)
+            self._track(agent_instance_node, is_action=True)
+            attach_deadline(agent_instance_node, self.deadline)
             
             # Связываем аргумент с агентом через rrel_1
             self.generate_role_relation(agent_instance_node, agent_argument, rrel_1_node)
+            # Дополнительные аргументы - через rrel_2, rrel_3, ...
+            for index, argument in enumerate(extra_arguments, start=2):
+                rrel_node = KeynodeRegistry.resolve(f"rrel_{index}", sc_type.CONST_NODE_ROLE)
+                self.generate_role_relation(agent_instance_node, argument, rrel_node)
             
             # Создаем связи для запуска агента
             generate_connector(sc_type.CONST_PERM_POS_ARC, action_node, agent_instance_node)
             generate_connector(sc_type.CONST_PERM_POS_ARC, agent_node, agent_instance_node)
-            generate_connector(sc_type.CONST_PERM_POS_ARC, action_initiated_node, agent_instance_node)
-            
-            print(f"Запущен агент: {agent_identifier}")
-            
-            # Ждем завершения агента и получаем результат
-            return self._wait_for_agent_result(agent_instance_node)
+            # В пуле процессов действие адресуется одному воркеру до инициирования
+            worker_pool = AgentWorkerPool.instance()
+            worker_id = worker_pool.dispatch()
+            if worker_id is not None:
+                worker_class = KeynodeRegistry.resolve(worker_pool.worker_class_idtf(worker_id), sc_type.CONST_NODE_CLASS)
+                generate_connector(sc_type.CONST_PERM_POS_ARC, worker_class, agent_instance_node)
+            try:
+                generate_connector(sc_type.CONST_PERM_POS_ARC, action_initiated_node, agent_instance_node)
+                
+                print(f"Запущен агент: {agent_identifier}")
+                self._report(agent_identifier, "running")
+                
+                # Ждем завершения агента и получаем результат
+                result = self._wait_for_agent_result(agent_instance_node)
+            finally:
+                worker_pool.complete(worker_id)
+            if result:
+                self._report(agent_identifier, "completed", self._result_details(agent_identifier, result))
+            else:
+                self._report(agent_identifier, "failed")
+            return result
             
         except Exception as e:
             print(f"Ошибка при запуске агента {agent_identifier}: {e}")
+            self._report(agent_identifier, "failed")
             return None
 
     def _wait_for_agent_result(self, agent_instance_node: ScAddr) -> ScAddr:
-        """Ожидает завершения агента и возвращает результат"""
-        import time
-        from sc_client.client import search_by_template
-        from sc_client.models import ScTemplate
-        
-        max_wait_time = 400  # секунд
-        check_interval = 0.5  # секунд
-        waited_time = 0
+        """
+        Ожидает завершения агента (по событию sc-server) и возвращает результат.
+        Ждёт не дольше остатка бюджета запроса; по его истечении или отмене
+        действие отмечается отменённым, и агент прекращает работу.
+        """
+        notifier = ActionCompletionNotifier.instance()
+        # Без подписки опрашиваем часто, с подпиской опрос - только страховка от потерянного события
+        check_interval = AGENT_RESULT_FALLBACK_POLL_INTERVAL if notifier.ensure_subscribed() else 0.5
         
-        nrel_result = ScKeynodes.resolve("nrel_result", sc_type.CONST_NODE_NON_ROLE)
+        nrel_result = KeynodeRegistry.resolve("nrel_result", sc_type.CONST_NODE_NON_ROLE)
         
-        while waited_time < max_wait_time:
+        with notifier.watch(agent_instance_node) as wakeup:
+            self.deadline.add_waiter(wakeup)
+            try:
+                result = self._poll_agent_result(agent_instance_node, nrel_result, wakeup, check_interval)
+            finally:
+                self.deadline.remove_waiter(wakeup)
+        if result is False:
+            print(f"Ожидание агента прервано: {self.deadline.reason or f'бюджет {self.deadline.budget:g} с исчерпан'}")
+            mark_cancelled(agent_instance_node)
+            return None
+        return result
+
+    def _poll_agent_result(self, agent_instance_node: ScAddr, nrel_result: ScAddr,
+                           wakeup: threading.Event, check_interval: float):
+        """Результат агента, None - агент завершился без результата, False - срок истёк или запрос отменён"""
+        while True:
             try:
                 # Ищем результат агента
                 template = ScTemplate()
@@ -127,24 +243,19 @@ class AgentChainExecutor:
                     print("Агент завершился, но результат не найден")
                     return None
                     
-                time.sleep(check_interval)
-                waited_time += check_interval
-                
             except Exception as e:
                 print(f"Ошибка при ожидании результата агента: {e}")
-                time.sleep(check_interval)
-                waited_time += check_interval
-        
-        print(f"Таймаут ожидания результата агента ({max_wait_time} секунд)")
-        return None
+            
+            remaining = self.deadline.remaining()
+            if remaining <= 0:
+                return False
+            wakeup.wait(min(check_interval, remaining))
+            wakeup.clear()
 
     def _is_agent_finished(self, agent_instance_node: ScAddr) -> bool:
         """Проверяет, завершился ли агент"""
-        from sc_client.client import search_by_template
-        from sc_client.models import ScTemplate
-        
         try:
-            action_finished_node = ScKeynodes.resolve('action_finished', sc_type.CONST_NODE)
+            action_finished_node = KeynodeRegistry.resolve('action_finished', sc_type.CONST_NODE)
             
             template = ScTemplate()
             template.triple(
@@ -0,0 +1,251 @@
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+from config import AGENT_WORKERS, AGENT_DISPATCH, AGENT_WORKER_RESTART_BACKOFF_MAX, AGENT_WORKER_READY_TIMEOUT
+
+# Класс действий воркера; совпадает с task_search_module.worker_routing.worker_class_idtf
+WORKER_CLASS_PREFIX = "agent_worker_"
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+
+# Период проверки процессов супервизором, секунды
+SUPERVISE_INTERVAL = 1.0
+# Сколько ждать завершения процесса после terminate, прежде чем kill
+SHUTDOWN_TIMEOUT = 10.0
+# Строка, которую server.py пишет в канал готовности после регистрации агентов
+READY_SIGNAL = b"ready"
+
+
+@dataclass
+class _Worker:
+    worker_id: Optional[int]
+    process: Optional[subprocess.Popen] = None
+    in_flight: int = 0
+    dispatched: int = 0
+    restarts: int = 0
+    failures: int = 0
+    next_start: float = 0.0
+    started_at: Optional[float] = None
+    ready: bool = False
+    startup_time: Optional[float] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+
+class AgentWorkerPool:
+    """
+    Пул процессов server.py с агентами GeometrySearchModule.
+
+    При size > 1 каждый процесс запускается с --worker-id и обрабатывает
+    только действия из класса agent_worker_<id>; dispatch() выбирает воркер
+    для очередного действия (least_loaded или round_robin). Упавшие процессы
+    перезапускаются супервизором с экспоненциальной задержкой.
+    При size == 1 запускается один процесс без маршрутизации, как раньше.
+
+    Процесс сообщает о готовности строкой в канал (--ready-fd) после регистрации
+    агентов; wait_ready() ждёт этого сигнала вместо фиксированной паузы, а ready
+    отдаёт закэшированное состояние без обращения к sc-server.
+    """
+
+    _instance: Optional["AgentWorkerPool"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, size: int = AGENT_WORKERS, strategy: str = AGENT_DISPATCH):
+        self.size = max(1, size)
+        self.strategy = strategy
+        ids = [None] if self.size == 1 else list(range(self.size))
+        self._workers: List[_Worker] = [_Worker(worker_id) for worker_id in ids]
+        self._lock = threading.Lock()
+        self._ready_changed = threading.Condition(self._lock)
+        self._round_robin = itertools.cycle(range(len(self._workers)))
+        self._stop_event = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+
+    @classmethod
+    def instance(cls) -> "AgentWorkerPool":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @property
+    def routed(self) -> bool:
+        return self.size > 1
+
+    @property
+    def ready(self) -> bool:
+        """Все процессы живы и зарегистрировали агентов"""
+        with self._lock:
+            return self._all_ready()
+
+    def wait_ready(self, timeout: float = AGENT_WORKER_READY_TIMEOUT) -> bool:
+        """Ждёт сигнала готовности от всех процессов, не дольше timeout секунд"""
+        with self._ready_changed:
+            ready = self._ready_changed.wait_for(self._all_ready, timeout=timeout)
+        if not ready:
+            print(f"Agent workers are not ready after {timeout} s")
+        return ready
+
+    # --- Жизненный цикл ---
+    def start(self) -> None:
+        with self._lock:
+            for worker in self._workers:
+                if not worker.alive:
+                    self._spawn(worker)
+        if self._supervisor is None or not self._supervisor.is_alive():
+            self._stop_event.clear()
+            self._supervisor = threading.Thread(target=self._supervise, name="agent-worker-supervisor", daemon=True)
+            self._supervisor.start()
+
+    def stop(self) -> None:
+        """Останавливает супервизор и завершает процессы: terminate, затем kill по таймауту"""
+        self._stop_event.set()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=SUPERVISE_INTERVAL * 2)
+            self._supervisor = None
+        with self._lock:
+            processes = [worker.process for worker in self._workers if worker.alive]
+            for process in processes:
+                process.terminate()
+            deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+            for process in processes:
+                try:
+                    process.wait(timeout=max(0.0, deadline - time.monotonic()))
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+            for worker in self._workers:
+                worker.process = None
+                worker.ready = False
+
+    # --- Распределение действий ---
+    def dispatch(self) -> Optional[int]:
+        """Выбирает воркер для нового действия; None - маршрутизация не нужна"""
+        if not self.routed:
+            return None
+        with self._lock:
+            candidates = [index for index, worker in enumerate(self._workers) if worker.alive]
+            if not candidates:
+                candidates = list(range(len(self._workers)))
+            if self.strategy == "round_robin":
+                index = next(self._round_robin)
+                while index not in candidates:
+                    index = next(self._round_robin)
+            else:
+                index = min(candidates, key=lambda i: (self._workers[i].in_flight, self._workers[i].dispatched))
+            worker = self._workers[index]
+            worker.in_flight += 1
+            worker.dispatched += 1
+            return worker.worker_id
+
+    @staticmethod
+    def worker_class_idtf(worker_id: int) -> str:
+        return f"{WORKER_CLASS_PREFIX}{worker_id}"
+
+    def complete(self, worker_id: Optional[int]) -> None:
+        """Действие, отправленное воркеру, завершилось (успешно или нет)"""
+        if worker_id is None:
+            return
+        with self._lock:
+            worker = self._workers[worker_id]
+            worker.in_flight = max(0, worker.in_flight - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "ready": self._all_ready(),
+                "strategy": self.strategy,
+                "workers": [
+                    {
+                        "worker_id": worker.worker_id,
+                        "pid": worker.process.pid if worker.process else None,
+                        "alive": worker.alive,
+                        "in_flight": worker.in_flight,
+                        "dispatched": worker.dispatched,
+                        "restarts": worker.restarts,
+                        "ready": worker.alive and worker.ready,
+                        "startup_time": worker.startup_time
+                    }
+                    for worker in self._workers
+                ]
+            }
+
+    # --- Вспомогательные методы ---
+    def _all_ready(self) -> bool:
+        return all(worker.alive and worker.ready for worker in self._workers)
+
+    def _spawn(self, worker: _Worker) -> None:
+        command = [sys.executable, SERVER_SCRIPT]
+        if worker.worker_id is not None:
+            command += ["--worker-id", str(worker.worker_id)]
+        worker.ready = False
+        worker.started_at = time.monotonic()
+        if os.name != "posix":
+            # Без наследуемых дескрипторов сигнала нет: процесс считается готовым сразу
+            worker.process = subprocess.Popen(command, cwd=os.path.dirname(SERVER_SCRIPT))
+            worker.ready = True
+            self._ready_changed.notify_all()
+        else:
+            read_fd, write_fd = os.pipe()
+            try:
+                worker.process = subprocess.Popen(command + ["--ready-fd", str(write_fd)],
+                                                  cwd=os.path.dirname(SERVER_SCRIPT), pass_fds=(write_fd,))
+            except Exception:
+                os.close(read_fd)
+                raise
+            finally:
+                os.close(write_fd)
+            threading.Thread(target=self._watch_ready, args=(worker, worker.process, read_fd),
+                             name=f"agent-worker-ready-{worker.worker_id}", daemon=True).start()
+        print(f"Started agent worker {worker.worker_id} (pid {worker.process.pid})")
+
+    def _watch_ready(self, worker: _Worker, process: subprocess.Popen, read_fd: int) -> None:
+        """Читает канал готовности; конец канала без сигнала - процесс завершился раньше"""
+        with os.fdopen(read_fd, "rb") as pipe:
+            signalled = pipe.readline().strip() == READY_SIGNAL
+        with self._ready_changed:
+            if worker.process is not process:
+                return
+            worker.ready = signalled
+            if signalled:
+                worker.startup_time = time.monotonic() - worker.started_at
+                print(f"Agent worker {worker.worker_id} is ready in {worker.startup_time:.2f} s")
+            self._ready_changed.notify_all()
+
+    def _supervise(self) -> None:
+        while not self._stop_event.wait(SUPERVISE_INTERVAL):
+            with self._lock:
+                now = time.monotonic()
+                for worker in self._workers:
+                    if worker.alive:
+                        # Процесс проработал дольше предела задержки - следующий сбой снова с малой задержкой
+                        if worker.failures and now - worker.started_at > AGENT_WORKER_RESTART_BACKOFF_MAX:
+                            worker.failures = 0
+                        continue
+                    worker.ready = False
+                    if worker.next_start == 0.0 and worker.process is not None:
+                        delay = min(2 ** worker.failures, AGENT_WORKER_RESTART_BACKOFF_MAX)
+                        worker.failures += 1
+                        worker.next_start = now + delay
+                        worker.in_flight = 0
+                        print(f"Agent worker {worker.worker_id} exited with code {worker.process.returncode}, "
+                              f"restart in {delay} s")
+                    if now >= worker.next_start:
+                        worker.restarts += 1
+                        worker.next_start = 0.0
+                        try:
+                            self._spawn(worker)
+                        except Exception as e:
+                            # Ошибка запуска не должна останавливать надзор: повтор с той же задержкой
+                            delay = min(2 ** worker.failures, AGENT_WORKER_RESTART_BACKOFF_MAX)
+                            worker.failures += 1
+                            worker.next_start = now + delay
+                            print(f"Failed to restart agent worker {worker.worker_id}: {e}, retry in {delay} s")
@@ -0,0 +1,62 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sc_client.models import ScAddr
+from config import SC_MAX_CONCURRENT_CONSTRUCTIONS, SC_SERVER_URL
+from .sc_adapter import SCAdapter
+from .request_deadline import RequestDeadline
+
+
+class AsyncSCAdapter:
+    """
+    Асинхронный доступ к SC-памяти для эндпоинтов FastAPI.
+    Синхронные SCAdapter и AgentChainExecutor (включая ожидание агентов)
+    выполняются в отдельном ограниченном пуле потоков, поэтому цикл событий не блокируется.
+    """
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _max_workers = SC_MAX_CONCURRENT_CONSTRUCTIONS
+
+    def __init__(self, url: str = SC_SERVER_URL, batched: bool = True,
+                 progress: Optional[Callable[..., None]] = None, max_solutions: int = 1,
+                 deadline: Optional[RequestDeadline] = None):
+        self.url = url
+        self.batched = batched
+        self.progress = progress
+        self.max_solutions = max_solutions
+        self.deadline = deadline
+
+    @classmethod
+    def configure(cls, max_workers: int) -> None:
+        """Меняет предел одновременно обрабатываемых конструкций (до первого запроса)"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False)
+            cls._executor = None
+        cls._max_workers = max_workers
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls._max_workers, thread_name_prefix="sc-adapter")
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+    async def run(self, func, *args) -> Any:
+        """Выполняет синхронную функцию работы с SC-памятью в пуле адаптера"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def upload_construction(self, construction_data: Dict[str, Any]) -> Tuple[bool, List[ScAddr], str]:
+        """Загружает конструкцию, запускает цепочку агентов и возвращает (успех, адреса, результат парсинга)"""
+        return await self.run(self._upload_construction_sync, construction_data)
+
+    def _upload_construction_sync(self, construction_data: Dict[str, Any]) -> Tuple[bool, List[ScAddr], str]:
+        with SCAdapter(url=self.url, batched=self.batched, progress=self.progress,
+                       max_solutions=self.max_solutions, deadline=self.deadline) as sc_adapter:
+            success, uploaded_addrs = sc_adapter.upload_construction(construction_data)
+            return success, uploaded_addrs, sc_adapter.get_parsing_result()
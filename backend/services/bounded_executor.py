@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+
+class ExecutorQueueFull(Exception):
+    """Все потоки заняты и очередь ожидания заполнена"""
+
+
+class BoundedExecutor:
+    """
+    Пул из фиксированного числа потоков с ограниченной очередью.
+    submit не ждёт места: при заполненной очереди сразу выбрасывает ExecutorQueueFull,
+    чтобы вызывающий мог отказать клиенту (503 с Retry-After), а не копить потоки.
+    """
+
+    def __init__(self, workers: int, queue_size: int, thread_name_prefix: str = "bounded"):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.queued = 0
+        self.submitted = 0
+        self.rejected = 0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorQueueFull(f"All {self.workers} workers are busy and {self.queue_size} tasks are queued")
+        with self._lock:
+            self.queued += 1
+            self.submitted += 1
+        try:
+            return self._executor.submit(self._run, fn, *args)
+        except Exception:
+            with self._lock:
+                self.queued -= 1
+            self._slots.release()
+            raise
+
+    def _run(self, fn: Callable, *args):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "queue_size": self.queue_size,
+                "submitted": self.submitted,
+                "rejected": self.rejected
+            }
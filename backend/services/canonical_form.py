@@ -0,0 +1,344 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from entities.point import Point
+from entities.polygon import Polygon
+from entities.circle import Circle
+from entities.angle import Angle
+
+# Предел листьев дерева поиска: для больших симметричных конструкций берётся лучший из найденных
+MAX_SEARCH_LEAVES = 5000
+
+_CANONICAL_POINT = re.compile(r"P\d+")
+_CANONICAL_SEQUENCE = re.compile(r"(?:P\d+)+")
+
+
+def _value(value: Any) -> str:
+    """Числа сравниваются по значению: 5, 5.0 и "5" дают одну метку"""
+    try:
+        return repr(float(value))
+    except (TypeError, ValueError):
+        return str(value)
+
+
+@dataclass
+class CanonicalForm:
+    """
+    Каноническая форма конструкции: дайджест структуры и обратимое
+    соответствие пользовательских меток каноническим (P1, P2, ..., F1, ...).
+    """
+    digest: str
+    forward: Dict[str, str] = field(default_factory=dict)
+    reverse: Dict[str, str] = field(default_factory=dict)
+
+    def to_canonical(self, label: str) -> str:
+        return self.forward.get(label, label)
+
+    def to_user(self, label: str) -> str:
+        """Каноническая метка -> метка пользователя; отрезки и углы восстанавливаются по точкам"""
+        if label in self.reverse:
+            return self.reverse[label]
+        if _CANONICAL_SEQUENCE.fullmatch(label):
+            points = _CANONICAL_POINT.findall(label)
+            if all(point in self.reverse for point in points):
+                return "".join(self.reverse[point] for point in points)
+        return label
+
+    def canonicalize_labels(self, data: Any) -> Any:
+        """Заменяет в JSON-структуре известные метки пользователя каноническими"""
+        return self._map_strings(data, self.to_canonical)
+
+    def restore_labels(self, data: Any) -> Any:
+        """Возвращает в JSON-структуре метки пользователя"""
+        return self._map_strings(data, self.to_user)
+
+    @classmethod
+    def _map_strings(cls, data: Any, mapper) -> Any:
+        if isinstance(data, str):
+            return mapper(data)
+        if isinstance(data, list):
+            return [cls._map_strings(item, mapper) for item in data]
+        if isinstance(data, dict):
+            return {key: cls._map_strings(item, mapper) for key, item in data.items()}
+        return data
+
+
+class _LabelledGraph:
+    """Граф инцидентности конструкции: цветные вершины и помеченные дуги"""
+
+    def __init__(self):
+        self.kinds: List[str] = []
+        self.attributes: List[set] = []
+        self.arcs: set = set()
+        self.index: Dict[Tuple[str, Any], int] = {}
+
+    def vertex(self, kind: str, key: Any) -> int:
+        vertex_key = (kind, key)
+        if vertex_key not in self.index:
+            self.index[vertex_key] = len(self.kinds)
+            self.kinds.append(kind)
+            self.attributes.append(set())
+        return self.index[vertex_key]
+
+    def arc(self, source: int, target: int, label: str, oriented: bool = True) -> None:
+        self.arcs.add((source, target, label))
+        if not oriented:
+            self.arcs.add((target, source, label))
+
+    def colors(self) -> List[str]:
+        return [kind + "|" + "|".join(sorted(attrs)) for kind, attrs in zip(self.kinds, self.attributes)]
+
+
+class ConstructionCanonicalizer:
+    """
+    Строит каноническую форму по результату GeometryFactory.
+
+    Точки, отрезки (неориентированные), фигуры и углы становятся вершинами
+    графа, инцидентности и отношения - помеченными дугами. Каноническая
+    нумерация ищется уточнением раскраски (1-WL) с индивидуализацией
+    вершин и выбором минимального сертификата, поэтому ABC и MNK с одинаковыми
+    длинами, углами и отношениями дают один дайджест.
+    """
+
+    def __init__(self):
+        self.graph = _LabelledGraph()
+        # Пользовательский идентификатор -> вершина графа
+        self._names: Dict[str, int] = {}
+        self._edge_spellings: Dict[int, List[str]] = {}
+        self._angle_spellings: Dict[int, List[str]] = {}
+
+    @classmethod
+    def canonicalize(cls, point_registry: Dict[str, Point], business_objects: List[dict],
+                     relationships: list) -> CanonicalForm:
+        canonicalizer = cls()
+        canonicalizer._build(point_registry, business_objects, relationships)
+        return canonicalizer._canonical_form()
+
+    # --- Построение графа ---
+    def _build(self, point_registry: Dict[str, Point], business_objects: List[dict], relationships: list) -> None:
+        for name in point_registry:
+            self._point(name)
+
+        for obj in business_objects:
+            if obj["type"] == "polygon":
+                self._add_polygon(obj["object"], obj.get("subtype"), obj.get("input_data"))
+            elif obj["type"] == "circle":
+                self._add_circle(obj["object"], obj.get("input_data"))
+            elif obj["type"] == "construction_elements":
+                for element in obj["elements"]:
+                    if element["type"] == "point":
+                        self._point(element["point"].name)
+                    elif element["type"] == "angle":
+                        self._add_angle(element["angle"])
+                    else:
+                        self._add_element(element["type"], element.get("data", {}))
+
+        for relationship in relationships:
+            source = self._entity(relationship.source_entity)
+            target = self._entity(relationship.target_entity)
+            label = f"relationship:{relationship.type}:{relationship.name}"
+            self.graph.arc(source, target, label, oriented=relationship.oriented)
+
+    def _point(self, name: str) -> int:
+        vertex = self.graph.vertex("point", name)
+        self._names.setdefault(name, vertex)
+        return vertex
+
+    def _edge(self, vert1: str, vert2: str) -> int:
+        point1, point2 = self._point(vert1), self._point(vert2)
+        vertex = self.graph.vertex("edge", frozenset((point1, point2)))
+        self.graph.arc(vertex, point1, "endpoint")
+        self.graph.arc(vertex, point2, "endpoint")
+        spellings = self._edge_spellings.setdefault(vertex, [])
+        for spelling in (f"{vert1}{vert2}", f"{vert2}{vert1}"):
+            if spelling not in spellings:
+                spellings.append(spelling)
+            self._names.setdefault(spelling, vertex)
+        return vertex
+
+    def _figure(self, kind: str, key: Any, name: Optional[str]) -> int:
+        vertex = self.graph.vertex(kind, key)
+        if name:
+            self._names.setdefault(name, vertex)
+        return vertex
+
+    def _add_polygon(self, polygon: Polygon, subtype: Optional[str], polygon_input) -> None:
+        vertex = self._figure("polygon", id(polygon), polygon.name)
+        self.graph.attributes[vertex].add(f"type={subtype or polygon.type}")
+        for point in polygon.vertices:
+            self.graph.arc(vertex, self._point(point.name), "vertex")
+        edge_inputs = getattr(polygon_input, "edges", None) or []
+        for i, edge in enumerate(polygon.edges):
+            edge_vertex = self._edge(edge.vert1, edge.vert2)
+            if edge.length is not None:
+                unit = edge_inputs[i].length.way_of_measurement if i < len(edge_inputs) else ""
+                self.graph.attributes[edge_vertex].add(f"length={unit}:{_value(edge.length)}")
+            self.graph.arc(vertex, edge_vertex, "side")
+
+    def _add_circle(self, circle: Circle, circle_input) -> None:
+        vertex = self._figure("circle", id(circle), circle.name)
+        if circle.diameter is not None:
+            self.graph.attributes[vertex].add(f"diameter={_value(circle.diameter)}")
+        self.graph.arc(vertex, self._point(circle.center.name), "center")
+        diameter = getattr(circle_input, "diameter", None)
+        if diameter:
+            edge_vertex = self._edge(diameter.vert1, diameter.vert2)
+            if diameter.length and diameter.length.value is not None:
+                self.graph.attributes[edge_vertex].add(
+                    f"length={diameter.length.way_of_measurement}:{_value(diameter.length.value)}"
+                )
+            self.graph.arc(vertex, edge_vertex, "diameter")
+
+    def _add_angle(self, angle: Angle) -> None:
+        end1, apex, end2 = (self._point(p.name) for p in (angle.vertex1, angle.vertex2, angle.vertex3))
+        vertex = self.graph.vertex("angle", (apex, frozenset((end1, end2))))
+        if angle.angle_measure:
+            self.graph.attributes[vertex].add(
+                f"measure={angle.angle_measure.way_of_measurement}:{_value(angle.angle_measure.value)}"
+            )
+        self.graph.arc(vertex, apex, "angle_vertex")
+        self.graph.arc(vertex, end1, "angle_side")
+        self.graph.arc(vertex, end2, "angle_side")
+
+        names = [angle.vertex1.name, angle.vertex2.name, angle.vertex3.name]
+        spellings = self._angle_spellings.setdefault(vertex, [])
+        for spelling in ("".join(names), "".join(reversed(names))):
+            if spelling not in spellings:
+                spellings.append(spelling)
+            self._names.setdefault(spelling, vertex)
+        if angle.name:
+            self._names.setdefault(angle.name, vertex)
+
+    def _add_element(self, element_type: str, data: dict) -> None:
+        """Прочие элементы конструкции: тип и атрибуты - в цвет, точки - дугами"""
+        vertex = self.graph.vertex(f"element:{element_type}", len(self.graph.kinds))
+        for key in sorted(data):
+            if key in ("type", "name") or data[key] is None:
+                continue
+            if key.startswith("vert"):
+                self.graph.arc(vertex, self._point(data[key]), "element_point")
+            else:
+                self.graph.attributes[vertex].add(f"{key}={json.dumps(data[key], sort_keys=True, default=str)}")
+        if data.get("name"):
+            self._names.setdefault(data["name"], vertex)
+
+    def _entity(self, name: str) -> int:
+        """Вершина для участника отношения; неизвестные имена остаются литералами"""
+        if name in self._names:
+            return self._names[name]
+        vertex = self.graph.vertex("entity", name)
+        self.graph.attributes[vertex].add(f"name={name}")
+        return vertex
+
+    # --- Каноническая нумерация ---
+    def _canonical_form(self) -> CanonicalForm:
+        labelling, certificate = self._canonical_labelling()
+        digest = hashlib.sha256(json.dumps(certificate, separators=(",", ":")).encode("utf-8")).hexdigest()
+        return self._build_mapping(digest, labelling)
+
+    def _canonical_labelling(self) -> Tuple[List[int], list]:
+        graph = self.graph
+        size = len(graph.kinds)
+        initial = graph.colors()
+        out_arcs: List[List[Tuple[str, int]]] = [[] for _ in range(size)]
+        in_arcs: List[List[Tuple[str, int]]] = [[] for _ in range(size)]
+        for source, target, label in graph.arcs:
+            out_arcs[source].append((label, target))
+            in_arcs[target].append((label, source))
+
+        def refine(colors: List[int]) -> List[int]:
+            while True:
+                signatures = [
+                    (
+                        colors[v],
+                        tuple(sorted((label, colors[w]) for label, w in out_arcs[v])),
+                        tuple(sorted((label, colors[w]) for label, w in in_arcs[v]))
+                    )
+                    for v in range(size)
+                ]
+                ranks = {signature: rank for rank, signature in enumerate(sorted(set(signatures)))}
+                refined = [ranks[signature] for signature in signatures]
+                if len(ranks) == len(set(colors)):
+                    return refined
+                colors = refined
+
+        def certificate(colors: List[int]) -> list:
+            order = sorted(range(size), key=lambda v: colors[v])
+            return [
+                [initial[v] for v in order],
+                sorted([colors[s], colors[t], label] for s, t, label in graph.arcs)
+            ]
+
+        palette = {color: rank for rank, color in enumerate(sorted(set(initial)))}
+        start = refine([palette[color] for color in initial])
+        best: List[Any] = [None, None]
+        leaves = [0]
+
+        def search(colors: List[int]) -> None:
+            if leaves[0] >= MAX_SEARCH_LEAVES:
+                return
+            cells: Dict[int, List[int]] = {}
+            for v, color in enumerate(colors):
+                cells.setdefault(color, []).append(v)
+            target_cell = min((color for color, members in cells.items() if len(members) > 1), default=None)
+            if target_cell is None:
+                leaves[0] += 1
+                leaf_certificate = certificate(colors)
+                if best[1] is None or leaf_certificate < best[1]:
+                    best[0], best[1] = colors, leaf_certificate
+                return
+            for v in cells[target_cell]:
+                # Индивидуализация: v получает цвет, предшествующий её клетке
+                individualized = [2 * color + 1 for color in colors]
+                individualized[v] = 2 * target_cell
+                search(refine(individualized))
+
+        search(start)
+        return best[0] or [], best[1] or [[], []]
+
+    def _build_mapping(self, digest: str, labelling: List[int]) -> CanonicalForm:
+        graph = self.graph
+        order = sorted(range(len(graph.kinds)), key=lambda v: labelling[v])
+        canonical: Dict[int, str] = {}
+        point_number = figure_number = 0
+        for v in order:
+            if graph.kinds[v] == "point":
+                point_number += 1
+                canonical[v] = f"P{point_number}"
+            elif graph.kinds[v] in ("polygon", "circle") or graph.kinds[v].startswith("element:"):
+                figure_number += 1
+                canonical[v] = f"F{figure_number}"
+
+        def point_label(vertex: int) -> str:
+            return canonical[vertex]
+
+        form = CanonicalForm(digest=digest)
+        for (kind, key), vertex in graph.index.items():
+            if kind == "edge":
+                ends = sorted((point_label(p) for p in key), key=lambda label: int(label[1:]))
+                canonical[vertex] = "".join(ends)
+            elif kind == "angle":
+                apex, ends = key
+                ends = sorted((point_label(p) for p in ends), key=lambda label: int(label[1:]))
+                canonical[vertex] = ends[0] + point_label(apex) + ends[-1]
+
+        for name, vertex in self._names.items():
+            if vertex in canonical:
+                form.forward[name] = canonical[vertex]
+        vertex_keys = {vertex: vertex_key for vertex_key, vertex in graph.index.items()}
+        for vertex, label in canonical.items():
+            kind, key = vertex_keys[vertex]
+            if kind == "point":
+                form.reverse[label] = key
+            elif kind == "edge":
+                form.reverse[label] = self._edge_spellings[vertex][0]
+            elif kind == "angle":
+                form.reverse[label] = self._angle_spellings[vertex][0]
+        # Имена фигур и именованных углов восстанавливаются в последнюю очередь
+        for name, vertex in self._names.items():
+            kind = graph.kinds[vertex]
+            if kind in ("polygon", "circle") or kind.startswith("element:"):
+                form.reverse.setdefault(canonical[vertex], name)
+        return form
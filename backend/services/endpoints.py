@@ -1,146 +1,299 @@
-from fastapi import HTTPException, status
+import asyncio
+from typing import Awaitable, Optional, Tuple
+from fastapi import Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from dto.input_dtos import ComplexConstructionInput, PolygonInput, CircleInput, ConstructionElementsContainerInput, RelationshipInput
 from factory.factory import GeometryFactory
-from .sc_adapter import SCAdapter
-import json
+from .async_sc_adapter import AsyncSCAdapter
+from .result_cache import ResultCache
+from .canonical_form import CanonicalForm, ConstructionCanonicalizer
+from .serialization import FastJSONResponse, dumps, loads
+from .job_manager import JobManager, JobQueueFull, ProgressCallback
+from .request_deadline import DeadlineExceeded, RequestDeadline
+from config import MAX_SOLUTIONS_LIMIT, REQUEST_DEADLINE, REQUEST_DEADLINE_MAX
 
-async def upload_construction(construction_input: ComplexConstructionInput):
+# Как часто синхронный запрос проверяет, не отключился ли клиент, секунды
+DISCONNECT_CHECK_INTERVAL = 1.0
+
+async def upload_construction(
+    construction_input: ComplexConstructionInput,
+    request: Request,
+    sync: bool = Query(False, description="Дождаться результата в этом же запросе вместо создания задания"),
+    max_solutions: int = Query(1, ge=1, le=MAX_SOLUTIONS_LIMIT,
+                               description="Сколько найденных задач решить; при значении больше 1 "
+                                           "ответ содержит ранжированный список solutions"),
+    timeout: Optional[float] = Query(None, gt=0, le=REQUEST_DEADLINE_MAX,
+                                     description="Бюджет времени на очередь, загрузку и все этапы агентов, "
+                                                 "секунды; по истечении агенты останавливаются и ответ - 504")
+):
     """
-    Загрузка и валидация геометрической конструкции
+    Загрузка и валидация геометрической конструкции.
+    По умолчанию создаёт асинхронное задание и сразу отвечает 202 с его идентификатором;
+    с sync=true держит соединение до конца цепочки агентов и возвращает результат
+    (если клиент отключится раньше, агенты останавливаются).
     """
     try:
-        business_objects = []
-        point_registry = {}
-        
-        for figure_input in construction_input.figures:
-            if isinstance(figure_input, PolygonInput):
-                polygon = GeometryFactory.create_polygon(figure_input, point_registry)
-                business_objects.append({
-                    "type": "polygon",
-                    "subtype": figure_input.type,
-                    "object": polygon,
-                    "name": figure_input.name,
-                    "input_data": figure_input
-                })
-                
-            elif isinstance(figure_input, CircleInput):
-                circle = GeometryFactory.create_circle(figure_input, point_registry)
-                business_objects.append({
-                    "type": "circle", 
-                    "object": circle,
-                    "name": circle.name,
-                    "input_data": figure_input
-                })
-                
-            elif isinstance(figure_input, ConstructionElementsContainerInput):
-                elements = []
-                for elem in figure_input.construction_elements:
-                    if elem.type == "general_point" and elem.name:
-                        point = GeometryFactory.create_point(elem.name, point_registry)
-                        elements.append({"type": "point", "point": point})
-                    elif elem.type == "angle":
-                        angle = GeometryFactory.create_angle(elem, point_registry)
-                        elements.append({"type": "angle", "angle": angle})
-                    else:
-                        elements.append({"type": elem.type, "data": elem.model_dump()})
-                
-                business_objects.append({
-                    "type": "construction_elements",
-                    "elements": elements
-                })
-        
-        result = {
-            "construction": construction_input.name,
-            "total_figures": len(business_objects),
-            "total_points": len(point_registry),
-            "points": list(point_registry.keys()),
-            "figures": [],
-            "construction_elements": [],
-            "relationships": []
-        }
-        
-        for obj in business_objects:
-            if obj["type"] == "polygon":
-                polygon = obj["object"]
-                edge_names = [f"{edge.vert1}{edge.vert2}" for edge in polygon.edges]
-                result["figures"].append({
-                    "type": obj["subtype"],
-                    "name": obj["name"],
-                    "vertices": [v.name for v in polygon.vertices], 
-                    "edges": edge_names,
-                    "vertex_count": len(polygon.vertices),
-                    "input_data": obj["input_data"]
-                })
-            elif obj["type"] == "circle":
-                circle = obj["object"]
-                circle_input = obj["input_data"]
-                
-                diameter_info = None
-                if circle_input.diameter:
-                    diameter_info = {
-                        "vert1": circle_input.diameter.vert1,
-                        "vert2": circle_input.diameter.vert2,
-                        "length": circle_input.diameter.length.dict() if circle_input.diameter.length else None
-                    }
-                
-                result["figures"].append({
-                    "type": "circle",
-                    "name": circle.name, 
-                    "center": circle.center.name,
-                    "diameter": circle.diameter,
-                    "radius": circle.radius,
-                    "circumference": circle.circumference,
-                    "diameter_edge": diameter_info
-                })
-            elif obj["type"] == "construction_elements":
-                for element in obj["elements"]:
-                    if element["type"] == "point":
-                        result["construction_elements"].append({
-                            "type": "point",
-                            "name": element["point"].name
-                        })
-                    elif element["type"] == "angle":
-                        angle = element["angle"]
-                        result["construction_elements"].append({
-                            "type": "angle",
-                            "name": angle.name,
-                            "vertex1": angle.vertex1.name,
-                            "vertex2": angle.vertex2.name,
-                            "vertex3": angle.vertex3.name,
-                            "angle": angle.angle_measure.dict() if angle.angle_measure else None
-                        })
-                    else:
-                        result["construction_elements"].append(element)
-        
-        for relationship in construction_input.relationships:
-            result["relationships"].append({
-                "type": relationship.type,
-                "name": relationship.name,
-                "source_entity": relationship.source_entity,
-                "target_entity": relationship.target_entity,
-                "oriented": relationship.oriented 
+        payload, canonical_form = _prepare_construction(construction_input)
+    except Exception as e:
+        raise _processing_error(e)
+    deadline = RequestDeadline(timeout or REQUEST_DEADLINE)
+
+    if sync:
+        return FastJSONResponse(await _cancel_on_disconnect(
+            request, deadline, _solve_construction(payload, canonical_form, max_solutions=max_solutions,
+                                                   deadline=deadline)
+        ))
+
+    try:
+        job = JobManager.instance().submit(
+            lambda progress: _solve_construction(payload, canonical_form, progress, max_solutions, deadline),
+            deadline=deadline
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return FastJSONResponse(
+        job.describe(),
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+async def cancel_job(job_id: str):
+    """Отмена задания: агенты останавливаются, задание завершается с ошибкой 504"""
+    job = JobManager.instance().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if job.done:
+        return FastJSONResponse(job.describe())
+    JobManager.instance().cancel(job)
+    return FastJSONResponse(job.describe(), status_code=status.HTTP_202_ACCEPTED)
+
+async def get_job_status(job_id: str):
+    """Статус задания и прогресс по этапам"""
+    job = JobManager.instance().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return FastJSONResponse(job.describe())
+
+async def get_job_result(job_id: str):
+    """Результат задания; пока задание выполняется - 202 со статусом"""
+    job = JobManager.instance().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=job.error_status, detail=job.error)
+    if job.status != "completed":
+        return FastJSONResponse(job.describe(), status_code=status.HTTP_202_ACCEPTED)
+    return FastJSONResponse(job.result)
+
+async def stream_job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-sent events задания: этапы (загрузка, поиск с числом кандидатов,
+    извлечение, разбор), каждый шаг решения отдельным событием и завершение.
+    Переподключение с Last-Event-ID продолжает поток без повторов.
+    """
+    job = JobManager.instance().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    async def event_source():
+        async for index, event in job.stream(start):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {index}\nevent: {event['event']}\ndata: {dumps(event['data']).decode('utf-8')}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _prepare_construction(construction_input: ComplexConstructionInput) -> Tuple[dict, CanonicalForm]:
+    """Создаёт объекты фабрики, данные для SCAdapter и каноническую форму конструкции"""
+    business_objects = []
+    point_registry = {}
+    # Данные для SCAdapter заполняются в том же проходе, что и объекты фабрики
+    result = {
+        "construction": construction_input.name,
+        "total_figures": 0,
+        "total_points": 0,
+        "points": [],
+        "figures": [],
+        "construction_elements": [],
+        "relationships": []
+    }
+    
+    for figure_input in construction_input.figures:
+        if isinstance(figure_input, PolygonInput):
+            polygon = GeometryFactory.create_polygon(figure_input, point_registry)
+            business_objects.append({
+                "type": "polygon",
+                "subtype": figure_input.type,
+                "object": polygon,
+                "name": figure_input.name,
+                "input_data": figure_input
+            })
+            result["figures"].append({
+                "type": figure_input.type,
+                "name": figure_input.name,
+                "vertices": [v.name for v in polygon.vertices], 
+                "edges": [f"{edge.vert1}{edge.vert2}" for edge in polygon.edges],
+                "vertex_count": len(polygon.vertices),
+                "input_data": figure_input
+            })
+            
+        elif isinstance(figure_input, CircleInput):
+            circle = GeometryFactory.create_circle(figure_input, point_registry)
+            business_objects.append({
+                "type": "circle", 
+                "object": circle,
+                "name": circle.name,
+                "input_data": figure_input
             })
+            
+            diameter_info = None
+            if figure_input.diameter:
+                diameter_info = {
+                    "vert1": figure_input.diameter.vert1,
+                    "vert2": figure_input.diameter.vert2,
+                    "length": figure_input.diameter.length.model_dump() if figure_input.diameter.length else None
+                }
+            
+            result["figures"].append({
+                "type": "circle",
+                "name": circle.name, 
+                "center": circle.center.name,
+                "diameter": circle.diameter,
+                "radius": circle.radius,
+                "circumference": circle.circumference,
+                "diameter_edge": diameter_info
+            })
+            
+        elif isinstance(figure_input, ConstructionElementsContainerInput):
+            elements = []
+            for elem in figure_input.construction_elements:
+                if elem.type == "general_point" and elem.name:
+                    point = GeometryFactory.create_point(elem.name, point_registry)
+                    elements.append({"type": "point", "point": point})
+                    result["construction_elements"].append({
+                        "type": "point",
+                        "name": point.name
+                    })
+                elif elem.type == "angle":
+                    angle = GeometryFactory.create_angle(elem, point_registry)
+                    elements.append({"type": "angle", "angle": angle})
+                    result["construction_elements"].append({
+                        "type": "angle",
+                        "name": angle.name,
+                        "vertex1": angle.vertex1.name,
+                        "vertex2": angle.vertex2.name,
+                        "vertex3": angle.vertex3.name,
+                        "angle": angle.angle_measure.model_dump() if angle.angle_measure else None
+                    })
+                else:
+                    element = {"type": elem.type, "data": elem.model_dump()}
+                    elements.append(element)
+                    result["construction_elements"].append(element)
+            
+            business_objects.append({
+                "type": "construction_elements",
+                "elements": elements
+            })
+    
+    result["total_figures"] = len(business_objects)
+    result["total_points"] = len(point_registry)
+    result["points"] = list(point_registry.keys())
+    
+    for relationship in construction_input.relationships:
+        result["relationships"].append({
+            "type": relationship.type,
+            "name": relationship.name,
+            "source_entity": relationship.source_entity,
+            "target_entity": relationship.target_entity,
+            "oriented": relationship.oriented 
+        })
+    
+    # Кэш ключуется структурой, а не буквами: ABC и MNK попадают в одну запись
+    canonical_form = ConstructionCanonicalizer.canonicalize(
+        point_registry, business_objects, construction_input.relationships
+    )
+    return result, canonical_form
+
+async def _cancel_on_disconnect(request: Request, deadline: RequestDeadline, work: Awaitable):
+    """Ждёт результат; если клиент отключился, отменяет бюджет запроса, и агенты останавливаются"""
+    task = asyncio.ensure_future(work)
+    while not task.done():
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_CHECK_INTERVAL)
+        if not done and not deadline.cancelled and await request.is_disconnected():
+            deadline.cancel("Client disconnected")
+    return task.result()
+
+async def _solve_construction(payload: dict, canonical_form: CanonicalForm,
+                             progress: Optional[ProgressCallback] = None, max_solutions: int = 1,
+                             deadline: Optional[RequestDeadline] = None):
+    """Возвращает JSON шагов решения: из кэша или после загрузки и цепочки агентов"""
+    try:
+        cache = ResultCache.instance()
+        # Ответ с несколькими решениями кэшируется отдельно от ответа с одним
+        cache_key = canonical_form.digest if max_solutions == 1 else f"{canonical_form.digest}:{max_solutions}"
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            restored_result = canonical_form.restore_labels(loads(cached_result))
+            _report_steps(progress, restored_result)
+            return dumps(restored_result)
         
+        # Бюджет учитывает и ожидание в очереди заданий
+        deadline = deadline or RequestDeadline()
+        deadline.check()
         parsing_result = ""
+        cacheable = False
         try:
-            with SCAdapter() as sc_adapter:
-                success, uploaded_addrs = sc_adapter.upload_construction(result)
-                if success:
-                    parsing_result = sc_adapter.get_parsing_result()
-                else:
-                    parsing_result = "Ошибка загрузки в SC-память"
+            # Загрузка и цепочка агентов выполняются вне цикла событий
+            success, uploaded_addrs, parsing_result = await AsyncSCAdapter(
+                progress=progress, max_solutions=max_solutions, deadline=deadline
+            ).upload_construction(payload)
+            if not success:
+                parsing_result = "Ошибка загрузки в SC-память"
+            cacheable = success and bool(parsing_result)
         except Exception as e:
             parsing_result = f"SC-memory error: {e}"
+        # Цепочку прервал срок или отмена: частичный результат не отдаём и не кэшируем
+        if not cacheable:
+            deadline.check()
         
-        return json.loads(parsing_result)
+        # Разбираем результат один раз (проверка и кэш), клиенту отдаём строку из sc-link как есть
+        parsed_result = loads(parsing_result)
+        _report_steps(progress, parsed_result)
+        if cacheable:
+            cache.set(cache_key, dumps(canonical_form.canonicalize_labels(parsed_result)).decode("utf-8"))
+        return parsing_result
         
-    except ValueError as e:
-        raise HTTPException(
+    except Exception as e:
+        raise _processing_error(e)
+
+def _report_steps(progress: Optional[ProgressCallback], parsed_result) -> None:
+    """Отправляет каждый шаг решения отдельным событием прогресса"""
+    if progress is None or not isinstance(parsed_result, dict):
+        return
+    steps = parsed_result.get("steps") or []
+    for index, step in enumerate(steps):
+        progress("parse", "step", {"index": index, "total": len(steps), "step": step})
+
+def _processing_error(e: Exception) -> HTTPException:
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Deadline exceeded: {str(e)}"
+        )
+    if isinstance(e, ValueError):
+        return HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"Validation error: {str(e)}"
         )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Processing error: {str(e)}"
-        )
\ No newline at end of file
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Processing error: {str(e)}"
+    )
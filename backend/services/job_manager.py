@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RESULT_TTL
+from .request_deadline import RequestDeadline
+
+# Этапы обработки конструкции в порядке выполнения
+JOB_STAGES = ["upload", "search", "extract", "parse"]
+
+# Колбэк прогресса: (этап, состояние, подробности)
+ProgressCallback = Callable[..., None]
+
+# Пауза, после которой поток событий отправляет keep-alive, секунды
+EVENT_KEEPALIVE_INTERVAL = 15
+# Как часто удалять задания с истёкшим сроком хранения (не реже JOB_RESULT_TTL), секунды
+EVICTION_INTERVAL = 60
+
+
+class JobQueueFull(Exception):
+    """Очередь заданий заполнена"""
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = "queued"  # queued, running, completed, failed
+    stages: Dict[str, str] = field(default_factory=lambda: {stage: "pending" for stage in JOB_STAGES})
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+    events: List[dict] = field(default_factory=list)
+    # Бюджет времени задания; cancel() останавливает его агентов
+    deadline: Optional[RequestDeadline] = field(default=None, repr=False)
+    _listeners: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def progress(self, stage: str, state: str, details: Optional[dict] = None) -> None:
+        """Отметка этапа; вызывается из потока SC-адаптера"""
+        if state in ("running", "completed", "failed"):
+            self.stages[stage] = state
+        self.emit("step" if state == "step" else "stage", {"stage": stage, "state": state, **(details or {})})
+
+    def emit(self, event: str, data: dict) -> None:
+        """Добавляет событие и будит подписчиков (из любого потока)"""
+        with self._lock:
+            self.events.append({"event": event, "data": data})
+            listeners = list(self._listeners)
+        for loop, waiter in listeners:
+            loop.call_soon_threadsafe(waiter.set)
+
+    async def stream(self, start: int = 0) -> AsyncIterator[Tuple[int, Optional[dict]]]:
+        """
+        Отдаёт (номер, событие) начиная с start и далее по мере появления;
+        None - пауза для keep-alive. Завершается после события completed или failed.
+        """
+        waiter = asyncio.Event()
+        listener = (asyncio.get_running_loop(), waiter)
+        with self._lock:
+            self._listeners.append(listener)
+        try:
+            index = start
+            while True:
+                waiter.clear()
+                with self._lock:
+                    pending = self.events[index:]
+                for event in pending:
+                    yield index, event
+                    index += 1
+                    if event["event"] in ("completed", "failed"):
+                        return
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=EVENT_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield index, None
+        finally:
+            with self._lock:
+                self._listeners.remove(listener)
+
+    def describe(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": dict(self.stages),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "status_url": f"/jobs/{self.id}",
+            "result_url": f"/jobs/{self.id}/result",
+            "events_url": f"/jobs/{self.id}/events"
+        }
+
+
+class JobManager:
+    """
+    Асинхронные задания обработки конструкций.
+    Задания ставятся в ограниченную очередь и выполняются фиксированным числом
+    воркеров в цикле событий; завершённые задания удаляются через JOB_RESULT_TTL секунд
+    (фоновой задачей, а также при submit и get).
+    """
+
+    _instance: Optional["JobManager"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE,
+                 result_ttl: float = JOB_RESULT_TTL):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.result_ttl = result_ttl
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def instance(cls) -> "JobManager":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    # --- Жизненный цикл ---
+    def start(self) -> None:
+        """Запускает воркеры в текущем цикле событий"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._evictor()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    # --- Задания ---
+    def submit(self, run: Callable[[ProgressCallback], Awaitable[Any]],
+               deadline: Optional[RequestDeadline] = None) -> Job:
+        """Ставит задание в очередь; run получает колбэк прогресса и возвращает результат"""
+        self.start()
+        self.evict_expired()
+        job = Job(id=uuid.uuid4().hex, deadline=deadline)
+        try:
+            self._queue.put_nowait((job, run))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue is full ({self.queue_size} jobs)")
+        self._jobs[job.id] = job
+        return job
+
+    def cancel(self, job: Job) -> None:
+        """Отменяет задание: ожидающее в очереди не запустится, выполняющееся остановит агентов"""
+        if job.deadline is not None:
+            job.deadline.cancel("Cancelled by client")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.evict_expired()
+        return self._jobs.get(job_id)
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self) -> dict:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "jobs": statuses
+        }
+
+    async def _evictor(self) -> None:
+        """Удаляет устаревшие задания и без новых запросов"""
+        interval = max(1.0, min(EVICTION_INTERVAL, self.result_ttl))
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_expired()
+
+    async def _worker(self) -> None:
+        while True:
+            job, run = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            job.emit("running", {})
+            try:
+                job.result = await run(job.progress)
+                job.status = "completed"
+            except Exception as e:
+                job.error = getattr(e, "detail", None) or str(e)
+                job.error_status = getattr(e, "status_code", 500)
+                job.status = "failed"
+                print(f"Job {job.id} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+                job.emit(job.status, {"error": job.error} if job.error else {})
+                self._queue.task_done()
@@ -0,0 +1,124 @@
+import threading
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.constants.sc_type import ScType
+from sc_client.models import ScAddr, ScIdtfResolveParams
+from typing import Dict, Optional
+
+# Постоянный словарь понятий, которые используют загрузка конструкции и цепочка агентов
+FIXED_VOCABULARY: Dict[str, ScType] = {
+    # Классы фигур и точек
+    "concept_point": sc_type.CONST_NODE_CLASS,
+    "concept_circle": sc_type.CONST_NODE_CLASS,
+    "concept_triangle": sc_type.CONST_NODE_CLASS,
+    "concept_quadrilateral": sc_type.CONST_NODE_CLASS,
+    "concept_pentagon": sc_type.CONST_NODE_CLASS,
+    "concept_hexagon": sc_type.CONST_NODE_CLASS,
+    "concept_heptagon": sc_type.CONST_NODE_CLASS,
+    "concept_polygon": sc_type.CONST_NODE_CLASS,
+    # Отношения фигур
+    "nrel_angle": sc_type.CONST_NODE_NON_ROLE,
+    "nrel_side": sc_type.CONST_NODE_NON_ROLE,
+    "nrel_center": sc_type.CONST_NODE_NON_ROLE,
+    "nrel_endpoint": sc_type.CONST_NODE_NON_ROLE,
+    "nrel_diameter": sc_type.CONST_NODE_NON_ROLE,
+    "nrel_vertex_of_angle": sc_type.CONST_NODE_NON_ROLE,
+    "nrel_side_of_angle": sc_type.CONST_NODE_NON_ROLE,
+    # Величины
+    "concept_length": sc_type.CONST_NODE_SUPERCLASS,
+    "concept_angular_measure": sc_type.CONST_NODE_SUPERCLASS,
+    "number": sc_type.CONST_NODE_CLASS,
+    "decimal_numeral_system": sc_type.CONST_NODE_CLASS,
+    "nrel_idtf": sc_type.CONST_NODE_NON_ROLE,
+    "nrel_scoped_idtf": sc_type.CONST_NODE_NON_ROLE,
+    # Действия и агенты
+    "action": sc_type.CONST_NODE_CLASS,
+    "action_initiated": sc_type.CONST_NODE_CLASS,
+    "action_finished": sc_type.CONST_NODE_CLASS,
+    "action_finished_successfully": sc_type.CONST_NODE_CLASS,
+    "action_finished_unsuccessfully": sc_type.CONST_NODE_CLASS,
+    "concept_transient_element": sc_type.CONST_NODE_CLASS,
+    "action_cancelled": sc_type.CONST_NODE_CLASS,
+    "nrel_deadline": sc_type.CONST_NODE_NON_ROLE,
+    "rrel_1": sc_type.CONST_NODE_ROLE,
+    "rrel_2": sc_type.CONST_NODE_ROLE,
+    "nrel_result": sc_type.CONST_NODE_NON_ROLE,
+    "action_search_geometry_constructions": sc_type.CONST_NODE_CLASS,
+    "action_extract_geometry_sequence": sc_type.CONST_NODE_CLASS,
+    "action_parse_geometry_sequence": sc_type.CONST_NODE_CLASS,
+    "action_solve_geometry_construction": sc_type.CONST_NODE_CLASS,
+}
+
+
+class KeynodeRegistry:
+    """
+    Кэш ключевых узлов на уровне процесса.
+    Постоянный словарь разрешается одним запросом (prefetch), динамические
+    имена (nrel_measurement_in_<unit>, rrel_<name>, ...) - лениво и запоминаются.
+    """
+
+    _addrs: Dict[str, ScAddr] = {}
+    _lock = threading.Lock()
+    _prefetched = False
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def prefetch(cls, vocabulary: Optional[Dict[str, ScType]] = None) -> None:
+        """Разрешает весь словарь одним resolve_keynodes"""
+        vocabulary = vocabulary or FIXED_VOCABULARY
+        identifiers = [idtf for idtf in vocabulary if idtf not in cls._addrs]
+        if identifiers:
+            params = [ScIdtfResolveParams(idtf=idtf, type=vocabulary[idtf]) for idtf in identifiers]
+            addrs = client.resolve_keynodes(*params)
+            with cls._lock:
+                for idtf, addr in zip(identifiers, addrs):
+                    if addr.is_valid():
+                        cls._addrs[idtf] = addr
+        cls._prefetched = True
+        print(f"Keynode registry prefetched {len(identifiers)} keynodes")
+
+    @classmethod
+    def ensure_prefetched(cls) -> None:
+        if not cls._prefetched:
+            cls.prefetch()
+
+    @classmethod
+    def resolve(cls, identifier: str, node_type: Optional[ScType] = None) -> ScAddr:
+        """Возвращает ключевой узел из памяти, при промахе - разрешает и запоминает"""
+        addr = cls._addrs.get(identifier)
+        if addr is not None:
+            with cls._lock:
+                cls.hits += 1
+            return addr
+
+        params = ScIdtfResolveParams(idtf=identifier, type=node_type)
+        addr = client.resolve_keynodes(params)[0]
+        with cls._lock:
+            cls.misses += 1
+            if addr.is_valid():
+                cls._addrs[identifier] = addr
+        return addr
+
+    @classmethod
+    def get_cached(cls, identifier: str) -> Optional[ScAddr]:
+        return cls._addrs.get(identifier)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._addrs = {}
+            cls._prefetched = False
+            cls.hits = 0
+            cls.misses = 0
+
+    @classmethod
+    def stats(cls) -> dict:
+        total = cls.hits + cls.misses
+        return {
+            "cached": len(cls._addrs),
+            "prefetched": cls._prefetched,
+            "hits": cls.hits,
+            "misses": cls.misses,
+            "hit_rate": cls.hits / total if total else 0.0
+        }
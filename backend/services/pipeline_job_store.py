@@ -0,0 +1,240 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from config import PIPELINE_JOB_MAX_ENTRIES, PIPELINE_JOB_MAX_BYTES, PIPELINE_JOB_TTL, PIPELINE_JOB_STORE_PATH
+from .serialization import dumps, loads
+
+
+class PipelineJobStoreFull(Exception):
+    """В хранилище нет места: все записи заняты выполняющимися пайплайнами"""
+
+
+class PipelineJobStore:
+    """
+    Хранилище заданий pipeline_runner.
+    Идентификаторы уникальны (uuid4), число записей и объём результатов ограничены:
+    при переполнении вытесняются самые старые завершённые задания, завершённые
+    задания удаляются через PIPELINE_JOB_TTL секунд (незавершённые - через тот же срок
+    после создания: их процесс, скорее всего, остановлен). Результат хранится
+    сериализованным, поэтому его размер учитывается точно.
+    С PIPELINE_JOB_STORE_PATH записи живут в SQLite-файле: переживают перезапуск
+    и видны всем воркерам uvicorn.
+    """
+
+    _instance: Optional["PipelineJobStore"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = PIPELINE_JOB_MAX_ENTRIES, max_bytes: int = PIPELINE_JOB_MAX_BYTES,
+                 ttl: float = PIPELINE_JOB_TTL, path: Optional[str] = PIPELINE_JOB_STORE_PATH):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path or None
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self._db = self._open_db(self.path)
+
+        self.evicted = 0
+        self.expired = 0
+
+    @classmethod
+    def instance(cls) -> "PipelineJobStore":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    # --- Жизненный цикл задания ---
+    def create(self) -> str:
+        """Регистрирует новое задание в статусе processing и возвращает его идентификатор"""
+        job_id = f"pipeline_{uuid.uuid4().hex}"
+        created_at = time.time()
+        with self._lock:
+            self._evict_expired(created_at)
+            if self._count() >= self.max_entries and not self._evict_oldest_finished():
+                raise PipelineJobStoreFull(f"Job store is full ({self.max_entries} running pipelines)")
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, created_at, size) VALUES (?, 'processing', ?, 0)",
+                    (job_id, created_at)
+                )
+                self._db.commit()
+            else:
+                self._jobs[job_id] = {
+                    "status": "processing", "created_at": created_at, "finished_at": None,
+                    "result": None, "error": None, "size": 0
+                }
+        return job_id
+
+    def complete(self, job_id: str, result: Any) -> None:
+        self._finish(job_id, "completed", dumps(result).decode("utf-8"), None)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._finish(job_id, "error", None, error)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Задание со статусом и разобранным результатом; None - нет или уже удалено"""
+        with self._lock:
+            self._evict_expired(time.time())
+            entry = self._load(job_id)
+        return self._describe(job_id, entry) if entry is not None else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._evict_expired(time.time())
+            if self._db is not None:
+                rows = self._db.execute(
+                    "SELECT id, status, created_at, finished_at, result, error, size FROM jobs ORDER BY created_at"
+                ).fetchall()
+                entries = [(row[0], self._row_to_entry(row)) for row in rows]
+            else:
+                entries = [(job_id, dict(entry)) for job_id, entry in self._jobs.items()]
+        return [self._describe(job_id, entry) for job_id, entry in entries]
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            if self._db is not None:
+                cursor = self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                self._db.commit()
+                return cursor.rowcount > 0
+            return self._jobs.pop(job_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._db is not None:
+                counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+                total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM jobs").fetchone()[0]
+            else:
+                counts: Dict[str, int] = {}
+                for entry in self._jobs.values():
+                    counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+                total_bytes = sum(entry["size"] for entry in self._jobs.values())
+            return {
+                "entries": sum(counts.values()),
+                "max_entries": self.max_entries,
+                "statuses": counts,
+                "result_bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "backend": self.path or "memory",
+                "evicted": self.evicted,
+                "expired": self.expired
+            }
+
+    # --- Вспомогательные методы ---
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str]) -> None:
+        finished_at = time.time()
+        # Размер в байтах UTF-8: результаты в основном кириллические, символов в них вдвое меньше
+        size = len((result or "").encode("utf-8")) + len((error or "").encode("utf-8"))
+        with self._lock:
+            if self._db is not None:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, size = ? WHERE id = ?",
+                    (status, finished_at, result, error, size, job_id)
+                )
+                self._db.commit()
+            else:
+                entry = self._jobs.get(job_id)
+                if entry is None:
+                    return
+                entry.update(status=status, finished_at=finished_at, result=result, error=error, size=size)
+            # Объём ограничен: вытесняем старые завершённые, но не только что завершённое задание
+            while self._total_bytes() > self.max_bytes and self._evict_oldest_finished(keep=job_id):
+                pass
+
+    def _describe(self, job_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "pipeline_id": job_id,
+            "status": entry["status"],
+            "created_at": entry["created_at"],
+            "finished_at": entry["finished_at"],
+            "result": loads(entry["result"]) if entry["result"] is not None else None,
+            "error": entry["error"]
+        }
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT id, status, created_at, finished_at, result, error, size FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return self._row_to_entry(row) if row is not None else None
+        entry = self._jobs.get(job_id)
+        return dict(entry) if entry is not None else None
+
+    @staticmethod
+    def _row_to_entry(row) -> Dict[str, Any]:
+        _, status, created_at, finished_at, result, error, size = row
+        return {
+            "status": status, "created_at": created_at, "finished_at": finished_at,
+            "result": result, "error": error, "size": size
+        }
+
+    def _count(self) -> int:
+        if self._db is not None:
+            return self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return len(self._jobs)
+
+    def _total_bytes(self) -> int:
+        if self._db is not None:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM jobs").fetchone()[0]
+        return sum(entry["size"] for entry in self._jobs.values())
+
+    def _evict_oldest_finished(self, keep: Optional[str] = None) -> bool:
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE status != 'processing' AND id != ? ORDER BY finished_at LIMIT 1",
+                (keep or "",)
+            ).fetchone()
+            if row is None:
+                return False
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (row[0],))
+            self._db.commit()
+        else:
+            finished = [
+                (entry["finished_at"], job_id) for job_id, entry in self._jobs.items()
+                if entry["status"] != "processing" and job_id != keep
+            ]
+            if not finished:
+                return False
+            del self._jobs[min(finished)[1]]
+        self.evicted += 1
+        return True
+
+    def _evict_expired(self, now: float) -> None:
+        deadline = now - self.ttl
+        if self._db is not None:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE (status != 'processing' AND finished_at < ?) "
+                "OR (status = 'processing' AND created_at < ?)", (deadline, deadline)
+            )
+            self._db.commit()
+            self.expired += cursor.rowcount
+            return
+        expired = [
+            job_id for job_id, entry in self._jobs.items()
+            if (entry["finished_at"] or entry["created_at"]) < deadline
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self.expired += len(expired)
+
+    @staticmethod
+    def _open_db(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL: несколько воркеров uvicorn читают и пишут один файл без долгих блокировок
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL, "
+            "finished_at REAL, result TEXT, error TEXT, size INTEGER NOT NULL DEFAULT 0)"
+        )
+        db.commit()
+        return db
@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import List, Optional
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.models import ScAddr, ScConstruction, ScLinkContent, ScLinkContentType
+from sc_kpm.identifiers import ScAlias
+from config import REQUEST_DEADLINE
+from .keynode_registry import KeynodeRegistry
+
+# Отношение действия со ссылкой на срок (unix-время, секунды) и класс отменённых действий;
+# те же идентификаторы читает task_search_module.action_deadline
+NREL_DEADLINE = "nrel_deadline"
+ACTION_CANCELLED = "action_cancelled"
+
+
+class DeadlineExceeded(Exception):
+    """Бюджет времени запроса исчерпан или запрос отменён"""
+
+
+class RequestDeadline:
+    """
+    Общий бюджет времени запроса на все этапы: загрузку и всю цепочку агентов.
+    cancel() завершает его досрочно (клиент отключился или отменил задание)
+    и будит потоки, ожидающие агентов.
+    """
+
+    def __init__(self, budget: float = REQUEST_DEADLINE):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        # Срок для агентов в других процессах - по часам, а не по monotonic
+        self.wall_expires_at = time.time() + budget
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters: List[threading.Event] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def remaining(self) -> float:
+        if self.cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.reason = reason
+            self._cancelled.set()
+            waiters = list(self._waiters)
+        for waiter in waiters:
+            waiter.set()
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded(self.reason or f"Deadline of {self.budget:g} s exceeded")
+
+    def add_waiter(self, waiter: threading.Event) -> None:
+        """Событие будет установлено при отмене"""
+        with self._lock:
+            self._waiters.append(waiter)
+            if self._cancelled.is_set():
+                waiter.set()
+
+    def remove_waiter(self, waiter: threading.Event) -> None:
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+
+def attach_deadline(action: ScAddr, deadline: RequestDeadline) -> None:
+    """Передаёт агенту срок действия: action => nrel_deadline: [unix-время]"""
+    construction = ScConstruction()
+    construction.generate_link(
+        sc_type.CONST_NODE_LINK, ScLinkContent(deadline.wall_expires_at, ScLinkContentType.FLOAT), "_deadline"
+    )
+    construction.generate_connector(sc_type.CONST_COMMON_ARC, action, "_deadline", ScAlias.RELATION_ARC)
+    construction.generate_connector(
+        sc_type.CONST_PERM_POS_ARC, KeynodeRegistry.resolve(NREL_DEADLINE, sc_type.CONST_NODE_NON_ROLE),
+        ScAlias.RELATION_ARC
+    )
+    client.generate_elements(construction)
+
+
+def mark_cancelled(action: ScAddr) -> None:
+    """Отмечает действие отменённым: агент увидит это при очередной проверке и завершится"""
+    try:
+        construction = ScConstruction()
+        construction.generate_connector(
+            sc_type.CONST_PERM_POS_ARC, KeynodeRegistry.resolve(ACTION_CANCELLED, sc_type.CONST_NODE_CLASS), action
+        )
+        client.generate_elements(construction)
+    except Exception as e:
+        print(f"Не удалось отметить действие {action.value} отменённым: {e}")
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from config import RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_PATH
+
+
+class ResultCache:
+    """
+    Кэш результатов разбора конструкций (JSON шагов решения в канонических метках),
+    ключ - дайджест канонической формы конструкции.
+    Первый уровень - LRU в памяти с TTL, второй (необязательный) - SQLite-файл,
+    который переживает перезапуск. Записи удаляются только по TTL или явно.
+    """
+
+    _instance: Optional["ResultCache"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL,
+                 path: Optional[str] = RESULT_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path or None
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self._db = self._open_disk_tier(self.path)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def instance(cls) -> "ResultCache":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    # --- Чтение и запись ---
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT stored_at, value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    stored_at, value = row
+                    if now - stored_at <= self.ttl:
+                        self._remember(key, stored_at, value)
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, stored_at, value) VALUES (?, ?, ?)",
+                    (key, stored_at, value)
+                )
+                self._db.commit()
+
+    # --- Инвалидация ---
+    def invalidate(self, key: str) -> bool:
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            if self._db is not None:
+                cursor = self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                removed = removed or cursor.rowcount > 0
+            return removed
+
+    def flush(self) -> int:
+        """Очищает оба уровня, возвращает количество удалённых записей"""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            if self._db is not None:
+                cursor = self._db.execute("DELETE FROM results")
+                self._db.commit()
+                removed = max(removed, cursor.rowcount)
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "disk_tier": self.path,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0
+            }
+
+    # --- Вспомогательные методы ---
+    def _remember(self, key: str, stored_at: float, value: str) -> None:
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _open_disk_tier(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        db.commit()
+        return db
@@ -1,62 +1,124 @@
-from sc_client.client import connect, disconnect, search_by_template, get_link_content
+from sc_client.client import search_by_template, get_link_content
 from sc_client import client
 from sc_client.constants import sc_type
 from sc_client.models import ScAddr, ScConstruction, ScTemplate, ScLinkContent
 from sc_client.constants.sc_type import ScType
 from sc_kpm.identifiers import ScAlias
 from sc_kpm import ScKeynodes
-from sc_kpm.utils import generate_connector, generate_link, generate_node
-from typing import Dict, List, Any
+from sc_kpm.utils import generate_connector, generate_connectors, generate_link, generate_node
+from contextlib import ExitStack
+from typing import Dict, List, Any, Callable, Optional, Union
 from .agent_chain_executor import AgentChainExecutor
+from .sc_batch import ScBatch, ScRef, search_structure_members, unique_elements
+from .keynode_registry import KeynodeRegistry
+from .sc_connection_pool import ScConnectionPool
+from .sc_garbage_collector import ScGarbage, ScGarbageCollector, TRANSIENT_CLASS
+from .request_deadline import RequestDeadline
+from config import SC_SERVER_URL, SC_REQUEST_SCOPED
+
+# Имя элемента конструкции, загруженной в режиме запроса (читает GeometrySearchAgent)
+NREL_SCOPED_IDTF = "nrel_scoped_idtf"
 
 class SCAdapter:
 
-    def __init__(self, url="ws://localhost:8090/ws_json"):
+    def __init__(self, url=SC_SERVER_URL, batched: bool = True,
+                 progress: Optional[Callable[..., None]] = None, max_solutions: int = 1,
+                 scoped: bool = SC_REQUEST_SCOPED, solve: bool = True,
+                 deadline: Optional[RequestDeadline] = None):
         self.url = url
-        self._connected = False
+        # Аренда соединения из пула, пока адаптер подключён
+        self._stack: Optional[ExitStack] = None
         self.parsedSolvingSteps = None
+        # В пакетном режиме вся конструкция отправляется одним generate_elements
+        self.batched = batched
+        self._batch = None
+        # Колбэк прогресса (этап, состояние, подробности), например для асинхронных заданий
+        self.progress = progress
+        # Сколько найденных задач решать параллельно (ранжированный список solutions)
+        self.max_solutions = max_solutions
+        # Элементы конструкции - собственные анонимные узлы запроса (имя -> узел в self._names,
+        # в sc-памяти - узел => nrel_scoped_idtf: [имя], по нему поиск находит общий узел с тем же именем),
+        # иначе общие узлы по системному идентификатору, в которые пишут все запросы с теми же буквами
+        self.scoped = scoped
+        self._names: Dict[str, Union[ScAddr, ScRef]] = {}
+        self.main_node: Optional[ScAddr] = None
+        # Без solve загружается только конструкция: цепочку запускает вызывающий
+        # и он же передаёт self.garbage сборщику
+        self.solve = solve
+        # Бюджет времени запроса на загрузку и цепочку агентов
+        self.deadline = deadline or RequestDeadline()
+        # Временные элементы запроса (анонимные меры, ссылки, действия) - удаляются после решения
+        self.garbage: Optional[ScGarbage] = None
+        self._transient: List[Union[ScAddr, ScRef]] = []
+
+    def _report(self, stage: str, state: str, details: Optional[dict] = None) -> None:
+        if self.progress is not None:
+            self.progress(stage, state, details)
 
     def connect(self):
-        if not self._connected:
-            connect(self.url)
-            self._connected = True
-
-    def disconnect(self):
-        if self._connected:
-            disconnect()
-            self._connected = False
+        """Берёт соединение из пула; сокет остаётся открытым между запросами"""
+        if self._stack is None:
+            with ExitStack() as stack:
+                stack.enter_context(ScConnectionPool.instance().connection())
+                KeynodeRegistry.ensure_prefetched()
+                self._stack = stack.pop_all()
+
+    def disconnect(self, exc_type=None, exc_val=None, exc_tb=None):
+        """Возвращает соединение в пул; исключение, с которым вышли из адаптера, передаётся аренде"""
+        if self._stack is not None:
+            stack, self._stack = self._stack, None
+            stack.__exit__(exc_type, exc_val, exc_tb)
 
     def get_parsing_result(self) -> str:
         """Просто возвращает сохраненный результат парсинга"""
         return self.parsedSolvingSteps
 
     def _connect_all_to_main_node(self, main_node: ScAddr, all_addrs: List[ScAddr]) -> List[ScAddr]:
-        """Создаёт коннекторы между main_node и всеми элементами из списка all_addrs"""
-        connector_addrs = []
-        
-        for addr in all_addrs:
-            # Пропускаем сам main_node и уже существующие связи
-            if addr == main_node:
-                continue
-                
-            # Создаём коннектор от main_node к элементу
-            connector_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, main_node, addr)
-            connector_addrs.append(connector_addr)
-            print(f"Created connector from main node to {addr}")
-        
-        print(f"Created {len(connector_addrs)} connectors to main node")
+        """
+        Создаёт коннекторы между main_node и всеми элементами из списка all_addrs.
+        Повторы убираются (порядок сохраняется), уже входящие в структуру элементы пропускаются,
+        все дуги генерируются одной конструкцией.
+        """
+        if self._batch is not None:
+            self._batch.add_members(main_node, all_addrs)
+            return []
+
+        existing = search_structure_members(main_node)
+        targets = [
+            addr for addr in unique_elements(all_addrs)
+            if addr != main_node and addr not in existing
+        ]
+        if not targets:
+            print("All elements already belong to main node")
+            return []
+
+        connector_addrs = generate_connectors(sc_type.CONST_PERM_POS_ARC, main_node, *targets)
+        print(f"Created {len(connector_addrs)} connectors to main node "
+              f"({len(all_addrs)} collected, {len(existing)} already in structure)")
         return connector_addrs
 
     # --- Основной метод загрузки конструкции ---
     def upload_construction(self, construction_data: Dict[str, Any]):
         """Загружает всю конструкцию в SC-память с использованием ScKeynodes"""
+        # Вне контекстного менеджера соединение берётся только на время загрузки
+        owns_lease = self._stack is None
+        uploaded = False
+        collector = ScGarbageCollector.instance()
+        self.garbage = collector.track()
+        self._transient = []
+        self._names = {}
+        self.main_node = None
         try:
             self.connect()
             print("Connected to SC-server.")
+            self._report("upload", "running")
+
+            if self.batched:
+                self._batch = ScBatch()
 
             # 1. Главный узел конструкции
             construction_name = construction_data.get("construction", "unnamed")
-            main_node = ScKeynodes.resolve(construction_name, sc_type.CONST_NODE_STRUCTURE)
+            main_node = self._keynode(construction_name, sc_type.CONST_NODE_STRUCTURE)
             print(f"Created/Resolved main node: {construction_name}")
 
             all_addrs = []
@@ -86,10 +148,27 @@ class SCAdapter:
             all_addrs.extend(relationships_addrs)
 
             self._connect_all_to_main_node(main_node, all_addrs)
+
+            if self._batch is not None:
+                # Один запрос на ключевые узлы и один generate_elements на всю конструкцию
+                self._batch.execute()
+                main_node = self._batch.resolve(main_node)
+                all_addrs = self._batch.resolve_all(all_addrs)
+                self.garbage.add(*self._batch.resolve_all(self._transient))
+            else:
+                self.garbage.add(*self._transient)
+            self.main_node = main_node
             print("Successfully uploaded construction to SC-memory.")
+            self._report("upload", "completed", {"elements": len(all_addrs)})
+            uploaded = True
+
+            if not self.solve:
+                return True, all_addrs
+            self.deadline.check()
 
             print("Запуск цепочки агентов...")
-            chainExecutor = AgentChainExecutor() 
+            chainExecutor = AgentChainExecutor(progress=self.progress, max_solutions=self.max_solutions,
+                                               garbage=self.garbage, deadline=self.deadline)
             self.parsedSolvingSteps = chainExecutor._execute_agent_chain(main_node)
 
             return True, all_addrs
@@ -98,7 +177,64 @@ class SCAdapter:
             import traceback
             print("Error uploading to SC:", e)
             traceback.print_exc()
+            if not uploaded:
+                self._report("upload", "failed")
             return False, []
+        finally:
+            self._batch = None
+            # Результат уже прочитан: меры, ссылки и действия запроса больше не нужны
+            if self.solve:
+                collector.collect(self.garbage)
+                self.garbage = None
+            if owns_lease:
+                self.disconnect()
+
+    # --- Примитивы генерации (немедленные или пакетные) ---
+    def _concept(self, identifier: str, node_type: ScType) -> ScAddr:
+        """Общее понятие (класс, отношение, число) - берётся из кэша ключевых узлов процесса"""
+        return KeynodeRegistry.resolve(identifier, node_type)
+
+    def _keynode(self, identifier: str, node_type: ScType) -> Union[ScAddr, ScRef]:
+        """Элемент конструкции по имени: в режиме запроса - свой анонимный узел, иначе общий узел"""
+        if self.scoped:
+            element = self._names.get(identifier)
+            if element is None:
+                element = self._generate_node(node_type)
+                self._names[identifier] = element
+                # Имя не входит в структуру конструкции (не становится паттерном) и удаляется вместе с узлом
+                self.generate_non_role_relation(element, self._generate_link(identifier),
+                                                self._concept(NREL_SCOPED_IDTF, sc_type.CONST_NODE_NON_ROLE))
+            return element
+        if self._batch is not None:
+            return self._batch.keynode(identifier, node_type)
+        return ScKeynodes.resolve(identifier, node_type)
+
+    def _generate_node(self, node_type: ScType) -> Union[ScAddr, ScRef]:
+        if self._batch is not None:
+            return self._mark_transient(self._batch.node(node_type))
+        return self._mark_transient(generate_node(node_type))
+
+    def _generate_link(self, content: str) -> Union[ScAddr, ScRef]:
+        if self._batch is not None:
+            return self._mark_transient(self._batch.link(content))
+        return self._mark_transient(generate_link(content))
+
+    def _generate_connector(self, connector_type: ScType, src, trg) -> Union[ScAddr, ScRef]:
+        if self._batch is not None:
+            return self._batch.connector(connector_type, src, trg)
+        return generate_connector(connector_type, src, trg)
+
+    def _mark_transient(self, element: Union[ScAddr, ScRef]) -> Union[ScAddr, ScRef]:
+        """
+        Анонимные узлы и ссылки принадлежат только этому запросу: запоминаем их для удаления
+        и помечаем дугой из concept_transient_element (по ней их найдёт очистка сирот)
+        """
+        if self.garbage is None or not ScGarbageCollector.instance().enabled:
+            return element
+        self._transient.append(element)
+        self._generate_connector(sc_type.CONST_PERM_POS_ARC,
+                                 self._concept(TRANSIENT_CLASS, sc_type.CONST_NODE_CLASS), element)
+        return element
 
     # --- Создание точек ---
     def _create_points(self, points: List[str]) -> List[ScAddr]:
@@ -109,12 +245,12 @@ class SCAdapter:
         if not points:
             return addrs
             
-        class_point = ScKeynodes.resolve("concept_point", sc_type.CONST_NODE_CLASS)
+        class_point = self._concept("concept_point", sc_type.CONST_NODE_CLASS)
         addrs.append(class_point)
 
         for point_name in points:
-            point_node = ScKeynodes.resolve(point_name, sc_type.CONST_NODE)
-            arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, class_point, point_node)
+            point_node = self._keynode(point_name, sc_type.CONST_NODE)
+            arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, class_point, point_node)
             addrs.extend([point_node, arc_addr])
             print(f"Created point: {point_name}")
 
@@ -143,7 +279,7 @@ class SCAdapter:
         for fig_type in used_figure_types:
             class_name = figure_classes.get(fig_type)
             if class_name:
-                class_node = ScKeynodes.resolve(class_name, sc_type.CONST_NODE_CLASS)
+                class_node = self._concept(class_name, sc_type.CONST_NODE_CLASS)
                 class_nodes[fig_type] = class_node
                 addrs.append(class_node)
                 print(f"Resolved class for {fig_type}: {class_name}")
@@ -153,7 +289,7 @@ class SCAdapter:
             fig_name = figure.get("name", "unnamed_figure")
 
             # Создаем фигуру с её именем
-            fig_node = ScKeynodes.resolve(fig_name, sc_type.CONST_NODE)
+            fig_node = self._keynode(fig_name, sc_type.CONST_NODE)
             addrs.append(fig_node)
             print(f"Created figure: {fig_name}")
             
@@ -164,7 +300,7 @@ class SCAdapter:
                 # Связываем с соответствующим классом
                 class_node = class_nodes.get("circle")
                 if class_node:
-                    arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, class_node, fig_node)
+                    arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, class_node, fig_node)
                     addrs.append(arc_addr)
                     print(f"Linked circle to concept_circle")
                     
@@ -175,13 +311,13 @@ class SCAdapter:
                 # Связываем с соответствующим классом полигона
                 class_node = class_nodes.get(fig_type)
                 if class_node:
-                    arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, class_node, fig_node)
+                    arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, class_node, fig_node)
                     addrs.append(arc_addr)
                     print(f"Linked {fig_type} to {figure_classes[fig_type]}")
                 else:
                     # Fallback - используем общий класс polygon
-                    fallback_class = ScKeynodes.resolve("concept_polygon", sc_type.CONST_NODE_CLASS)
-                    arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, fallback_class, fig_node)
+                    fallback_class = self._concept("concept_polygon", sc_type.CONST_NODE_CLASS)
+                    arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, fallback_class, fig_node)
                     addrs.extend([fallback_class, arc_addr])
                     print(f"Linked {fig_type} to concept_polygon (fallback)")
 
@@ -189,6 +325,9 @@ class SCAdapter:
 
     def generate_binary_relation(self, connector_type: ScType, src: ScAddr, trg: ScAddr, *relations: ScAddr) -> List[ScAddr]:
         """Переопределённый метод, возвращающий всю конструкцию"""
+        if self._batch is not None:
+            return self._batch.binary_relation(connector_type, src, trg, *relations)
+
         construction = ScConstruction()
         
         # Создаём основную дугу отношения
@@ -230,19 +369,19 @@ class SCAdapter:
             vertex3 = angle_data.get("vertex3")
             angle_name = f"{vertex1}{vertex2}{vertex3}"
             print("POINT0")
-            angle_node = ScKeynodes.resolve(angle_name, sc_type.CONST_NODE)
+            angle_node = self._keynode(angle_name, sc_type.CONST_NODE)
             addrs.append(angle_node)
 
             if vertex1 and vertex2 and vertex3:
                 print("POINT1")
-                vertex1_node = ScKeynodes.resolve(vertex1, sc_type.CONST_NODE)
-                vertex2_node = ScKeynodes.resolve(vertex2, sc_type.CONST_NODE)
-                vertex3_node = ScKeynodes.resolve(vertex3, sc_type.CONST_NODE)
+                vertex1_node = self._keynode(vertex1, sc_type.CONST_NODE)
+                vertex2_node = self._keynode(vertex2, sc_type.CONST_NODE)
+                vertex3_node = self._keynode(vertex3, sc_type.CONST_NODE)
                 addrs.extend([vertex1_node, vertex2_node, vertex3_node])
                 print("POINT2")
                 
                 # 1. Создаем отношение между углом и вершиной угла (vertex2)
-                nrel_vertex_of_angle = ScKeynodes.resolve("nrel_vertex_of_angle", sc_type.CONST_NODE_NON_ROLE)
+                nrel_vertex_of_angle = self._concept("nrel_vertex_of_angle", sc_type.CONST_NODE_NON_ROLE)
                 vertex_arc_addrs = self.generate_non_role_relation(angle_node, vertex2_node, nrel_vertex_of_angle)
                 addrs.extend([nrel_vertex_of_angle] + vertex_arc_addrs)  # РАСКРЫВАЕМ список
                 print("POINT3")
@@ -252,13 +391,13 @@ class SCAdapter:
                 edge_bc_name = f"{vertex2}{vertex3}"
                 
                 # Создаем узлы для отрезков
-                edge_ab_node = ScKeynodes.resolve(edge_ab_name, sc_type.CONST_NODE)
-                edge_bc_node = ScKeynodes.resolve(edge_bc_name, sc_type.CONST_NODE)
+                edge_ab_node = self._keynode(edge_ab_name, sc_type.CONST_NODE)
+                edge_bc_node = self._keynode(edge_bc_name, sc_type.CONST_NODE)
                 addrs.extend([edge_ab_node, edge_bc_node])
                 print("POINT4")
                 
                 # 3. Создаем отношения между углом и отрезками
-                nrel_side_of_angle = ScKeynodes.resolve("nrel_side_of_angle", sc_type.CONST_NODE_NON_ROLE)
+                nrel_side_of_angle = self._concept("nrel_side_of_angle", sc_type.CONST_NODE_NON_ROLE)
                 side_ab_arc_addrs = self.generate_non_role_relation(angle_node, edge_ab_node, nrel_side_of_angle)
                 side_bc_arc_addrs = self.generate_non_role_relation(angle_node, edge_bc_node, nrel_side_of_angle)
                 addrs.extend([nrel_side_of_angle] + side_ab_arc_addrs + side_bc_arc_addrs)  # РАСКРЫВАЕМ списки
@@ -281,12 +420,12 @@ class SCAdapter:
         """Создаёт структуру для хранения информации об угле (аналогично длине)"""
         addrs = []
         try:
-            concept_angular_measure = ScKeynodes.resolve("concept_angular_measure", sc_type.CONST_NODE_SUPERCLASS)
-            decimal_numeral_system = ScKeynodes.resolve("decimal_numeral_system", sc_type.CONST_NODE_CLASS)
-            nrel_idtf = ScKeynodes.resolve("nrel_idtf", sc_type.CONST_NODE_NON_ROLE)
-            class_number = ScKeynodes.resolve("number", sc_type.CONST_NODE_CLASS)
+            concept_angular_measure = self._concept("concept_angular_measure", sc_type.CONST_NODE_SUPERCLASS)
+            decimal_numeral_system = self._concept("decimal_numeral_system", sc_type.CONST_NODE_CLASS)
+            nrel_idtf = self._concept("nrel_idtf", sc_type.CONST_NODE_NON_ROLE)
+            class_number = self._concept("number", sc_type.CONST_NODE_CLASS)
             nrel_measurement_str = str(angle_info.get("way_of_measurement"))
-            nrel_measurement = ScKeynodes.resolve(f"nrel_measurement_in_{nrel_measurement_str}", sc_type.CONST_NODE_NON_ROLE)
+            nrel_measurement = self._concept(f"nrel_measurement_in_{nrel_measurement_str}", sc_type.CONST_NODE_NON_ROLE)
 
             addrs.extend([concept_angular_measure, decimal_numeral_system, nrel_idtf, class_number, nrel_measurement])
 
@@ -300,28 +439,28 @@ class SCAdapter:
             value_str = str(angle_value).replace('.', '_')
             
             # 1. Создаём безымянный узел класса для угла
-            anonymous_angle_node = generate_node(sc_type.CONST_NODE_CLASS)
+            anonymous_angle_node = self._generate_node(sc_type.CONST_NODE_CLASS)
             
             # 2. Связываем угол с безымянным узлом через ТОНКУЮ стрелку (CONST_PERM_POS_ARC)
-            angle_arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, anonymous_angle_node, angle_node)
+            angle_arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, anonymous_angle_node, angle_node)
             
             # 3. Связываем безымянный узел с concept_angular_measure через ТОНКУЮ стрелку (CONST_PERM_POS_ARC)
-            measure_arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, concept_angular_measure, anonymous_angle_node)
+            measure_arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, concept_angular_measure, anonymous_angle_node)
             
-            # 4. Создаём узел для числового значения
-            number_node = ScKeynodes.resolve(f"number_{value_str}", sc_type.CONST_NODE)
+            # 4. Узел числового значения - общий для всех запросов и задач (по нему сравниваются величины)
+            number_node = self._concept(f"number_{value_str}", sc_type.CONST_NODE)
             
             # 5. Связываем безымянный узел с числовым узлом через ТОЛСТУЮ стрелку (CONST_PERM_POS_TUPLE)
             measurement_arc_addrs = self.generate_non_role_relation(anonymous_angle_node, number_node, nrel_measurement)
             
             # 6. Связываем числовой узел с классом number через ТОНКУЮ стрелку
-            number_class_arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, class_number, number_node)
+            number_class_arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, class_number, number_node)
             
-            number_link = generate_link(str(angle_value))
+            number_link = self._generate_link(str(angle_value))
             idtf_arc_addrs = self.generate_non_role_relation(number_node, number_link, nrel_idtf)
             
             # 7. Связываем ссылку с десятичной системой счисления через ТОНКУЮ стрелку
-            decimal_arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, decimal_numeral_system, number_link)
+            decimal_arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, decimal_numeral_system, number_link)
             
             addrs.extend([
                 anonymous_angle_node, angle_arc_addr, measure_arc_addr,
@@ -342,24 +481,24 @@ class SCAdapter:
         addrs = []
         center = circle_data.get("center")
         if center:
-            center_node = ScKeynodes.resolve(center, sc_type.CONST_NODE)
-            nrel_center = ScKeynodes.resolve("nrel_center", sc_type.CONST_NODE_NON_ROLE)
+            center_node = self._keynode(center, sc_type.CONST_NODE)
+            nrel_center = self._concept("nrel_center", sc_type.CONST_NODE_NON_ROLE)
             center_arc_addrs = self.generate_non_role_relation(circle_node, center_node, nrel_center)
             addrs.extend([center_node, nrel_center] + center_arc_addrs)  # РАСКРЫВАЕМ список
 
         diameter_edge = circle_data.get("diameter_edge")
         if diameter_edge:
             edge_name = f"{diameter_edge['vert1']}{diameter_edge['vert2']}"
-            edge_node = ScKeynodes.resolve(edge_name, sc_type.CONST_NODE)
+            edge_node = self._keynode(edge_name, sc_type.CONST_NODE)
             
-            point1_node = ScKeynodes.resolve(diameter_edge['vert1'], sc_type.CONST_NODE)
-            point2_node = ScKeynodes.resolve(diameter_edge['vert2'], sc_type.CONST_NODE)
+            point1_node = self._keynode(diameter_edge['vert1'], sc_type.CONST_NODE)
+            point2_node = self._keynode(diameter_edge['vert2'], sc_type.CONST_NODE)
             
-            nrel_endpoint = ScKeynodes.resolve("nrel_endpoint", sc_type.CONST_NODE_NON_ROLE)
+            nrel_endpoint = self._concept("nrel_endpoint", sc_type.CONST_NODE_NON_ROLE)
             endpoint1_arc_addrs = self.generate_non_role_relation(edge_node, point1_node, nrel_endpoint)
             endpoint2_arc_addrs = self.generate_non_role_relation(edge_node, point2_node, nrel_endpoint)
             
-            nrel_diameter = ScKeynodes.resolve("nrel_diameter", sc_type.CONST_NODE_NON_ROLE)
+            nrel_diameter = self._concept("nrel_diameter", sc_type.CONST_NODE_NON_ROLE)
             diameter_arc_addrs = self.generate_non_role_relation(circle_node, edge_node, nrel_diameter)
             
             addrs.extend([
@@ -379,8 +518,8 @@ class SCAdapter:
         # Обработка вершин (если они есть) - только явно объявленные точки
         vertices = polygon_data.get("vertices", [])
         for vertex_name in vertices:
-            vertex_node = ScKeynodes.resolve(vertex_name, sc_type.CONST_NODE)
-            nrel_angle = ScKeynodes.resolve("nrel_angle", sc_type.CONST_NODE_NON_ROLE)
+            vertex_node = self._keynode(vertex_name, sc_type.CONST_NODE)
+            nrel_angle = self._concept("nrel_angle", sc_type.CONST_NODE_NON_ROLE)
             angle_arc_addrs = self.generate_non_role_relation(polygon_node, vertex_node, nrel_angle)
             addrs.extend([vertex_node, nrel_angle] + angle_arc_addrs)
 
@@ -390,15 +529,15 @@ class SCAdapter:
             for edge_input in input_data.edges:
                 # Имя отрезка формируется из строк vert1 и vert2
                 edge_name = f"{edge_input.vert1}{edge_input.vert2}"
-                edge_node = ScKeynodes.resolve(edge_name, sc_type.CONST_NODE)
+                edge_node = self._keynode(edge_name, sc_type.CONST_NODE)
                 
-                nrel_side = ScKeynodes.resolve("nrel_side", sc_type.CONST_NODE_NON_ROLE)
+                nrel_side = self._concept("nrel_side", sc_type.CONST_NODE_NON_ROLE)
                 side_arc_addrs = self.generate_non_role_relation(polygon_node, edge_node, nrel_side)
                 
                 addrs.extend([edge_node, nrel_side] + side_arc_addrs)
                 
                 if edge_input.length:
-                    length_addrs = self._create_length_structure(edge_node, edge_input.length.dict())
+                    length_addrs = self._create_length_structure(edge_node, edge_input.length.model_dump())
                     addrs.extend(length_addrs)
         
         return addrs
@@ -407,10 +546,10 @@ class SCAdapter:
         """Создаёт структуру для хранения информации о длине стороны"""
         addrs = []
         try:
-            concept_length = ScKeynodes.resolve("concept_length", sc_type.CONST_NODE_SUPERCLASS)
-            class_number = ScKeynodes.resolve("number", sc_type.CONST_NODE_CLASS)
+            concept_length = self._concept("concept_length", sc_type.CONST_NODE_SUPERCLASS)
+            class_number = self._concept("number", sc_type.CONST_NODE_CLASS)
             nrel_measurement_str = str(length_info.get("way_of_measurement"))
-            nrel_measurement = ScKeynodes.resolve(f"nrel_measurement_in_{nrel_measurement_str}", sc_type.CONST_NODE_NON_ROLE)
+            nrel_measurement = self._concept(f"nrel_measurement_in_{nrel_measurement_str}", sc_type.CONST_NODE_NON_ROLE)
 
             addrs.extend([concept_length, class_number, nrel_measurement])
 
@@ -431,15 +570,16 @@ class SCAdapter:
                 # Если не удалось преобразовать в число, используем строку как есть
                 value_str = str(length_value).replace('.', '_')
             
-            anonymous_length_node = generate_node(sc_type.CONST_NODE_CLASS)
+            anonymous_length_node = self._generate_node(sc_type.CONST_NODE_CLASS)
             
-            edge_arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, anonymous_length_node, edge_node)
-            length_arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, concept_length, anonymous_length_node)
+            edge_arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, anonymous_length_node, edge_node)
+            length_arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, concept_length, anonymous_length_node)
             
-            number_node = ScKeynodes.resolve(f"number_{value_str}", sc_type.CONST_NODE)
+            # Узел числа общий, как и в задачах базы знаний, даже в режиме запроса
+            number_node = self._concept(f"number_{value_str}", sc_type.CONST_NODE)
             
             measurement_arc_addrs = self.generate_non_role_relation(anonymous_length_node, number_node, nrel_measurement)
-            number_class_arc_addr = generate_connector(sc_type.CONST_PERM_POS_ARC, class_number, number_node)
+            number_class_arc_addr = self._generate_connector(sc_type.CONST_PERM_POS_ARC, class_number, number_node)
             
             addrs.extend([
                 anonymous_length_node, edge_arc_addr, length_arc_addr,
@@ -466,12 +606,12 @@ class SCAdapter:
             
             print(f'Creating relationship: {source_entity_name} -> {target_entity_name} (type: {rel_type}, name: {rel_name}, oriented: {oriented})')
 
-            source_node = ScKeynodes.resolve(str(source_entity_name), sc_type.CONST_NODE)
-            target_node = ScKeynodes.resolve(str(target_entity_name), sc_type.CONST_NODE)
+            source_node = self._keynode(str(source_entity_name), sc_type.CONST_NODE)
+            target_node = self._keynode(str(target_entity_name), sc_type.CONST_NODE)
             addrs.extend([source_node, target_node])
 
             if rel_type == "nonrole":
-                nrel_relation = ScKeynodes.resolve(f"nrel_{rel_name}", sc_type.CONST_NODE_NON_ROLE)
+                nrel_relation = self._concept(f"nrel_{rel_name}", sc_type.CONST_NODE_NON_ROLE)
                 
                 # ВЫБИРАЕМ ТИП ДУГИ В ЗАВИСИМОСТИ ОТ ОРИЕНТАЦИИ
                 if oriented:
@@ -483,7 +623,7 @@ class SCAdapter:
                 addrs.extend([nrel_relation] + relation_arc_addrs)
                 print(f"Created non-role relation: nrel_{rel_name} (oriented: {oriented})")
             else:
-                rrel_relation = ScKeynodes.resolve(f"rrel_{rel_name}", sc_type.CONST_NODE_ROLE)
+                rrel_relation = self._concept(f"rrel_{rel_name}", sc_type.CONST_NODE_ROLE)
                 relation_arc_addrs = self.generate_role_relation(source_node, target_node, rrel_relation)
                 addrs.extend([rrel_relation] + relation_arc_addrs)
                 print(f"Created role relation: rrel_{rel_name}")
@@ -496,4 +636,4 @@ class SCAdapter:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.disconnect()
\ No newline at end of file
+        self.disconnect(exc_type, exc_val, exc_tb)
\ No newline at end of file
@@ -0,0 +1,175 @@
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.constants.sc_type import ScType
+from sc_client.models import (
+    ScAddr, ScConstruction, ScIdtfResolveParams, ScLinkContent, ScLinkContentType, ScTemplate
+)
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Union
+
+
+def search_structure_members(structure: ScAddr) -> Set[ScAddr]:
+    """Возвращает все элементы, уже принадлежащие структуре, одним поиском по шаблону"""
+    template = ScTemplate()
+    template.triple(
+        structure,
+        sc_type.VAR_PERM_POS_ARC >> "_arc",
+        sc_type.UNKNOWN >> "_element"
+    )
+    return {result.get("_element") for result in client.search_by_template(template)}
+
+
+def unique_elements(elements: list) -> list:
+    """Убирает повторы, сохраняя порядок первого появления"""
+    return list(dict.fromkeys(elements))
+
+
+@dataclass(frozen=True)
+class ScRef:
+    """Отложенная ссылка на элемент, который будет создан при выполнении пакета"""
+    kind: str  # "keynode" или "element"
+    key: str
+
+
+@dataclass
+class _BatchCommand:
+    alias: str
+    el_type: ScType
+    source: Optional[Union[ScRef, ScAddr]] = None
+    target: Optional[Union[ScRef, ScAddr]] = None
+    content: Optional[str] = None
+
+
+class ScBatch:
+    """
+    Накапливает узлы, ссылки, коннекторы и ключевые узлы конструкции
+    и отправляет их в SC-память за один resolve_keynodes и один generate_elements
+    (или несколько, если конструкция превышает chunk_size команд).
+    """
+
+    def __init__(self, chunk_size: int = 5000):
+        self.chunk_size = chunk_size
+        self._keynodes: Dict[str, ScType] = {}
+        self._commands: List[_BatchCommand] = []
+        self._addrs: Dict[ScRef, ScAddr] = {}
+        self._memberships: List[tuple] = []
+        self.membership_arcs: List[ScRef] = []
+        self._executed = False
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    # --- Описание элементов ---
+    def keynode(self, identifier: str, node_type: Optional[ScType] = None) -> ScRef:
+        """Именованный узел; тип берётся из первого запроса идентификатора"""
+        self._keynodes.setdefault(identifier, node_type)
+        return ScRef("keynode", identifier)
+
+    def node(self, node_type: ScType) -> ScRef:
+        return self._add(_BatchCommand(self._next_alias(), node_type))
+
+    def link(self, content: str, link_type: ScType = sc_type.CONST_NODE_LINK) -> ScRef:
+        return self._add(_BatchCommand(self._next_alias(), link_type, content=str(content)))
+
+    def connector(self, connector_type: ScType, src: Union[ScRef, ScAddr], trg: Union[ScRef, ScAddr]) -> ScRef:
+        return self._add(_BatchCommand(self._next_alias(), connector_type, source=src, target=trg))
+
+    def binary_relation(self, connector_type: ScType, src: Union[ScRef, ScAddr], trg: Union[ScRef, ScAddr],
+                        *relations: Union[ScRef, ScAddr]) -> List[ScRef]:
+        """Аналог SCAdapter.generate_binary_relation: основная дуга и дуги от отношений к ней"""
+        relation_arc = self.connector(connector_type, src, trg)
+        refs = [relation_arc]
+        for relation in relations:
+            refs.append(self.connector(sc_type.CONST_PERM_POS_ARC, relation, relation_arc))
+        return refs
+
+    def add_members(self, structure: Union[ScRef, ScAddr], elements: list) -> None:
+        """
+        Откладывает генерацию дуг принадлежности структуре до execute():
+        к этому моменту ключевые узлы разрешены и уже входящие в структуру элементы можно пропустить
+        """
+        self._memberships.append((structure, unique_elements(elements)))
+
+    # --- Выполнение ---
+    def execute(self) -> None:
+        """Разрешает ключевые узлы одним запросом и генерирует все команды пакетами"""
+        if self._executed:
+            return
+        self._resolve_keynodes()
+        self._compile_memberships()
+
+        for start in range(0, len(self._commands), self.chunk_size):
+            chunk = self._commands[start:start + self.chunk_size]
+            construction = ScConstruction()
+            for command in chunk:
+                if command.el_type.is_link():
+                    content = ScLinkContent(command.content, ScLinkContentType.STRING)
+                    construction.generate_link(command.el_type, content, command.alias)
+                elif command.el_type.is_node():
+                    construction.generate_node(command.el_type, command.alias)
+                else:
+                    construction.generate_connector(
+                        command.el_type,
+                        self._construction_item(command.source),
+                        self._construction_item(command.target),
+                        command.alias
+                    )
+
+            generated = client.generate_elements(construction)
+            for command, addr in zip(chunk, generated):
+                self._addrs[ScRef("element", command.alias)] = addr
+
+        print(f"Batch executed: {len(self._keynodes)} keynodes, {len(self._commands)} elements")
+        self._executed = True
+
+    def resolve(self, ref: Union[ScRef, ScAddr]) -> ScAddr:
+        """Возвращает ScAddr для ссылки после execute()"""
+        if isinstance(ref, ScAddr):
+            return ref
+        return self._addrs.get(ref, ScAddr(0))
+
+    def resolve_all(self, refs: List[Union[ScRef, ScAddr]]) -> List[ScAddr]:
+        return [self.resolve(ref) for ref in refs]
+
+    # --- Вспомогательные методы ---
+    def _next_alias(self) -> str:
+        return f"_batch_el_{len(self._commands)}"
+
+    def _add(self, command: _BatchCommand) -> ScRef:
+        self._commands.append(command)
+        return ScRef("element", command.alias)
+
+    def _resolve_keynodes(self) -> None:
+        if not self._keynodes:
+            return
+        identifiers = list(self._keynodes.keys())
+        params = [ScIdtfResolveParams(idtf=idtf, type=self._keynodes[idtf]) for idtf in identifiers]
+        addrs = client.resolve_keynodes(*params)
+        for idtf, addr in zip(identifiers, addrs):
+            self._addrs[ScRef("keynode", idtf)] = addr
+
+    def _compile_memberships(self) -> None:
+        for structure, elements in self._memberships:
+            structure_addr = self.resolve(structure)
+            existing = search_structure_members(structure_addr) if structure_addr.is_valid() else set()
+            skipped = 0
+            for element in elements:
+                if type(element) is type(structure) and element == structure:
+                    continue
+                # Новые элементы пакета ещё не могут принадлежать структуре
+                addr = self._addrs.get(element) if isinstance(element, ScRef) else element
+                if addr is not None and addr in existing:
+                    skipped += 1
+                    continue
+                self.membership_arcs.append(self.connector(sc_type.CONST_PERM_POS_ARC, structure, element))
+            print(f"Membership: {len(elements)} unique elements, {skipped} already in structure")
+        self._memberships = []
+
+    def _construction_item(self, ref: Union[ScRef, ScAddr]) -> Union[ScAddr, str]:
+        """Уже созданный элемент передаётся как ScAddr, элемент текущего пакета - как алиас"""
+        if isinstance(ref, ScAddr):
+            return ref
+        addr = self._addrs.get(ref)
+        if addr is not None:
+            return addr
+        return ref.key
@@ -0,0 +1,213 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from sc_client import client
+from sc_client.models import ScIdtfResolveParams
+from config import (
+    SC_SERVER_URL,
+    SC_POOL_SIZE,
+    SC_POOL_MAX_WAIT,
+    SC_POOL_HEALTH_CHECK_INTERVAL,
+    SC_RECONNECT_BACKOFF_BASE,
+    SC_RECONNECT_BACKOFF_MAX
+)
+from .keynode_registry import KeynodeRegistry
+
+
+class ScConnectionPoolTimeout(Exception):
+    """Не удалось получить соединение с sc-server за отведённое время"""
+
+
+class ScConnectionPool:
+    """
+    Управляемое долгоживущее соединение с sc-server.
+
+    sc_client держит одну websocket-сессию на процесс, поэтому пул выдаёт
+    ограниченное число аренд (size) поверх одного постоянного соединения:
+    запросы не открывают и не закрывают сокет, фоновый монитор проверяет
+    его состояние и переподключается с экспоненциальной задержкой.
+    Аренды реентерабельны в пределах потока.
+    """
+
+    _instance: Optional["ScConnectionPool"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        url: str = SC_SERVER_URL,
+        size: int = SC_POOL_SIZE,
+        max_wait: float = SC_POOL_MAX_WAIT,
+        health_check_interval: float = SC_POOL_HEALTH_CHECK_INTERVAL
+    ):
+        self.url = url
+        self.size = size
+        self.max_wait = max_wait
+        self.health_check_interval = health_check_interval
+
+        self._leases = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._local = threading.local()
+        self._stop_event = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+        self._healthy = False
+        self._next_attempt = 0.0
+        self._failures = 0
+        # Номер соединения: растёт при каждом подключении (подписки на события привязаны к нему)
+        self.generation = 0
+
+        # Метрики
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.last_check = None
+
+    @classmethod
+    def instance(cls) -> "ScConnectionPool":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    # --- Жизненный цикл ---
+    def start(self) -> None:
+        """Подключается (если возможно) и запускает фоновую проверку соединения"""
+        self.ensure_connected(raise_on_failure=False)
+        if self._monitor is None or not self._monitor.is_alive():
+            self._stop_event.clear()
+            self._monitor = threading.Thread(target=self._monitor_loop, name="sc-pool-monitor", daemon=True)
+            self._monitor.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout=self.health_check_interval)
+            self._monitor = None
+        with self._connect_lock:
+            if client.is_connected():
+                client.disconnect()
+            self._healthy = False
+
+    # --- Аренда соединения ---
+    @contextmanager
+    def connection(self):
+        """Выдаёт соединение на время запроса; ждёт не дольше max_wait секунд"""
+        depth = getattr(self._local, "depth", 0)
+        if depth > 0:
+            # Поток уже держит аренду (например, SCAdapter внутри цепочки агентов)
+            self._local.depth = depth + 1
+            try:
+                yield self
+            finally:
+                self._local.depth -= 1
+            return
+
+        self._acquire()
+        self._local.depth = 1
+        try:
+            self.ensure_connected()
+            yield self
+        finally:
+            self._local.depth = 0
+            self._release()
+
+    def _acquire(self) -> None:
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        acquired = self._leases.acquire(timeout=self.max_wait)
+        waited = time.monotonic() - started
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.timeouts += 1
+            else:
+                self.in_use += 1
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait_seen = max(self.max_wait_seen, waited)
+        if not acquired:
+            raise ScConnectionPoolTimeout(f"No sc-server connection available after {self.max_wait} s")
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+        self._leases.release()
+
+    # --- Состояние соединения ---
+    def ensure_connected(self, raise_on_failure: bool = True) -> bool:
+        """Переподключается, если соединение потеряно; учитывает задержку после неудач"""
+        if client.is_connected():
+            return True
+        with self._connect_lock:
+            if client.is_connected():
+                return True
+            if time.monotonic() < self._next_attempt:
+                if raise_on_failure:
+                    raise ConnectionError(f"sc-server {self.url} is unavailable, next attempt is delayed")
+                return False
+
+            client.connect(self.url)
+            if client.is_connected():
+                if self._failures:
+                    self.reconnects += 1
+                self._failures = 0
+                self._next_attempt = 0.0
+                self.generation += 1
+                self._healthy = True
+                if self.generation > 1:
+                    # sc-server мог перезапуститься с новой базой: адреса ключевых узлов устарели
+                    KeynodeRegistry.clear()
+                print(f"Connected to sc-server {self.url}")
+                return True
+
+            self._failures += 1
+            delay = min(SC_RECONNECT_BACKOFF_BASE * 2 ** (self._failures - 1), SC_RECONNECT_BACKOFF_MAX)
+            self._next_attempt = time.monotonic() + delay
+            self._healthy = False
+            print(f"sc-server {self.url} is unavailable, retry in {delay:.1f} s")
+        if raise_on_failure:
+            raise ConnectionError(f"sc-server {self.url} is unavailable")
+        return False
+
+    def check_health(self) -> bool:
+        """Лёгкий запрос к sc-server: разрешение служебного ключевого узла"""
+        try:
+            healthy = client.is_connected() and bool(
+                client.resolve_keynodes(ScIdtfResolveParams(idtf="nrel_system_identifier", type=None))
+            )
+        except Exception as e:
+            print(f"sc-server health check failed: {e}")
+            healthy = False
+        self._healthy = healthy
+        self.last_check = time.time()
+        return healthy
+
+    def is_healthy(self) -> bool:
+        return self._healthy
+
+    def _monitor_loop(self) -> None:
+        while not self._stop_event.wait(self.health_check_interval):
+            if not self.check_health():
+                self.ensure_connected(raise_on_failure=False)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "url": self.url,
+                "size": self.size,
+                "healthy": self._healthy,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+                "avg_wait": self.total_wait / self.checkouts if self.checkouts else 0.0,
+                "max_wait": self.max_wait_seen,
+                "last_check": self.last_check
+            }
@@ -0,0 +1,242 @@
+import queue
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.models import ScAddr, ScConstruction, ScTemplate
+from config import SC_GC_ENABLED, SC_GC_SWEEP_INTERVAL, SC_GC_ORPHAN_TTL
+from .keynode_registry import KeynodeRegistry
+from .request_deadline import NREL_DEADLINE
+from .sc_batch import search_structure_members
+from .sc_connection_pool import ScConnectionPool
+
+# Класс временных элементов: дуга из него помечает корень, который нужно удалить
+TRANSIENT_CLASS = "concept_transient_element"
+
+
+class ScGarbage:
+    """
+    Временные элементы одного запроса: действия агентов (вместе с их результатами и ссылками срока)
+    и анонимные узлы и ссылки, созданные при загрузке конструкции.
+    """
+
+    def __init__(self):
+        self.actions: List[ScAddr] = []
+        self.elements: List[ScAddr] = []
+
+    def add_action(self, action: ScAddr) -> None:
+        self.actions.append(action)
+
+    def add(self, *elements: ScAddr) -> None:
+        self.elements.extend(elements)
+
+    def roots(self) -> List[ScAddr]:
+        return self.actions + self.elements
+
+
+class ScGarbageCollector:
+    """
+    Удаление временных графов запросов из sc-памяти.
+
+    Корни временных графов помечаются дугой из concept_transient_element.
+    После того как запрос забрал результат, collect() ставит его элементы
+    в очередь фонового потока: удаляются действия, их структуры nrel_result
+    с помеченными временными ссылками-результатами агентов и анонимные узлы
+    загрузки (инцидентные дуги sc-память удаляет сама). Общие ключевые узлы
+    и элементы базы знаний, в том числе ссылки в результатах, не трогаются.
+    Тот же поток раз в SC_GC_SWEEP_INTERVAL секунд удаляет помеченные корни,
+    которые дольше SC_GC_ORPHAN_TTL не принадлежат ни одному живому запросу
+    (остались после аварийно завершённых запросов). Живые запросы известны
+    только своему процессу: при нескольких процессах (воркеры uvicorn, pipeline_runner)
+    очистку сирот оставляют одному из них, в остальных SC_GC_SWEEP_INTERVAL=0.
+    """
+
+    _instance: Optional["ScGarbageCollector"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, enabled: bool = SC_GC_ENABLED, sweep_interval: float = SC_GC_SWEEP_INTERVAL,
+                 orphan_ttl: float = SC_GC_ORPHAN_TTL):
+        self.enabled = enabled
+        self.sweep_interval = sweep_interval
+        self.orphan_ttl = orphan_ttl
+        self._queue: "queue.Queue[Optional[ScGarbage]]" = queue.Queue()
+        self._lock = threading.Lock()
+        # Наборы выполняющихся запросов; брошенный без collect() набор исчезает вместе с запросом
+        self._live: "weakref.WeakSet[ScGarbage]" = weakref.WeakSet()
+        self._first_seen: Dict[int, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._next_sweep: Optional[float] = None
+
+        self.collected = 0
+        self.erased = 0
+        self.orphans_erased = 0
+        self.failures = 0
+        self.last_sweep = None
+
+    @classmethod
+    def instance(cls) -> "ScGarbageCollector":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    # --- Жизненный цикл ---
+    def start(self) -> None:
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._next_sweep = time.monotonic() + self.sweep_interval if self.sweep_interval > 0 else None
+        self._thread = threading.Thread(target=self._worker, name="sc-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Дорабатывает очередь и останавливает поток"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=self.sweep_interval if self.sweep_interval > 0 else None)
+        self._thread = None
+
+    # --- Запросы ---
+    def track(self) -> ScGarbage:
+        """Новый набор временных элементов запроса (не удаляется сборщиком сирот, пока запрос жив)"""
+        garbage = ScGarbage()
+        with self._lock:
+            self._live.add(garbage)
+        return garbage
+
+    def transient_class(self) -> ScAddr:
+        return KeynodeRegistry.resolve(TRANSIENT_CLASS, sc_type.CONST_NODE_CLASS)
+
+    def mark(self, *elements: ScAddr) -> None:
+        """Помечает корни временными одним запросом generate_elements"""
+        if not self.enabled or not elements:
+            return
+        transient_class = self.transient_class()
+        construction = ScConstruction()
+        for element in elements:
+            construction.generate_connector(sc_type.CONST_PERM_POS_ARC, transient_class, element)
+        client.generate_elements(construction)
+
+    def collect(self, garbage: ScGarbage) -> None:
+        """Запрос забрал результат: элементы удаляются в фоне"""
+        if not self.enabled:
+            return
+        self._queue.put(garbage)
+        if self._thread is None:
+            self.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "pending": self._queue.qsize(),
+                "live_requests": len(self._live),
+                "collected_requests": self.collected,
+                "erased_elements": self.erased,
+                "orphans_erased": self.orphans_erased,
+                "failures": self.failures,
+                "watched_orphans": len(self._first_seen),
+                "last_sweep": self.last_sweep
+            }
+
+    # --- Фоновый поток ---
+    def _worker(self) -> None:
+        while True:
+            # Без очистки сирот (sweep_interval <= 0) поток только ждёт наборы запросов
+            timeout = None if self._next_sweep is None else max(0.0, self._next_sweep - time.monotonic())
+            try:
+                garbage = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._sweep()
+                self._next_sweep = time.monotonic() + self.sweep_interval
+                continue
+            if garbage is None:
+                return
+            try:
+                with ScConnectionPool.instance().connection():
+                    self._erase(garbage.actions, garbage.elements)
+                self.collected += 1
+            except Exception as e:
+                self.failures += 1
+                print(f"Ошибка удаления временных элементов: {e}")
+            finally:
+                with self._lock:
+                    self._live.discard(garbage)
+
+    def _erase(self, actions: List[ScAddr], elements: List[ScAddr]) -> None:
+        targets = list(elements)
+        for action in actions:
+            targets.append(action)
+            targets.extend(self._action_results(action))
+        targets = [addr for addr in {addr.value: addr for addr in targets}.values() if addr.is_valid()]
+        if targets:
+            client.erase_elements(*targets)
+            self.erased += len(targets)
+
+    @staticmethod
+    def _action_results(action: ScAddr) -> List[ScAddr]:
+        """
+        Структуры nrel_result действия и помеченные временными ссылки в них
+        (их создают агенты), а также ссылка срока nrel_deadline;
+        остальные члены структур - знания, их не удаляем
+        """
+        nrel_result = KeynodeRegistry.resolve("nrel_result", sc_type.CONST_NODE_NON_ROLE)
+        transient_class = KeynodeRegistry.resolve(TRANSIENT_CLASS, sc_type.CONST_NODE_CLASS)
+        template = ScTemplate()
+        template.quintuple(
+            action,
+            sc_type.VAR_COMMON_ARC,
+            sc_type.VAR_NODE >> "_result",
+            sc_type.VAR_PERM_POS_ARC,
+            nrel_result
+        )
+        results = []
+        for item in client.search_by_template(template):
+            result = item.get("_result")
+            results.append(result)
+            link_template = ScTemplate()
+            link_template.triple(result, sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE_LINK >> "_link")
+            link_template.triple(transient_class, sc_type.VAR_PERM_POS_ARC, "_link")
+            results.extend(link_item.get("_link") for link_item in client.search_by_template(link_template))
+
+        deadline_template = ScTemplate()
+        deadline_template.quintuple(
+            action,
+            sc_type.VAR_COMMON_ARC,
+            sc_type.VAR_NODE_LINK >> "_deadline",
+            sc_type.VAR_PERM_POS_ARC,
+            KeynodeRegistry.resolve(NREL_DEADLINE, sc_type.CONST_NODE_NON_ROLE)
+        )
+        results.extend(item.get("_deadline") for item in client.search_by_template(deadline_template))
+        return results
+
+    def _sweep(self) -> None:
+        """Удаляет помеченные корни, которые дольше orphan_ttl не принадлежат живому запросу этого процесса"""
+        try:
+            with ScConnectionPool.instance().connection():
+                now = time.monotonic()
+                members = {addr.value: addr for addr in search_structure_members(self.transient_class())}
+                # Корни живых запросов этого процесса - не сироты
+                with self._lock:
+                    live_roots = {addr.value for garbage in list(self._live) for addr in garbage.roots()}
+                for value in list(self._first_seen):
+                    if value not in members:
+                        del self._first_seen[value]
+                orphans = []
+                for value, addr in members.items():
+                    first_seen = self._first_seen.setdefault(value, now)
+                    if value not in live_roots and now - first_seen >= self.orphan_ttl:
+                        orphans.append(addr)
+                if orphans:
+                    # Корень без результата - просто элемент; у действий удаляются и результаты
+                    self._erase(orphans, [])
+                    for addr in orphans:
+                        self._first_seen.pop(addr.value, None)
+                    self.orphans_erased += len(orphans)
+                    print(f"Удалено временных элементов без владельца: {len(orphans)}")
+                self.last_sweep = time.time()
+        except Exception as e:
+            self.failures += 1
+            print(f"Ошибка очистки временных элементов: {e}")
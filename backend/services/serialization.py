@@ -0,0 +1,33 @@
+import json
+from typing import Any
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него используется компактный json
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    """Компактная сериализация в UTF-8 без отступов"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(Response):
+    """JSON-ответ через dumps; уже сериализованные str/bytes отдаются без повторной сериализации"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, str):
+            return content.encode("utf-8")
+        return dumps(content)
@@ -7,12 +7,14 @@ from .geometry_search_agent import GeometrySearchAgent
 from .geometry_sequence_extractor_agent import GeometrySequenceExtractorAgent
 from .geometry_search_module import GeometrySearchModule
 from .geometry_sequence_parser_agent import GeometrySequenceParser
+from .geometry_pipeline_agent import GeometryPipelineAgent
 
 __all__ = [
     "GeometrySearchAgent",
     "GeometrySequenceExtractorAgent", 
     "GeometrySearchModule",
-    "GeometrySequenceParser"
+    "GeometrySequenceParser",
+    "GeometryPipelineAgent"
 ]
 
 __version__ = "1.1.0"
@@ -0,0 +1,101 @@
+"""
+Deadline and cancellation of an action, set by the caller
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from sc_client.client import get_link_content, search_by_template
+from sc_client.constants import sc_type
+from sc_client.models import ScAddr, ScTemplate
+from sc_kpm import ScKeynodes
+
+# Совпадают с services.request_deadline
+NREL_DEADLINE = "nrel_deadline"
+ACTION_CANCELLED = "action_cancelled"
+
+# Как часто проверять отметку отмены в sc-памяти (срок проверяется при каждом вызове), секунды
+CANCEL_CHECK_INTERVAL = 1.0
+
+_current = threading.local()
+
+
+class ActionCancelled(BaseException):
+    """
+    Срок действия истёк или вызывающий отменил его.
+    Наследуется от BaseException, как asyncio.CancelledError: обработчики
+    except Exception в этапах поиска не должны проглатывать отмену.
+    """
+
+
+class ActionDeadline:
+    """
+    Срок (action => nrel_deadline: [unix-время]) и отметка отмены (action_cancelled -> action)
+    действия. check() вызывается агентами между поисками по шаблону.
+    """
+
+    def __init__(self, action: ScAddr, expires_at: Optional[float] = None):
+        self.action = action
+        self.expires_at = expires_at
+        self._lock = threading.Lock()
+        self._next_cancel_check = 0.0
+
+    @classmethod
+    def for_action(cls, action: ScAddr) -> "ActionDeadline":
+        """Читает срок действия; без nrel_deadline действие ограничено только отменой"""
+        expires_at = None
+        try:
+            template = ScTemplate()
+            template.quintuple(
+                action,
+                sc_type.VAR_COMMON_ARC,
+                sc_type.VAR_NODE_LINK >> "_deadline",
+                sc_type.VAR_PERM_POS_ARC,
+                ScKeynodes.resolve(NREL_DEADLINE, sc_type.CONST_NODE_NON_ROLE)
+            )
+            results = search_by_template(template)
+            if results:
+                expires_at = float(get_link_content(results[0].get("_deadline"))[0].data)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Invalid deadline of action {action.value}: {e}")
+        return cls(action, expires_at)
+
+    def check(self) -> None:
+        if self.expires_at is not None and time.time() >= self.expires_at:
+            raise ActionCancelled("deadline exceeded")
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_cancel_check:
+                return
+            self._next_cancel_check = now + CANCEL_CHECK_INTERVAL
+        template = ScTemplate()
+        template.triple(
+            ScKeynodes.resolve(ACTION_CANCELLED, sc_type.CONST_NODE_CLASS),
+            sc_type.VAR_PERM_POS_ARC,
+            self.action
+        )
+        if search_by_template(template):
+            raise ActionCancelled("cancelled by caller")
+
+    @contextmanager
+    def activate(self) -> Iterator["ActionDeadline"]:
+        """Делает срок текущим для потока: его проверяет check_deadline()"""
+        previous = getattr(_current, "deadline", None)
+        _current.deadline = self
+        try:
+            yield self
+        finally:
+            _current.deadline = previous
+
+
+def current_deadline() -> Optional[ActionDeadline]:
+    return getattr(_current, "deadline", None)
+
+
+def check_deadline() -> None:
+    """Прерывает этап агента (ActionCancelled), если срок текущего действия истёк или оно отменено"""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
@@ -0,0 +1,219 @@
+"""
+In-memory index of task structures for GeometrySearchAgent
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.constants.common import ScEventType
+from sc_client.models import ScAddr, ScEventSubscriptionParams, ScTemplate
+from sc_kpm import ScKeynodes, ScResult
+from config import TASK_INDEX_REBUILD_INTERVAL
+
+NREL_CONTEXT = "nrel_context_of_the_action"
+
+
+class TaskCandidateIndex:
+    """
+    Инвертированный индекс задач: task => nrel_context_of_the_action: structure.
+
+    Ключ - узел-член структуры задачи (именованный элемент, отношение, класс понятия),
+    список - структуры, которые его содержат. Кандидаты для набора ключей -
+    пересечение списков, а не обход всех задач базы знаний.
+
+    Индекс строится при регистрации агента двумя поисками по шаблону и обновляется
+    по событиям появления и удаления дуг из nrel_context_of_the_action; содержимое
+    новой структуры читается при первом поиске после события. Без подписки, а также
+    раз в TASK_INDEX_REBUILD_INTERVAL секунд индекс перестраивается целиком.
+    """
+
+    def __init__(self, rebuild_interval: float = TASK_INDEX_REBUILD_INTERVAL):
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        # Структура -> {"structure", "const_node"}, в порядке появления
+        self._entries: Dict[int, dict] = {}
+        # Дуга task => structure -> структура (для событий удаления)
+        self._arcs: Dict[int, int] = {}
+        self._postings: Dict[int, Set[int]] = {}
+        self._members: Dict[int, Set[int]] = {}
+        # Структуры, содержимое которых ещё не прочитано
+        self._dirty: Set[int] = set()
+        self._subscriptions = []
+        self._built_at: Optional[float] = None
+        # Растёт при каждом изменении набора структур или их содержимого
+        self.version = 0
+
+        self.rebuilds = 0
+        self.events = 0
+
+    # --- Жизненный цикл ---
+    def start(self) -> None:
+        """Подписывается на дуги nrel_context_of_the_action и строит индекс"""
+        nrel_context = ScKeynodes.resolve(NREL_CONTEXT, sc_type.CONST_NODE_NON_ROLE)
+        try:
+            self._subscriptions = client.create_elementary_event_subscriptions(
+                ScEventSubscriptionParams(nrel_context, ScEventType.AFTER_GENERATE_OUTGOING_ARC, self._on_context_added),
+                ScEventSubscriptionParams(nrel_context, ScEventType.BEFORE_ERASE_OUTGOING_ARC, self._on_context_erased)
+            )
+        except Exception as e:
+            self._subscriptions = []
+            logging.warning(f"Task index subscription unavailable, rebuilding on every search: {e}")
+        self.rebuild()
+
+    def stop(self) -> None:
+        subscriptions, self._subscriptions = self._subscriptions, []
+        if subscriptions and client.is_connected():
+            try:
+                client.destroy_elementary_event_subscriptions(*subscriptions)
+            except Exception as e:
+                logging.warning(f"Error destroying task index subscriptions: {e}")
+
+    def rebuild(self) -> None:
+        """Полная перестройка: все задачи и узлы их структур"""
+        nrel_context = ScKeynodes.resolve(NREL_CONTEXT, sc_type.CONST_NODE_NON_ROLE)
+        template = ScTemplate()
+        template.quintuple(
+            sc_type.VAR_NODE >> "_const_node",
+            sc_type.VAR_COMMON_ARC >> "_arc",
+            sc_type.VAR_NODE_STRUCTURE >> "_structure",
+            sc_type.VAR_PERM_POS_ARC,
+            nrel_context
+        )
+        members_template = ScTemplate()
+        members_template.quintuple(
+            sc_type.VAR_NODE,
+            sc_type.VAR_COMMON_ARC,
+            sc_type.VAR_NODE_STRUCTURE >> "_structure",
+            sc_type.VAR_PERM_POS_ARC,
+            nrel_context
+        )
+        members_template.triple("_structure", sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_member")
+
+        with self._lock:
+            entries: Dict[int, dict] = {}
+            arcs: Dict[int, int] = {}
+            for result in client.search_by_template(template):
+                structure = result.get("_structure")
+                arcs[result.get("_arc").value] = structure.value
+                entries.setdefault(structure.value, {"structure": structure, "const_node": result.get("_const_node")})
+            members: Dict[int, Set[int]] = {value: set() for value in entries}
+            for result in client.search_by_template(members_template):
+                members.setdefault(result.get("_structure").value, set()).add(result.get("_member").value)
+
+            self._entries, self._arcs, self._dirty = entries, arcs, set()
+            self._members, self._postings = {}, {}
+            for structure, structure_members in members.items():
+                if structure in entries:
+                    self._set_members(structure, structure_members)
+            self._built_at = time.monotonic()
+            self.version += 1
+            self.rebuilds += 1
+        logging.info(f"Task index built: {len(entries)} structures, {len(self._postings)} keys")
+
+    # --- Поиск ---
+    def candidates(self) -> List[dict]:
+        """Все структуры задач ({"structure", "const_node"}), индекс при этом приводится в актуальное состояние"""
+        with self._lock:
+            self._ensure_fresh()
+            return list(self._entries.values())
+
+    def narrow(self, candidates: List[dict], keys: Iterable[ScAddr]) -> List[dict]:
+        """Оставляет кандидатов, структуры которых содержат все ключи (пересечение списков)"""
+        with self._lock:
+            self._ensure_fresh()
+            postings = []
+            for key in {key.value for key in keys}:
+                posting = self._postings.get(key)
+                if not posting:
+                    return []
+                postings.append(posting)
+            if not postings:
+                return candidates
+            postings.sort(key=len)
+            matched = set(postings[0])
+            for posting in postings[1:]:
+                matched &= posting
+                if not matched:
+                    return []
+        return [candidate for candidate in candidates if candidate["structure"].value in matched]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "structures": len(self._entries),
+                "keys": len(self._postings),
+                "dirty": len(self._dirty),
+                "version": self.version,
+                "subscribed": bool(self._subscriptions),
+                "rebuilds": self.rebuilds,
+                "events": self.events
+            }
+
+    # --- Вспомогательные методы (вызываются под self._lock) ---
+    def _ensure_fresh(self) -> None:
+        stale = self._built_at is None or not self._subscriptions or (
+            self.rebuild_interval > 0 and time.monotonic() - self._built_at >= self.rebuild_interval
+        )
+        if stale:
+            self.rebuild()
+            return
+        for structure in list(self._dirty):
+            self._set_members(structure, self._read_members(self._entries[structure]["structure"]))
+        if self._dirty:
+            self._dirty.clear()
+            self.version += 1
+
+    def _set_members(self, structure: int, members: Set[int]) -> None:
+        self._drop_members(structure)
+        self._members[structure] = members
+        for member in members:
+            self._postings.setdefault(member, set()).add(structure)
+
+    def _drop_members(self, structure: int) -> None:
+        for member in self._members.pop(structure, ()):
+            posting = self._postings.get(member)
+            if posting is not None:
+                posting.discard(structure)
+                if not posting:
+                    del self._postings[member]
+
+    @staticmethod
+    def _read_members(structure: ScAddr) -> Set[int]:
+        template = ScTemplate()
+        template.triple(structure, sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_member")
+        return {result.get("_member").value for result in client.search_by_template(template)}
+
+    # --- Обработчики событий (вызываются в потоках sc_client) ---
+    def _on_context_added(self, _nrel_context: ScAddr, _arc: ScAddr, context_arc: ScAddr) -> ScResult:
+        # Дуга из nrel_context_of_the_action указывает на дугу task => structure
+        try:
+            template = ScTemplate()
+            template.triple(sc_type.VAR_NODE >> "_const_node", context_arc, sc_type.VAR_NODE_STRUCTURE >> "_structure")
+            results = client.search_by_template(template)
+            with self._lock:
+                self.events += 1
+                for result in results:
+                    structure = result.get("_structure")
+                    self._arcs[context_arc.value] = structure.value
+                    if structure.value not in self._entries:
+                        self._entries[structure.value] = {"structure": structure, "const_node": result.get("_const_node")}
+                    self._dirty.add(structure.value)
+        except Exception as e:
+            logging.error(f"Error indexing task structure: {e}")
+        return ScResult.OK
+
+    def _on_context_erased(self, _nrel_context: ScAddr, _arc: ScAddr, context_arc: ScAddr) -> ScResult:
+        with self._lock:
+            self.events += 1
+            structure = self._arcs.pop(context_arc.value, None)
+            # Структура остаётся в индексе, пока на неё указывает другая задача
+            if structure is None or structure in self._arcs.values():
+                return ScResult.OK
+            self._entries.pop(structure, None)
+            self._dirty.discard(structure)
+            self._drop_members(structure)
+            self.version += 1
+        return ScResult.OK
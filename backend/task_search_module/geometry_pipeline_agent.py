@@ -0,0 +1,155 @@
+"""
+Agent running the whole geometry pipeline (search -> extract -> parse) in one action
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from sc_client.models import ScAddr, ScLinkContentType
+
+from sc_kpm import ScResult
+from .worker_routing import RoutedScAgent
+from .geometry_search_agent import GeometrySearchAgent
+from .geometry_sequence_extractor_agent import GeometrySequenceExtractorAgent
+from .geometry_sequence_parser_agent import GeometrySequenceParser
+from .transient import mark_transient
+from .action_deadline import check_deadline, current_deadline
+from sc_kpm.utils import generate_link, get_link_content_data, get_element_system_identifier
+from sc_kpm.utils.action_utils import (
+    generate_action_result,
+    finish_action_with_status,
+    get_action_arguments
+)
+from config import AGENT_SOLUTION_WORKERS, MAX_SOLUTIONS_LIMIT
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+class GeometryPipelineAgent(RoutedScAgent):
+    """
+    Поиск задачи, извлечение последовательности и парсинг в одном действии:
+    этапы передают друг другу Python-объекты, в sc-память записывается только
+    итоговая ссылка с JSON. Отдельные агенты этапов остаются для отладки.
+
+    Необязательный второй аргумент (rrel_2) - ссылка с max_solutions. Если он больше 1,
+    последовательности первых max_solutions найденных задач извлекаются и разбираются
+    параллельно, а в JSON добавляется ранжированный список solutions.
+    """
+
+    def __init__(self, search_agent: GeometrySearchAgent, extractor_agent: GeometrySequenceExtractorAgent,
+                 worker_id: Optional[int] = None):
+        super().__init__("action_solve_geometry_construction", worker_id)
+        self.search_agent = search_agent
+        self.extractor_agent = extractor_agent
+        self.parser = GeometrySequenceParser()
+
+    def on_event(self, action_class: ScAddr, arc: ScAddr, action: ScAddr) -> ScResult:
+        result = self.run(action)
+        is_successful = result == ScResult.OK
+        finish_action_with_status(action, is_successful)
+        logging.info("GeometryPipelineAgent finished %s",
+                     "successfully" if is_successful else "unsuccessfully")
+        return result
+
+    def run(self, action_node: ScAddr) -> ScResult:
+        logging.info("GeometryPipelineAgent started")
+
+        try:
+            # Получаем аргументы - структуру входной конструкции и число решений
+            arguments = get_action_arguments(action_node, 2)
+            if not arguments or not arguments[0].is_valid():
+                logging.error("No arguments provided")
+                return ScResult.ERROR
+
+            search_structure = arguments[0]
+            max_solutions = self.get_max_solutions(arguments[1])
+
+            # Шаг 1: Поиск задач с той же структурой
+            found_tasks = self.search_agent.search_tasks(search_structure)
+            if not found_tasks:
+                logging.error("No task found for the construction")
+                return ScResult.ERROR
+
+            # Шаги 2-3: Извлечение и парсинг последовательностей найденных задач
+            check_deadline()
+            found_tasks = list({task.value: task for task in found_tasks}.values())
+            if max_solutions == 1:
+                json_result = self.solve_task(found_tasks[0])
+            else:
+                json_result = self.solve_tasks(found_tasks[:max_solutions])
+            if json_result is None:
+                return ScResult.ERROR
+            json_string = json.dumps(json_result, ensure_ascii=False, separators=(",", ":"))
+
+            result_node = generate_link(content=json_string, content_type=ScLinkContentType.STRING)
+            mark_transient(result_node)
+            generate_action_result(action_node, result_node)
+            logging.info("=== ПАЙПЛАЙН ЗАВЕРШЕН ===")
+
+            return ScResult.OK
+
+        except Exception as e:
+            logging.error(f"Error in GeometryPipelineAgent: {str(e)}")
+            import traceback
+            logging.error(traceback.format_exc())
+            return ScResult.ERROR
+
+    def get_max_solutions(self, argument: ScAddr) -> int:
+        """Число решений из ссылки-аргумента; без аргумента - одно решение"""
+        if not argument or not argument.is_valid():
+            return 1
+        try:
+            return max(1, min(int(get_link_content_data(argument)), MAX_SOLUTIONS_LIMIT))
+        except (TypeError, ValueError):
+            logging.warning("Invalid max_solutions argument, using 1")
+            return 1
+
+    def solve_task(self, task: ScAddr) -> Optional[dict]:
+        """Извлекает и парсит последовательность решения одной задачи"""
+        sequence = self.extractor_agent.extract_sequence(task)
+        if sequence is None:
+            return None
+        sequence_nodes, _, _ = sequence
+        return self.parser.parse_sequence_nodes(sequence_nodes)
+
+    def solve_tasks(self, tasks: List[ScAddr]) -> Optional[dict]:
+        """
+        Решает несколько задач параллельно (запросы идут через общую сессию sc_client)
+        и возвращает лучшее решение с ранжированным списком solutions:
+        сначала более короткие последовательности, при равенстве - в порядке поиска
+        """
+        deadline = current_deadline()
+
+        def solve(task: ScAddr) -> Optional[dict]:
+            # Срок действия действует и в потоках решения
+            if deadline is None:
+                return self.solve_task(task)
+            with deadline.activate():
+                return self.solve_task(task)
+
+        with ThreadPoolExecutor(max_workers=min(AGENT_SOLUTION_WORKERS, len(tasks)),
+                                thread_name_prefix="geometry-solution") as executor:
+            results = list(executor.map(solve, tasks))
+
+        solved = [
+            (task, result) for task, result in zip(tasks, results)
+            if result is not None and "error" not in result
+        ]
+        if not solved:
+            return None
+        solved.sort(key=lambda item: len(item[1]["steps"]))
+        logging.info(f"Решено задач: {len(solved)} из {len(tasks)}")
+
+        solutions = [
+            {
+                "rank": rank,
+                "task": get_element_system_identifier(task) or f"task_{task.value}",
+                **result
+            }
+            for rank, (task, result) in enumerate(solved, start=1)
+        ]
+        # Лучшее решение остаётся на верхнем уровне, как при одном решении
+        return {"idx": solutions[0]["idx"], "steps": solutions[0]["steps"], "solutions": solutions}
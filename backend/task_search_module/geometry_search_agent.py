@@ -3,14 +3,20 @@ Agent for searching geometric constructions in OSTIS knowledge base
 """
 
 import logging
-from sc_client.models import ScAddr, ScLinkContentType
+from typing import Dict, Optional, Set
+from sc_client.models import ScAddr, ScIdtfResolveParams, ScLinkContentType
 from sc_client.constants import sc_type
 from sc_client.client import search_by_template
 from sc_client.models import ScTemplate
 from sc_kpm.sc_sets import ScStructure
-from sc_client.client import get_elements_types
+from sc_client.client import get_elements_types, get_link_content, resolve_keynodes
 
-from sc_kpm import ScAgentClassic, ScResult, ScKeynodes
+from sc_kpm import ScResult, ScKeynodes
+from .worker_routing import RoutedScAgent
+from .action_deadline import check_deadline
+from .candidate_index import TaskCandidateIndex
+from .subgraph_matcher import CandidateGraphCache, LocalPattern
+from .signature_prefilter import TaskSignatures
 from sc_kpm.utils import (
     generate_link, generate_node, generate_connector, get_element_system_identifier
 )
@@ -21,14 +27,29 @@ from sc_kpm.utils.action_utils import (
 )
 
 
+# Совпадает с services.sc_adapter: имя элемента конструкции, загруженной в режиме запроса
+NREL_SCOPED_IDTF = "nrel_scoped_idtf"
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
 )
 
 
-class GeometrySearchAgent(ScAgentClassic):
-    def __init__(self):
-        super().__init__("action_search_geometry_constructions")
+class GeometrySearchAgent(RoutedScAgent):
+    def __init__(self, worker_id: Optional[int] = None):
+        super().__init__("action_search_geometry_constructions", worker_id)
+        self.candidate_index = TaskCandidateIndex()
+        self.candidate_graphs = CandidateGraphCache()
+        self.signatures = TaskSignatures(self.candidate_index)
+
+    def _register(self) -> None:
+        super()._register()
+        self.candidate_index.start()
+
+    def _unregister(self) -> None:
+        self.candidate_index.stop()
+        self.candidate_graphs.clear()
+        super()._unregister()
 
     def on_event(self, action_class: ScAddr, arc: ScAddr, action: ScAddr) -> ScResult:
         result = self.run(action)
@@ -50,37 +71,11 @@ class GeometrySearchAgent(ScAgentClassic):
                 
             search_structure = arguments[0]
             
-            # Проверяем, что это действительно структура
-            if not self.is_structure(search_structure):
-                logging.error("Input argument is not a structure")
+            found_tasks = self.search_tasks(search_structure)
+            if found_tasks is None:
                 return ScResult.ERROR
             
-            logging.info(f"=== НАЧАЛО ПОИСКА ===")
-            logging.info(f"Входная структура: {search_structure.value}")
-            
-            # Шаг 1: Получаем все структуры по паттерну
-            candidate_structures = self.find_structures_by_pattern()
-            logging.info(f"Найдено структур-кандидатов: {len(candidate_structures)}")
-            
-            # Шаг 2: Получаем все ноды входной структуры
-            input_nodes = self.get_all_nodes_from_structure(search_structure)
-            logging.info(f"Ноды входной структуры ({len(input_nodes)}):")
-            for node in input_nodes:
-                node_idtf = get_element_system_identifier(node) or f"unknown_{node.value}"
-                logging.info(f"  - {node_idtf}")
-            
-            # Шаг 3: Фильтруем кандидатов, проверяя тройки и пятёрки
-            matching_structures = self.filter_structures_by_triples_and_quintuples(
-                candidate_structures, search_structure, input_nodes
-            )
-            
-            logging.info(f"Найдено подходящих структур: {len(matching_structures)}")
-            
-            # Шаг 4: Создаем результирующую структуру
-            found_tasks = self.create_result_structure(matching_structures)
-            
             generate_action_result(action_node, *found_tasks)
-            logging.info("=== ПОИСК ЗАВЕРШЕН ===")
             
             return ScResult.OK
             
@@ -88,6 +83,49 @@ class GeometrySearchAgent(ScAgentClassic):
             logging.error(f"Error in GeometrySearchAgent: {str(e)}")
             return ScResult.ERROR
 
+    def search_tasks(self, search_structure: ScAddr) -> Optional[list]:
+        """Ищет задачи, структура которых совпадает с входной; None - входной аргумент не структура"""
+        # Проверяем, что это действительно структура
+        if not self.is_structure(search_structure):
+            logging.error("Input argument is not a structure")
+            return None
+        
+        logging.info(f"=== НАЧАЛО ПОИСКА ===")
+        logging.info(f"Входная структура: {search_structure.value}")
+        
+        # Шаг 1: Получаем все структуры по паттерну
+        candidate_structures = self.find_structures_by_pattern()
+        logging.info(f"Найдено структур-кандидатов: {len(candidate_structures)}")
+        
+        # Шаг 2: Получаем все ноды входной структуры
+        check_deadline()
+        input_nodes = self.get_all_nodes_from_structure(search_structure)
+        logging.info(f"Ноды входной структуры ({len(input_nodes)}):")
+        for node in input_nodes:
+            node_idtf = get_element_system_identifier(node) or f"unknown_{node.value}"
+            logging.info(f"  - {node_idtf}")
+        
+        # Шаг 3: Отсеиваем кандидатов, в которых меньше элементов какого-либо класса или отношения
+        check_deadline()
+        structure_members = self.get_structure_members(search_structure)
+        scoped_names = self.get_scoped_names(search_structure)
+        candidate_structures = self.prefilter_by_signature(
+            candidate_structures, search_structure, structure_members, scoped_names
+        )
+        logging.info(f"Кандидатов после сравнения сигнатур: {len(candidate_structures)}")
+        
+        # Шаг 4: Фильтруем кандидатов, проверяя тройки и пятёрки
+        matching_structures = self.filter_structures_by_triples_and_quintuples(
+            candidate_structures, search_structure, input_nodes, structure_members, scoped_names
+        )
+        
+        logging.info(f"Найдено подходящих структур: {len(matching_structures)}")
+        
+        # Шаг 5: Создаем результирующую структуру
+        found_tasks = self.create_result_structure(matching_structures)
+        logging.info("=== ПОИСК ЗАВЕРШЕН ===")
+        return found_tasks
+
     def is_structure(self, element: ScAddr) -> bool:
         """Проверяет, является ли элемент структурой"""
         try:
@@ -99,35 +137,11 @@ class GeometrySearchAgent(ScAgentClassic):
             return False
         
     def find_structures_by_pattern(self) -> list:
-        """Шаг 1: Ищет структуры по паттерну CONST_NODE -> STRUCT через nrel_context_of_action"""
+        """Шаг 1: Структуры задач (CONST_NODE => nrel_context_of_the_action: STRUCT) из индекса"""
         structures = []
         
         try:
-            template = ScTemplate()
-            
-            nrel_context = ScKeynodes.resolve("nrel_context_of_the_action", sc_type.CONST_NODE_NON_ROLE)
-            
-            template.quintuple(
-                sc_type.VAR_NODE >> "_const_node",         
-                sc_type.VAR_COMMON_ARC >> "_arc",         
-                sc_type.VAR_NODE_STRUCTURE >> "_structure",         
-                sc_type.VAR_PERM_POS_ARC >> "_context_arc",  
-                nrel_context                                 
-            )
-            
-            search_results = search_by_template(template)
-            
-            for result in search_results:
-                structure_addr = result.get("_structure")
-                const_node_addr = result.get("_const_node")
-                print(get_element_system_identifier(const_node_addr))
-                
-                if structure_addr and structure_addr.is_valid() and self.is_structure(structure_addr):
-                    structures.append({
-                        "structure": structure_addr,
-                        "const_node": const_node_addr
-                    })
-                    
+            structures = self.candidate_index.candidates()
             logging.info(f"Найдено структур по паттерну: {len(structures)}")
                     
         except Exception as e:
@@ -159,8 +173,29 @@ class GeometrySearchAgent(ScAgentClassic):
             
         return nodes
 
+    def prefilter_by_signature(self, candidate_structures: list, search_structure: ScAddr,
+                               structure_members: Optional[Set[int]],
+                               scoped_names: Optional[Dict[int, ScAddr]] = None) -> list:
+        """Сравнивает числа элементов по классам и отношениям входной структуры с сигнатурами кандидатов"""
+        if structure_members is None or not candidate_structures:
+            return candidate_structures
+        try:
+            required = self.signatures.input_signature(
+                search_structure, structure_members,
+                lambda element: not isinstance(self.get_membership_term(element, "_signature"), tuple),
+                lambda element: element.value in (scoped_names or {}) or not isinstance(
+                    self.get_element_for_reconstruction(element, "_signature"), tuple
+                )
+            )
+            return self.signatures.prefilter(candidate_structures, required)
+        except Exception as e:
+            logging.error(f"Error comparing signatures: {str(e)}")
+            return candidate_structures
+
     def filter_structures_by_triples_and_quintuples(self, candidate_structures: list, 
-                                                search_structure: ScAddr, input_nodes: list) -> list:
+                                                search_structure: ScAddr, input_nodes: list,
+                                                structure_members: Optional[Set[int]] = None,
+                                                scoped_names: Optional[Dict[int, ScAddr]] = None) -> list:
         """Фильтрует структуры, проверяя тройки и пятёрки"""
         matching_structures = []
         
@@ -169,12 +204,24 @@ class GeometrySearchAgent(ScAgentClassic):
         logging.info(f"Кандидатов до начала отсеивания: {len(remaining_candidates)}")
         
         try:
+            # Элементы входной структуры читаются один раз: принадлежность паттернов проверяется локально
+            if structure_members is None:
+                structure_members = self.get_structure_members(search_structure)
+            
             for node in input_nodes:
+                check_deadline()
                 node_idtf = get_element_system_identifier(node) or f"unknown_{node.value}"
                 logging.info(f"Обрабатываем ноду: {node_idtf}")
                 
                 # Получаем все тройки и пятёрки для текущей ноды
-                triples_and_quintuples = self.get_triples_and_quintuples_for_node(node, search_structure)
+                triples_and_quintuples = self.get_triples_and_quintuples_for_node(
+                    node, search_structure, structure_members, scoped_names
+                )
+                
+                # Сначала отсекаем по индексу кандидатов без обязательных элементов паттернов
+                remaining_candidates = self.candidate_index.narrow(
+                    remaining_candidates, self.get_required_pattern_elements(triples_and_quintuples)
+                )
                 
                 # Фильтруем кандидатов
                 remaining_candidates = self.filter_candidates_by_patterns(
@@ -195,65 +242,28 @@ class GeometrySearchAgent(ScAgentClassic):
         return matching_structures
 
 
-    def get_triples_and_quintuples_for_node(self, node: ScAddr, structure: ScAddr) -> list:
+    def get_triples_and_quintuples_for_node(self, node: ScAddr, structure: ScAddr,
+                                            structure_members: Optional[Set[int]] = None,
+                                            scoped_names: Optional[Dict[int, ScAddr]] = None) -> list:
         """Получает все тройки и пятёрки для ноды, где все связанные ноды принадлежат структуре"""
         patterns = []
         
         try:
-            # Шаблон 1: Тройки с тонкими дугами (исходящие)
-            template_outgoing = ScTemplate()
-            template_outgoing.triple(
-                node >> "_source",
-                sc_type.VAR_PERM_POS_ARC >> "_arc",
-                sc_type.VAR_NODE >> "_target"
-            )
-            
-            # Шаблон 2: Пятёрки с ролевыми отношениями (ориентированное ребро)
-            template_quintuple_role = ScTemplate()
-            template_quintuple_role.quintuple(
-                node >> "_source",
-                sc_type.VAR_ARC >> "_main_arc",
-                sc_type.VAR_NODE >> "_target",
-                sc_type.VAR_ARC >> "_rel_arc", 
-                sc_type.VAR_NODE_ROLE >> "_relation"
-            )
-            
-            # Шаблон 3: Пятёрки с не-ролевыми отношениями (ориентированное ребро)
-            template_quintuple_nonrole = ScTemplate()
-            template_quintuple_nonrole.quintuple(
-                node >> "_source",
-                sc_type.VAR_ARC >> "_main_arc",
-                sc_type.VAR_NODE >> "_target", 
-                sc_type.VAR_ARC >> "_rel_arc",
-                sc_type.VAR_NODE_NON_ROLE >> "_relation"
-            )
-            
-            # Шаблон 4: Пятёрки с ролевыми отношениями (неориентированное ребро - EDGE_COMMON)
-            template_quintuple_role_edge = ScTemplate()
-            template_quintuple_role_edge.quintuple(
-                node >> "_source",
-                sc_type.VAR_COMMON_EDGE >> "_main_edge", 
-                sc_type.VAR_NODE >> "_target",
-                sc_type.VAR_ARC >> "_rel_arc", 
-                sc_type.VAR_NODE_ROLE >> "_relation"
-            )
-            
-            # Шаблон 5: Пятёрки с не-ролевыми отношениями (неориентированное ребро - EDGE_COMMON)
-            template_quintuple_nonrole_edge = ScTemplate()
-            template_quintuple_nonrole_edge.quintuple(
-                node >> "_source",
-                sc_type.VAR_COMMON_EDGE >> "_main_edge", 
-                sc_type.VAR_NODE >> "_target", 
-                sc_type.VAR_ARC >> "_rel_arc",
-                sc_type.VAR_NODE_NON_ROLE >> "_relation"
-            )
-            
-            # Выполняем поиски только для исходящих отношений
-            patterns.extend(self.execute_template_search(template_outgoing, "triple_outgoing", structure))
-            patterns.extend(self.execute_template_search(template_quintuple_role, "quintuple_role", structure))
-            patterns.extend(self.execute_template_search(template_quintuple_nonrole, "quintuple_nonrole", structure))
-            patterns.extend(self.execute_template_search(template_quintuple_role_edge, "quintuple_role_edge", structure))
-            patterns.extend(self.execute_template_search(template_quintuple_nonrole_edge, "quintuple_nonrole_edge", structure))
+            # Паттерны с одинаковыми элементами дают одну и ту же проверку кандидата - оставляем один
+            seen = set()
+            for pattern in self.load_node_neighbourhood(node):
+                if not self.all_pattern_elements_belong_to_structure(pattern, structure, structure_members):
+                    logging.debug(f"Паттерн {pattern['type']} отфильтрован - не все элементы принадлежат структуре")
+                    continue
+                if scoped_names:
+                    pattern = self.with_shared_nodes(pattern, scoped_names)
+                key = (pattern["type"],) + tuple(
+                    (alias, element.value) for alias, element in pattern["elements"].items()
+                    if alias in ("_source", "_target", "_relation")
+                )
+                if key not in seen:
+                    seen.add(key)
+                    patterns.append(pattern)
             
             self.log_pattern_elements(patterns)
             
@@ -262,46 +272,116 @@ class GeometrySearchAgent(ScAgentClassic):
             
         return patterns
 
-    def execute_template_search(self, template: ScTemplate, pattern_type: str, structure: ScAddr) -> list:
-        """Выполняет поиск по шаблону и возвращает результаты, где все элементы принадлежат структуре"""
-        patterns = []
+    def get_scoped_names(self, structure: ScAddr) -> Dict[int, ScAddr]:
+        """
+        Узлы структуры, загруженной в режиме запроса (анонимный узел => nrel_scoped_idtf: [имя]),
+        и общие узлы с теми же системными идентификаторами: паттерны строятся по общим узлам,
+        как если бы конструкция была загружена в них
+        """
+        template = ScTemplate()
+        template.triple(structure, sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_element")
+        template.quintuple(
+            "_element",
+            sc_type.VAR_COMMON_ARC,
+            sc_type.VAR_NODE_LINK >> "_name",
+            sc_type.VAR_PERM_POS_ARC,
+            ScKeynodes.resolve(NREL_SCOPED_IDTF, sc_type.CONST_NODE_NON_ROLE)
+        )
+        named = {}
+        for result in search_by_template(template):
+            named.setdefault(result.get("_element").value, (result.get("_element"), result.get("_name")))
+        if not named:
+            return {}
+        elements = [element for element, _ in named.values()]
+        names = get_link_content(*(name for _, name in named.values()))
+        # Общий узел создаётся, если его ещё нет - как при загрузке без режима запроса
+        shared = resolve_keynodes(*(
+            ScIdtfResolveParams(idtf=str(name.data), type=element_type)
+            for name, element_type in zip(names, get_elements_types(*elements))
+        ))
+        return {element.value: addr for element, addr in zip(elements, shared) if addr.is_valid()}
+
+    @staticmethod
+    def with_shared_nodes(pattern: dict, scoped_names: Dict[int, ScAddr]) -> dict:
+        """Паттерн, в котором узлы конструкции запроса заменены общими узлами с теми же именами"""
+        elements = {
+            alias: scoped_names.get(element.value, element) if element is not None else element
+            for alias, element in pattern["elements"].items()
+        }
+        return dict(pattern, elements=elements)
+
+    def load_node_neighbourhood(self, node: ScAddr) -> list:
+        """
+        Исходящие связи ноды двумя поисками и одним запросом типов, разобранные локально:
+        тройки с тонкими дугами и пятёрки с ролевыми и не-ролевыми отношениями
+        над ориентированными дугами и неориентированными рёбрами
+        """
+        # Тройки с тонкими дугами (исходящие)
+        template_outgoing = ScTemplate()
+        template_outgoing.triple(
+            node,
+            sc_type.VAR_PERM_POS_ARC >> "_arc",
+            sc_type.VAR_NODE >> "_target"
+        )
+        triples = [
+            {"type": "triple_outgoing",
+             "elements": {"_source": node, "_arc": result.get("_arc"), "_target": result.get("_target")}}
+            for result in search_by_template(template_outgoing)
+        ]
         
-        try:
-            search_results = search_by_template(template)
-            
-            for result in search_results:
-                pattern_data = {
-                    "type": pattern_type,
-                    "elements": {}
-                }
-                
-                aliases = ["_source", "_target", "_arc", "_main_arc", "_rel_arc", "_relation", "_main_edge"]
-                
-                for alias in aliases:
-                    try:
-                        element = result.get(alias)
-                        if element and element.is_valid():
-                            pattern_data["elements"][alias] = element
-                    except:
-                        pass
-                
-                # Проверяем, что ВСЕ элементы паттерна (ноды и дуги) принадлежат нашей структуре
-                if self.all_pattern_elements_belong_to_structure(pattern_data, structure):
-                    patterns.append(pattern_data)
+        # Связки с отношением: любой исходящий коннектор и дуга из отношения в него;
+        # тип коннектора и отношения определяет вид пятёрки
+        template_attributed = ScTemplate()
+        template_attributed.quintuple(
+            node,
+            sc_type.VAR_CONNECTOR >> "_main",
+            sc_type.VAR_NODE >> "_target",
+            sc_type.VAR_ARC >> "_rel_arc",
+            sc_type.VAR_NODE >> "_relation"
+        )
+        attributed = search_by_template(template_attributed)
+        quintuples = {kind: [] for kind in (
+            "quintuple_role", "quintuple_nonrole", "quintuple_role_edge", "quintuple_nonrole_edge"
+        )}
+        if attributed:
+            addrs = list({
+                addr.value: addr for result in attributed
+                for addr in (result.get("_main"), result.get("_relation"))
+            }.values())
+            types = dict(zip((addr.value for addr in addrs), get_elements_types(*addrs)))
+            for result in attributed:
+                main, relation = result.get("_main"), result.get("_relation")
+                main_type, relation_type = types[main.value], types[relation.value]
+                if relation_type.is_role():
+                    kind = "quintuple_role"
+                elif relation_type.is_non_role():
+                    kind = "quintuple_nonrole"
                 else:
-                    logging.debug(f"Паттерн {pattern_type} отфильтрован - не все элементы принадлежат структуре")
-                    
-        except Exception as e:
-            logging.error(f"Error executing template search for {pattern_type}: {str(e)}")
-                
+                    continue
+                if main_type.is_common_edge():
+                    kind += "_edge"
+                    main_alias = "_main_edge"
+                elif main_type.is_arc():
+                    main_alias = "_main_arc"
+                else:
+                    continue
+                quintuples[kind].append({"type": kind, "elements": {
+                    "_source": node, main_alias: main, "_target": result.get("_target"),
+                    "_rel_arc": result.get("_rel_arc"), "_relation": relation
+                }})
+        
+        patterns = triples
+        for kind_patterns in quintuples.values():
+            patterns.extend(kind_patterns)
         return patterns
 
-    def all_pattern_elements_belong_to_structure(self, pattern: dict, structure: ScAddr) -> bool:
+    def all_pattern_elements_belong_to_structure(self, pattern: dict, structure: ScAddr,
+                                                 structure_members: Optional[Set[int]] = None) -> bool:
         """Проверяет, что все элементы паттерна (ноды и дуги) принадлежат структуре"""
         try:
             for alias, element in pattern["elements"].items():
                 if element and element.is_valid():
-                    if not self.element_belongs_to_structure(element, structure):
+                    if not self.element_belongs_to_structure(element, structure, structure_members):
                         logging.debug(f"Элемент {alias} не принадлежит структуре: {element.value}")
                         return False
             return True
@@ -309,8 +389,11 @@ class GeometrySearchAgent(ScAgentClassic):
             logging.error(f"Error checking pattern elements belonging: {str(e)}")
             return False
 
-    def element_belongs_to_structure(self, element: ScAddr, structure: ScAddr) -> bool:
-        """Проверяет, что элемент принадлежит структуре"""
+    def element_belongs_to_structure(self, element: ScAddr, structure: ScAddr,
+                                     structure_members: Optional[Set[int]] = None) -> bool:
+        """Проверяет, что элемент принадлежит структуре (по снимку её элементов, если он передан)"""
+        if structure_members is not None:
+            return element.value in structure_members
         try:
             template = ScTemplate()
             template.triple(
@@ -325,6 +408,20 @@ class GeometrySearchAgent(ScAgentClassic):
             logging.error(f"Error checking element belonging: {str(e)}")
             return False
 
+    def get_structure_members(self, structure: ScAddr) -> Optional[Set[int]]:
+        """Адреса всех элементов структуры (ноды, дуги, ссылки) одним поиском; None - проверять запросами"""
+        try:
+            template = ScTemplate()
+            template.triple(
+                structure,
+                sc_type.VAR_PERM_POS_ARC >> "_arc",
+                sc_type.UNKNOWN >> "_element"
+            )
+            return {result.get("_element").value for result in search_by_template(template)}
+        except Exception as e:
+            logging.error(f"Error getting structure members: {str(e)}")
+            return None
+
     def log_pattern_elements(self, patterns: list):
         """Логирует системные идентификаторы и типы элементов паттернов"""
         for pattern in patterns:
@@ -356,6 +453,21 @@ class GeometrySearchAgent(ScAgentClassic):
         else:
             return "unknown"
 
+    def get_required_pattern_elements(self, patterns: list) -> list:
+        """Ноды паттернов, которые check_pattern_in_candidate ищет в кандидате буквально (именованные, не CONST_NODE)"""
+        required = []
+        for pattern in patterns:
+            for alias in ("_source", "_target", "_relation"):
+                element = pattern["elements"].get(alias)
+                if not element or not element.is_valid():
+                    continue
+                element_idtf = get_element_system_identifier(element)
+                if (not element_idtf or element_idtf.startswith("unknown_") or element_idtf.startswith("element_")
+                        or self.get_element_type(element) == sc_type.CONST_NODE):
+                    continue
+                required.append(element)
+        return required
+
     def filter_candidates_by_patterns(self, candidates: list, patterns: list) -> list:
         """Фильтрует кандидатов по найденным паттернам"""
         filtered_candidates = []
@@ -363,14 +475,27 @@ class GeometrySearchAgent(ScAgentClassic):
         try:
             logging.info(f"Фильтруем {len(candidates)} кандидатов по {len(patterns)} паттернам")
             
+            # Паттерны переводятся в ограничения один раз, кандидаты проверяются в памяти
+            local_patterns = [self.build_local_pattern(pattern) for pattern in patterns]
+            
             for candidate in candidates:
+                check_deadline()
                 candidate_structure = candidate["structure"]
-                candidate_idtf = get_element_system_identifier(candidate_structure) or f"structure_{candidate_structure.value}"
+                candidate_idtf = f"structure_{candidate_structure.value}"
                 candidate_valid = True
                 
-                # Проверяем каждый паттерн в кандидате
-                for pattern in patterns:
-                    pattern_found = self.check_pattern_in_candidate(candidate_structure, pattern)
+                try:
+                    candidate_graph = self.candidate_graphs.get(candidate_structure)
+                except Exception as e:
+                    logging.error(f"Error loading candidate structure {candidate_structure.value}: {str(e)}")
+                    candidate_graph = None
+                
+                # Проверяем каждый паттерн в кандидате; без локального ответа - поиском по шаблону
+                for pattern, local_pattern in zip(patterns, local_patterns):
+                    pattern_found = candidate_graph.match(local_pattern) if candidate_graph is not None else None
+                    if pattern_found is None:
+                        check_deadline()
+                        pattern_found = self.check_pattern_in_candidate(candidate_structure, pattern)
                     if not pattern_found:
                         candidate_valid = False
                         logging.debug(f"Кандидат {candidate_idtf} отсеян по паттерну {pattern['type']}")
@@ -397,46 +522,11 @@ class GeometrySearchAgent(ScAgentClassic):
                     not alias.endswith("_arc") and 
                     alias not in ["_main_arc", "_rel_arc", '_main_edge']):
                     
-                    element_idtf = get_element_system_identifier(element)
-                    logging.info(f"Ищем ноду в паттерне: {alias} = {element_idtf}")
-                    
-                    # Если нода безымянная, используем переменную ноду того же типа
-                    if not element_idtf or element_idtf.startswith("unknown_") or element_idtf.startswith("element_") or get_elements_types(element)[0] == sc_type.CONST_NODE:
-                        element_type = self.get_element_type(element)
-                        
-                        if element_type.is_node():
-                            if element_type.is_const():
-                                if element_type == sc_type.CONST_NODE_CLASS:
-                                    logging.error("JHGLKFLKSFLSKJDFLSKJFLD")
-                                    check_template.triple(
-                                        candidate_structure,
-                                        sc_type.VAR_PERM_POS_ARC >> f"_struct_arc_{alias}",
-                                        sc_type.VAR_NODE_CLASS >> f"_var_node_{alias}" 
-                                    )
-                                else:
-                                    check_template.triple(
-                                        candidate_structure,
-                                        sc_type.VAR_PERM_POS_ARC >> f"_struct_arc_{alias}",
-                                        sc_type.VAR_NODE >> f"_var_node_{alias}"  
-                                    )
-                            else:
-                                check_template.triple(
-                                    candidate_structure,
-                                    sc_type.VAR_PERM_POS_ARC >> f"_struct_arc_{alias}",
-                                    sc_type.VAR_NODE >> f"_var_node_{alias}"  
-                                )
-                        else:
-                            check_template.triple(
-                                candidate_structure,
-                                sc_type.VAR_PERM_POS_ARC >> f"_struct_arc_{alias}",
-                                sc_type.VAR_NODE >> f"_var_node_{alias}" 
-                            )
-                    else:
-                        check_template.triple(
-                            candidate_structure,
-                            sc_type.VAR_PERM_POS_ARC >> f"_struct_arc_{alias}",
-                            element
-                        )
+                    check_template.triple(
+                        candidate_structure,
+                        sc_type.VAR_PERM_POS_ARC >> f"_struct_arc_{alias}",
+                        self.get_membership_term(element, alias)
+                    )
         
             if pattern["type"].startswith("triple"):
                 self.reconstruct_triple_pattern_with_variable_elements(check_template, pattern)
@@ -459,6 +549,46 @@ class GeometrySearchAgent(ScAgentClassic):
             return False
     
 
+    def get_membership_term(self, element: ScAddr, alias: str):
+        """Элемент паттерна, который должен принадлежать кандидату: безымянная нода или CONST_NODE - переменная того же типа"""
+        element_idtf = get_element_system_identifier(element)
+        element_type = self.get_element_type(element)
+        logging.debug(f"Ищем ноду в паттерне: {alias} = {element_idtf}")
+        
+        if (not element_idtf or element_idtf.startswith("unknown_") or element_idtf.startswith("element_")
+                or element_type == sc_type.CONST_NODE):
+            if element_type == sc_type.CONST_NODE_CLASS:
+                return sc_type.VAR_NODE_CLASS >> f"_var_node_{alias}"
+            return sc_type.VAR_NODE >> f"_var_node_{alias}"
+        return element
+
+    def build_local_pattern(self, pattern: dict) -> LocalPattern:
+        """Паттерн в виде ограничений для локального сопоставления - по тем же правилам, что и шаблон проверки"""
+        local_pattern = LocalPattern(pattern["type"])
+        terms = {}
+        for alias in ("_source", "_target", "_relation"):
+            element = pattern["elements"].get(alias)
+            if not element or not element.is_valid():
+                continue
+            membership = self.get_membership_term(element, alias)
+            if isinstance(membership, tuple):
+                local_pattern.variables[membership[1]] = membership[0]
+            else:
+                local_pattern.members.append(membership)
+            term = self.get_element_for_reconstruction(element, alias)
+            terms[alias] = term[1] if isinstance(term, tuple) else term
+        
+        source, target, relation = terms.get("_source"), terms.get("_target"), terms.get("_relation")
+        if pattern["type"].startswith("triple") and source and target:
+            local_pattern.connector = (source, sc_type.VAR_PERM_POS_ARC, target, None)
+        elif pattern["type"].startswith("quintuple") and source and target and relation:
+            main_arc = pattern["elements"].get("_main_arc") or pattern["elements"].get("_main_edge")
+            main_arc_type = sc_type.VAR_COMMON_ARC
+            if main_arc and self.get_element_type(main_arc) == sc_type.CONST_COMMON_EDGE:
+                main_arc_type = sc_type.VAR_COMMON_EDGE
+            local_pattern.connector = (source, main_arc_type, target, relation)
+        return local_pattern
+
     def log_found_pattern_in_candidate(self, candidate_structure: ScAddr, pattern: dict, search_result):
         """Логирует найденный паттерн в структуре-кандидате с идентификаторами нод"""
         try:
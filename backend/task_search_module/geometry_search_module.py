@@ -2,16 +2,21 @@
 Module for geometry search agents
 """
 
+from typing import Optional
 from sc_kpm import ScModule
 from .geometry_search_agent import GeometrySearchAgent
 from .geometry_sequence_extractor_agent import GeometrySequenceExtractorAgent
 from .geometry_sequence_parser_agent import GeometrySequenceParserAgent
+from .geometry_pipeline_agent import GeometryPipelineAgent
 
 
 class GeometrySearchModule(ScModule):
-    def __init__(self):
+    def __init__(self, worker_id: Optional[int] = None):
+        search_agent = GeometrySearchAgent(worker_id)
+        extractor_agent = GeometrySequenceExtractorAgent(worker_id)
         super().__init__(
-            GeometrySearchAgent(),
-            GeometrySequenceExtractorAgent(),
-            GeometrySequenceParserAgent()
+            search_agent,
+            extractor_agent,
+            GeometrySequenceParserAgent(worker_id),
+            GeometryPipelineAgent(search_agent, extractor_agent, worker_id)
         )
\ No newline at end of file
@@ -3,12 +3,15 @@ Agent for extracting action sequences from geometry tasks
 """
 
 import logging
+from typing import Optional
 from sc_client.models import ScAddr
 from sc_client.constants import sc_type
 from sc_client.client import search_by_template
 from sc_client.models import ScTemplate
 
-from sc_kpm import ScAgentClassic, ScResult, ScKeynodes
+from sc_kpm import ScResult, ScKeynodes
+from .worker_routing import RoutedScAgent
+from .action_deadline import check_deadline
 from sc_kpm.utils import generate_node, get_element_system_identifier, generate_connector
 from sc_kpm.utils.action_utils import (
     generate_action_result,
@@ -21,9 +24,9 @@ logging.basicConfig(
 )
 
 
-class GeometrySequenceExtractorAgent(ScAgentClassic):
-    def __init__(self):
-        super().__init__("action_extract_geometry_sequence")
+class GeometrySequenceExtractorAgent(RoutedScAgent):
+    def __init__(self, worker_id: Optional[int] = None):
+        super().__init__("action_extract_geometry_sequence", worker_id)
 
     def on_event(self, action_class: ScAddr, arc: ScAddr, action: ScAddr) -> ScResult:
         result = self.run(action)
@@ -51,32 +54,10 @@ class GeometrySequenceExtractorAgent(ScAgentClassic):
                 logging.error("No task node found in the structure")
                 return ScResult.ERROR
             
-            logging.info(f"=== НАЧАЛО ИЗВЛЕЧЕНИЯ ПОСЛЕДОВАТЕЛЬНОСТИ ===")
-            logging.info(f"Входная задача: {geometry_task.value}")
-            
-            # Шаг 1: Ищем ноду CONST_NODE_TUPLE через отношение nrel_decomposition_of_action
-            tuple_node = self.find_tuple_node_for_task(geometry_task)
-            if not tuple_node:
-                logging.error("No tuple node found for the task")
+            sequence = self.extract_sequence(geometry_task)
+            if sequence is None:
                 return ScResult.ERROR
-                
-            logging.info(f"Найдена нода кортежа: {tuple_node.value}")
-            
-            # Шаг 2: Идём от кортежа к первой ноде через rrel_1
-            first_node = self.get_node_by_role_relation(tuple_node, 1)
-            if not first_node:
-                logging.error("No first node found via rrel_1")
-                return ScResult.ERROR
-                
-            logging.info(f"Найдена первая нода последовательности: {first_node.value}")
-            
-            # Шаг 3: Собираем всю последовательность через nrel_basic_sequence
-            sequence_nodes, sequence_connections, nrel_sequence = self.collect_sequence(first_node)
-
-            logging.info(f"Собрано нод в последовательности: {len(sequence_nodes)}")
-            for i, node in enumerate(sequence_nodes):
-                node_idtf = get_element_system_identifier(node) or f"unknown_{node.value}"
-                logging.info(f"  {i+1}. {node_idtf}")
+            sequence_nodes, sequence_connections, nrel_sequence = sequence
 
             # Шаг 4: Создаем результирующую структуру
             solving_sequence = self.create_result_structure(sequence_nodes, sequence_connections, nrel_sequence)
@@ -90,6 +71,40 @@ class GeometrySequenceExtractorAgent(ScAgentClassic):
             logging.error(f"Error in GeometrySequenceExtractorAgent: {str(e)}")
             return ScResult.ERROR
 
+    def extract_sequence(self, geometry_task: ScAddr) -> Optional[tuple]:
+        """
+        Извлекает последовательность решения задачи: ноды по порядку, элементы связей
+        и nrel_basic_sequence (или None). None - у задачи нет декомпозиции
+        """
+        logging.info(f"=== НАЧАЛО ИЗВЛЕЧЕНИЯ ПОСЛЕДОВАТЕЛЬНОСТИ ===")
+        logging.info(f"Входная задача: {geometry_task.value}")
+        
+        # Шаг 1: Ищем ноду CONST_NODE_TUPLE через отношение nrel_decomposition_of_action
+        tuple_node = self.find_tuple_node_for_task(geometry_task)
+        if not tuple_node:
+            logging.error("No tuple node found for the task")
+            return None
+            
+        logging.info(f"Найдена нода кортежа: {tuple_node.value}")
+        
+        # Шаг 2: Идём от кортежа к первой ноде через rrel_1
+        first_node = self.get_node_by_role_relation(tuple_node, 1)
+        if not first_node:
+            logging.error("No first node found via rrel_1")
+            return None
+            
+        logging.info(f"Найдена первая нода последовательности: {first_node.value}")
+        
+        # Шаг 3: Собираем всю последовательность через nrel_basic_sequence
+        sequence_nodes, sequence_connections, nrel_sequence = self.collect_sequence(first_node)
+
+        logging.info(f"Собрано нод в последовательности: {len(sequence_nodes)}")
+        for i, node in enumerate(sequence_nodes):
+            node_idtf = get_element_system_identifier(node) or f"unknown_{node.value}"
+            logging.info(f"  {i+1}. {node_idtf}")
+        
+        return sequence_nodes, sequence_connections, nrel_sequence
+
     def extract_task_from_structure(self, structure: ScAddr) -> ScAddr:
         """Извлекает ноду задачи из структуры (структура -> нода задачи)"""
         try:
@@ -189,6 +204,7 @@ class GeometrySequenceExtractorAgent(ScAgentClassic):
             nrel_basic_sequence = ScKeynodes.resolve("nrel_basic_sequence", sc_type.CONST_NODE_NON_ROLE)
             
             while current_node:
+                check_deadline()
                 # Добавляем текущую ноду в последовательность
                 sequence_nodes.append(current_node)
                 
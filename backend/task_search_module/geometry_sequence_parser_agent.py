@@ -4,6 +4,7 @@ Agent for parsing geometry sequence results to JSON format - WORKING VERSION WIT
 
 import json
 import logging
+from typing import Optional
 import time
 from sc_client.models import ScAddr
 from sc_client.constants import sc_type
@@ -11,7 +12,10 @@ from sc_client.client import search_by_template, get_elements_types
 from sc_client.models import ScTemplate
 from sc_client.models import ScLinkContent, ScLinkContentType
 
-from sc_kpm import ScAgentClassic, ScResult, ScKeynodes
+from sc_kpm import ScResult, ScKeynodes
+from .worker_routing import RoutedScAgent
+from .transient import mark_transient
+from .action_deadline import check_deadline
 from sc_kpm.utils import get_element_system_identifier, generate_link
 from sc_kpm.utils.action_utils import (
     generate_action_result,
@@ -24,9 +28,9 @@ logging.basicConfig(
 )
 
 
-class GeometrySequenceParserAgent(ScAgentClassic):
-    def __init__(self):
-        super().__init__("action_parse_geometry_sequence")
+class GeometrySequenceParserAgent(RoutedScAgent):
+    def __init__(self, worker_id: Optional[int] = None):
+        super().__init__("action_parse_geometry_sequence", worker_id)
         self.parser = GeometrySequenceParser()
 
     def on_event(self, action_class: ScAddr, arc: ScAddr, action: ScAddr) -> ScResult:
@@ -55,11 +59,12 @@ class GeometrySequenceParserAgent(ScAgentClassic):
             # Парсим структуру в JSON
             json_result = self.parser.parse_sequence_result(result_structure)
             
-            # Создаем строку с JSON результатом
-            json_string = json.dumps(json_result, ensure_ascii=False, indent=2)
+            # Компактный JSON: строка без отступов уходит в sc-link и отдаётся клиенту без пересериализации
+            json_string = json.dumps(json_result, ensure_ascii=False, separators=(",", ":"))
             
             # Создаем результат действия
             result_node = generate_link(content=json_string, content_type=ScLinkContentType.STRING)
+            mark_transient(result_node)
             
             generate_action_result(action_node, result_node)
             logging.info("=== ПАРСИНГ ПОСЛЕДОВАТЕЛЬНОСТИ ЗАВЕРШЕН ===")
@@ -128,6 +133,31 @@ class GeometrySequenceParser:
             self.logger.error(traceback.format_exc())
             return {"error": str(e)}
     
+    def parse_sequence_nodes(self, sequence_nodes: list) -> dict:
+        """
+        Парсит последовательность, уже упорядоченную извлечением (без промежуточной структуры),
+        и возвращает тот же JSON, что parse_sequence_result
+        """
+        try:
+            start_time = time.time()
+            self.logger.info("=== НАЧАЛО ПАРСИНГА ПОСЛЕДОВАТЕЛЬНОСТИ ===")
+            
+            # Порядок задан обходом nrel_basic_sequence; отбрасываем только не-шаги
+            ordered_nodes = [node for node in sequence_nodes if self.is_sequence_node(node)]
+            self.logger.info(f"Найдено нод последовательности: {len(ordered_nodes)}")
+            
+            result_json = self.create_sequence_json(ordered_nodes, None)
+            
+            total_time = time.time() - start_time
+            self.logger.info(f"=== ПАРСИНГ ПОСЛЕДОВАТЕЛЬНОСТИ ЗАВЕРШЕН за {total_time:.2f} сек ===")
+            return result_json
+            
+        except Exception as e:
+            self.logger.error(f"Error parsing sequence nodes: {str(e)}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+            return {"error": str(e)}
+    
     def get_all_elements_from_structure(self, structure: ScAddr) -> list:
         """Получает все элементы из структуры"""
         elements = []
@@ -394,7 +424,7 @@ class GeometrySequenceParser:
             
         return None
     
-    def create_sequence_json(self, ordered_nodes: list, result_structure: ScAddr) -> dict:
+    def create_sequence_json(self, ordered_nodes: list, result_structure: Optional[ScAddr]) -> dict:
         """Создает JSON структуру для последовательности"""
         result_json = {
             "idx": [],
@@ -403,6 +433,7 @@ class GeometrySequenceParser:
         
         try:
             for i, node in enumerate(ordered_nodes):
+                check_deadline()
                 step_id = f"task_step_{i+1}"
                 result_json["idx"].append(step_id)
                 
@@ -0,0 +1,227 @@
+"""
+Count-signature prefilter of search candidates
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.models import ScAddr, ScTemplate
+from sc_kpm import ScKeynodes
+from config import TASK_SIGNATURE_PREFILTER
+from .candidate_index import NREL_CONTEXT, TaskCandidateIndex
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: без него строки сравниваются в цикле
+    np = None
+
+# Измерение сигнатуры: ("class", класс) - сколько членов структуры принадлежат классу,
+# ("relation", отношение) - сколько связок между членами помечено отношением
+SignatureKey = Tuple[str, int]
+
+
+class TaskSignatures:
+    """
+    Сигнатуры структур задач: векторы чисел элементов по классам понятий и отношениям,
+    все в одной матрице (строка - структура, столбец - измерение).
+
+    Кандидат, у которого по какому-то измерению меньше элементов, чем требует входная
+    структура, отбрасывается одним сравнением матрицы с вектором входа до проверок
+    паттернов. Режим presence требует только наличия (не меньше одного) - ровно то,
+    что проверка паттернов требует и сама; counts требует ещё столько элементов,
+    сколько различных конкретных элементов во входе; off отключает отсев.
+    Матрица пересчитывается тремя поисками по шаблону, когда меняется индекс задач.
+    """
+
+    def __init__(self, index: TaskCandidateIndex, mode: str = TASK_SIGNATURE_PREFILTER):
+        self.index = index
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._rows: Dict[int, int] = {}
+        self._columns: Dict[SignatureKey, int] = {}
+        self._matrix = None
+
+        self.dropped = 0
+
+    def prefilter(self, candidates: List[dict], required: Dict[SignatureKey, int]) -> List[dict]:
+        """Оставляет кандидатов, сигнатура которых поэлементно не меньше required"""
+        if self.mode == "off" or not required or not candidates:
+            return candidates
+        if self.mode == "presence":
+            required = {key: 1 for key in required}
+        with self._lock:
+            self._ensure_built()
+            rows, columns, matrix = self._rows, self._columns, self._matrix
+        # Измерения, которого нет ни у одной задачи, не даст ни один кандидат
+        if any(key not in columns for key in required):
+            self.dropped += len(candidates)
+            return []
+
+        indexed = [(candidate, rows[candidate["structure"].value]) for candidate in candidates
+                   if candidate["structure"].value in rows]
+        if not indexed:
+            self.dropped += len(candidates)
+            return []
+        selected_columns = [columns[key] for key in required]
+        needed = list(required.values())
+        if np is not None:
+            row_ids = np.fromiter((row for _, row in indexed), dtype=np.intp, count=len(indexed))
+            passed = (matrix[np.ix_(row_ids, selected_columns)] >= np.asarray(needed, dtype=matrix.dtype)).all(axis=1)
+        else:
+            passed = [
+                all(matrix[row][column] >= count for column, count in zip(selected_columns, needed))
+                for _, row in indexed
+            ]
+        result = [candidate for (candidate, _), ok in zip(indexed, passed) if ok]
+        self.dropped += len(candidates) - len(result)
+        return result
+
+    @staticmethod
+    def input_signature(structure: ScAddr, structure_members: Set[int],
+                        is_concrete: Callable[[ScAddr], bool],
+                        is_fixed: Callable[[ScAddr], bool]) -> Dict[SignatureKey, int]:
+        """
+        Сигнатура входной структуры. Считаются только связи, которые станут паттернами
+        (все их элементы в структуре), и только конкретные классы и отношения
+        (is_concrete): безымянные при проверке заменяются переменными.
+        Паттерны проверяются независимо, и разные переменные (точки, числа, меры) могут
+        совпасть с одним элементом кандидата. Поэтому нижняя граница - число различных
+        конкретных членов класса (is_concrete) и различных пар конкретных концов связок
+        отношения (is_fixed), но не меньше одного
+        """
+        concrete: Dict[int, bool] = {}
+        fixed: Dict[int, bool] = {}
+
+        def cached(check: Callable[[ScAddr], bool], memo: Dict[int, bool], element: ScAddr) -> bool:
+            if element.value not in memo:
+                memo[element.value] = check(element)
+            return memo[element.value]
+
+        classes: Dict[int, Dict[int, ScAddr]] = {}
+        class_addrs: Dict[int, ScAddr] = {}
+        template = ScTemplate()
+        template.triple(structure, sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE_CLASS >> "_class")
+        template.triple("_class", sc_type.VAR_PERM_POS_ARC >> "_arc", sc_type.VAR_NODE >> "_member")
+        template.triple(structure, sc_type.VAR_PERM_POS_ARC, "_member")
+        for result in client.search_by_template(template):
+            if result.get("_arc").value in structure_members:
+                class_addr = result.get("_class")
+                class_addrs[class_addr.value] = class_addr
+                member = result.get("_member")
+                classes.setdefault(class_addr.value, {})[member.value] = member
+
+        relations: Dict[int, Set[int]] = {}
+        relation_addrs: Dict[int, ScAddr] = {}
+        connector_addrs: Dict[int, ScAddr] = {}
+        connector_ends: Dict[int, Tuple[ScAddr, ScAddr]] = {}
+        template = ScTemplate()
+        template.triple(structure, sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_source")
+        template.triple("_source", sc_type.VAR_CONNECTOR >> "_connector", sc_type.VAR_NODE >> "_target")
+        template.triple(structure, sc_type.VAR_PERM_POS_ARC, "_target")
+        template.triple(sc_type.VAR_NODE >> "_relation", sc_type.VAR_PERM_POS_ARC >> "_rel_arc", "_connector")
+        template.triple(structure, sc_type.VAR_PERM_POS_ARC, "_relation")
+        for result in client.search_by_template(template):
+            connector, rel_arc = result.get("_connector"), result.get("_rel_arc")
+            if connector.value in structure_members and rel_arc.value in structure_members:
+                relation = result.get("_relation")
+                relation_addrs[relation.value] = relation
+                connector_addrs[connector.value] = connector
+                connector_ends[connector.value] = (result.get("_source"), result.get("_target"))
+                relations.setdefault(relation.value, set()).add(connector.value)
+
+        # Паттерны-пятёрки строятся только для ролевых и не-ролевых отношений над дугами и рёбрами
+        if relations:
+            addrs = list(relation_addrs.values()) + list(connector_addrs.values())
+            types = dict(zip((addr.value for addr in addrs), client.get_elements_types(*addrs)))
+            for relation, connectors in list(relations.items()):
+                connectors = {connector for connector in connectors
+                              if types[connector].is_arc() or types[connector].is_common_edge()}
+                if not (types[relation].is_role() or types[relation].is_non_role()) or not connectors:
+                    del relations[relation]
+                else:
+                    relations[relation] = connectors
+
+        signature: Dict[SignatureKey, int] = {}
+        for value, members in classes.items():
+            if cached(is_concrete, concrete, class_addrs[value]):
+                distinct = sum(1 for member in members.values() if cached(is_concrete, concrete, member))
+                signature[("class", value)] = max(1, distinct)
+        for value, connectors in relations.items():
+            if cached(is_concrete, concrete, relation_addrs[value]):
+                pairs = set()
+                for connector in connectors:
+                    source, target = connector_ends[connector]
+                    if cached(is_fixed, fixed, source) and cached(is_fixed, fixed, target):
+                        pair = (source.value, target.value)
+                        # Ребро с теми же концами в обратном порядке - та же пара
+                        pairs.add(tuple(sorted(pair)) if types[connector].is_common_edge() else pair)
+                signature[("relation", value)] = max(1, len(pairs))
+        return signature
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "structures": len(self._rows),
+                "dimensions": len(self._columns),
+                "vectorized": np is not None,
+                "dropped": self.dropped
+            }
+
+    # --- Построение матрицы (вызывается под self._lock) ---
+    def _ensure_built(self) -> None:
+        if self._version == self.index.version and self._matrix is not None:
+            return
+        version = self.index.version
+        counts = self._count_all()
+        rows = {structure: row for row, structure in enumerate({structure for structure, _ in counts})}
+        columns = {key: column for column, key in enumerate(sorted({key for _, key in counts}))}
+        if np is not None:
+            matrix = np.zeros((len(rows), len(columns)), dtype=np.int32)
+            for (structure, key), count in counts.items():
+                matrix[rows[structure], columns[key]] = count
+        else:
+            matrix = [[0] * len(columns) for _ in rows]
+            for (structure, key), count in counts.items():
+                matrix[rows[structure]][columns[key]] = count
+        self._rows, self._columns, self._matrix, self._version = rows, columns, matrix, version
+        logging.info(f"Task signatures built: {len(rows)} structures x {len(columns)} dimensions")
+
+    @staticmethod
+    def _count_all() -> Dict[Tuple[int, SignatureKey], int]:
+        """Числа элементов по классам и отношениям для всех структур задач"""
+        nrel_context = ScKeynodes.resolve(NREL_CONTEXT, sc_type.CONST_NODE_NON_ROLE)
+
+        def task_structures() -> ScTemplate:
+            template = ScTemplate()
+            template.quintuple(
+                sc_type.VAR_NODE,
+                sc_type.VAR_COMMON_ARC,
+                sc_type.VAR_NODE_STRUCTURE >> "_structure",
+                sc_type.VAR_PERM_POS_ARC,
+                nrel_context
+            )
+            return template
+
+        items: Dict[Tuple[int, SignatureKey], Set[int]] = {}
+        template = task_structures()
+        template.triple("_structure", sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE_CLASS >> "_class")
+        template.triple("_class", sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_member")
+        template.triple("_structure", sc_type.VAR_PERM_POS_ARC, "_member")
+        for result in client.search_by_template(template):
+            key = (result.get("_structure").value, ("class", result.get("_class").value))
+            items.setdefault(key, set()).add(result.get("_member").value)
+
+        template = task_structures()
+        template.triple("_structure", sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_source")
+        template.triple("_source", sc_type.VAR_CONNECTOR >> "_connector", sc_type.VAR_NODE >> "_target")
+        template.triple("_structure", sc_type.VAR_PERM_POS_ARC, "_target")
+        template.triple(sc_type.VAR_NODE >> "_relation", sc_type.VAR_PERM_POS_ARC, "_connector")
+        for result in client.search_by_template(template):
+            key = (result.get("_structure").value, ("relation", result.get("_relation").value))
+            items.setdefault(key, set()).add(result.get("_connector").value)
+
+        return {key: len(elements) for key, elements in items.items()}
@@ -0,0 +1,245 @@
+"""
+In-memory matching of search patterns against candidate task structures
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.constants.common import ScEventType
+from sc_client.constants.sc_type import ScType
+from sc_client.models import ScAddr, ScEventSubscriptionParams, ScTemplate
+from sc_kpm import ScResult
+from config import TASK_GRAPH_CACHE_SIZE, TASK_INDEX_REBUILD_INTERVAL
+
+_CONSTANCY_MASK = sc_type.CONST.value | sc_type.VAR.value
+
+# Терм паттерна: конкретный элемент или имя переменной
+Term = Union[ScAddr, str]
+
+
+def type_matches(element_type: ScType, template_type: ScType) -> bool:
+    """Подходит ли тип элемента под тип из шаблона (биты типа шаблона без константности)"""
+    mask = template_type.value & ~_CONSTANCY_MASK
+    return element_type.value & mask == mask
+
+
+@dataclass
+class LocalPattern:
+    """
+    Паттерн поиска в виде ограничений на структуру-кандидат - то же, что проверяет
+    шаблон check_pattern_in_candidate:
+    variables - переменные (имя -> тип), связываемые с узлами-членами кандидата;
+    members - конкретные элементы, которые должны быть членами кандидата;
+    connector - связка (начало, тип коннектора, конец, отношение или None); None - без связки.
+    """
+    type: str
+    variables: Dict[str, ScType] = field(default_factory=dict)
+    members: List[ScAddr] = field(default_factory=list)
+    connector: Optional[Tuple[Term, ScType, Term, Optional[Term]]] = None
+
+
+class CandidateGraph:
+    """
+    Структура-кандидат в памяти: узлы-члены с типами и коннекторы между ними
+    (принадлежат ли сами коннекторы структуре - не важно, как и в шаблоне),
+    смежность по началу коннектора (рёбра - в обе стороны) и отношения коннекторов.
+    """
+
+    def __init__(self, members: Dict[int, ScType], connectors: List[Tuple[int, int, int, ScType]],
+                 relations: Dict[int, Set[int]]):
+        self.members = members
+        self.relations = relations
+        self.outgoing: Dict[int, List[Tuple[int, int, ScType]]] = {}
+        for connector, source, target, connector_type in connectors:
+            self.outgoing.setdefault(source, []).append((connector, target, connector_type))
+            if connector_type.is_common_edge():
+                self.outgoing.setdefault(target, []).append((connector, source, connector_type))
+        self._by_type: Dict[int, List[int]] = {}
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, structure: ScAddr) -> "CandidateGraph":
+        """Читает структуру тремя поисками по шаблону и одним запросом типов"""
+        members_template = ScTemplate()
+        members_template.triple(structure, sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_member")
+        members = {result.get("_member").value: result.get("_member")
+                   for result in client.search_by_template(members_template)}
+
+        connectors_template = ScTemplate()
+        connectors_template.triple(structure, sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_source")
+        connectors_template.triple("_source", sc_type.VAR_CONNECTOR >> "_connector", sc_type.VAR_NODE >> "_target")
+        connectors_template.triple(structure, sc_type.VAR_PERM_POS_ARC, "_target")
+        found = {}
+        for result in client.search_by_template(connectors_template):
+            connector = result.get("_connector")
+            found.setdefault(connector.value, (connector, result.get("_source").value, result.get("_target").value))
+
+        relations: Dict[int, Set[int]] = {}
+        if found:
+            relations_template = ScTemplate()
+            relations_template.triple(structure, sc_type.VAR_PERM_POS_ARC, sc_type.VAR_NODE >> "_source")
+            relations_template.triple("_source", sc_type.VAR_CONNECTOR >> "_connector", sc_type.VAR_NODE >> "_target")
+            relations_template.triple(structure, sc_type.VAR_PERM_POS_ARC, "_target")
+            relations_template.triple(sc_type.VAR_NODE >> "_relation", sc_type.VAR_PERM_POS_ARC, "_connector")
+            for result in client.search_by_template(relations_template):
+                relations.setdefault(result.get("_connector").value, set()).add(result.get("_relation").value)
+
+        addrs = list(members.values()) + [connector for connector, _, _ in found.values()]
+        types = client.get_elements_types(*addrs) if addrs else []
+        member_types = {addr.value: addr_type for addr, addr_type in zip(members.values(), types)}
+        connector_types = types[len(members):]
+        connectors = [
+            (value, source, target, connector_type)
+            for (value, (_, source, target)), connector_type in zip(found.items(), connector_types)
+        ]
+        return cls(member_types, connectors, relations)
+
+    def match(self, pattern: LocalPattern) -> Optional[bool]:
+        """
+        Есть ли паттерн в кандидате; None - связку нельзя проверить локально
+        (её конкретный конец не член кандидата), нужен поиск по шаблону.
+        Перебор как в VF2: кандидаты для конца связки берутся из смежности
+        уже связанного начала, а не из всех членов.
+        """
+        for member in pattern.members:
+            if member.value not in self.members:
+                return False
+        for variable_type in pattern.variables.values():
+            if not self._domain(variable_type):
+                return False
+        if pattern.connector is None:
+            return True
+
+        source, connector_type, target, relation = pattern.connector
+        for term in (source, target):
+            if isinstance(term, str):
+                if term not in pattern.variables:
+                    return None
+            elif term.value not in self.members:
+                return None
+        if isinstance(relation, str) and relation not in pattern.variables:
+            return None
+
+        for source_value in self._candidates(source, pattern):
+            for connector, target_value, found_type in self.outgoing.get(source_value, ()):
+                if not type_matches(found_type, connector_type) or not self._accepts(target, target_value, pattern):
+                    continue
+                if relation is None:
+                    return True
+                for relation_value in self.relations.get(connector, ()):
+                    if self._accepts(relation, relation_value, pattern):
+                        return True
+        return False
+
+    def _candidates(self, term: Term, pattern: LocalPattern) -> List[int]:
+        if isinstance(term, str):
+            return self._domain(pattern.variables[term])
+        return [term.value]
+
+    def _accepts(self, term: Term, value: int, pattern: LocalPattern) -> bool:
+        if isinstance(term, str):
+            member_type = self.members.get(value)
+            return member_type is not None and type_matches(member_type, pattern.variables[term])
+        return term.value == value
+
+    def _domain(self, variable_type: ScType) -> List[int]:
+        domain = self._by_type.get(variable_type.value)
+        if domain is None:
+            domain = [value for value, member_type in self.members.items() if type_matches(member_type, variable_type)]
+            self._by_type[variable_type.value] = domain
+        return domain
+
+
+class CandidateGraphCache:
+    """
+    Загруженные структуры-кандидаты, общие для запросов (не более max_entries, LRU).
+    Запись сбрасывается событием появления или удаления дуги из структуры
+    и не живёт дольше TASK_INDEX_REBUILD_INTERVAL (коннекторы между членами
+    могут меняться без изменения самой структуры).
+    """
+
+    def __init__(self, max_entries: int = TASK_GRAPH_CACHE_SIZE, ttl: float = TASK_INDEX_REBUILD_INTERVAL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._graphs: "OrderedDict[int, CandidateGraph]" = OrderedDict()
+        self._subscriptions: Dict[int, list] = {}
+        # Подписки сброшенных записей: удаляются вне потока событий
+        self._released: list = []
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, structure: ScAddr) -> CandidateGraph:
+        self._destroy_released()
+        with self._lock:
+            graph = self._graphs.get(structure.value)
+            if graph is not None and (self.ttl <= 0 or time.monotonic() - graph.loaded_at < self.ttl):
+                self._graphs.move_to_end(structure.value)
+                self.hits += 1
+                return graph
+            self.misses += 1
+        graph = CandidateGraph.load(structure)
+        if self.max_entries <= 0:
+            return graph
+        subscriptions = self._subscribe(structure)
+        with self._lock:
+            self._release(structure.value)
+            self._graphs[structure.value] = graph
+            self._subscriptions[structure.value] = subscriptions
+            while len(self._graphs) > self.max_entries:
+                self._release(next(iter(self._graphs)))
+        return graph
+
+    def clear(self) -> None:
+        with self._lock:
+            for value in list(self._graphs):
+                self._release(value)
+        self._destroy_released()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._graphs),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
+
+    def _subscribe(self, structure: ScAddr) -> list:
+        try:
+            return client.create_elementary_event_subscriptions(
+                ScEventSubscriptionParams(structure, ScEventType.AFTER_GENERATE_OUTGOING_ARC, self._on_structure_changed),
+                ScEventSubscriptionParams(structure, ScEventType.BEFORE_ERASE_OUTGOING_ARC, self._on_structure_changed)
+            )
+        except Exception as e:
+            logging.warning(f"Structure {structure.value} is cached without change events: {e}")
+            return []
+
+    def _release(self, value: int) -> None:
+        """Убирает запись (вызывается под self._lock)"""
+        self._graphs.pop(value, None)
+        self._released.extend(self._subscriptions.pop(value, []))
+
+    def _destroy_released(self) -> None:
+        with self._lock:
+            released, self._released = self._released, []
+        if released and client.is_connected():
+            try:
+                client.destroy_elementary_event_subscriptions(*released)
+            except Exception as e:
+                logging.warning(f"Error destroying structure subscriptions: {e}")
+
+    def _on_structure_changed(self, structure: ScAddr, _arc: ScAddr, _element: ScAddr) -> ScResult:
+        with self._lock:
+            if structure.value in self._graphs:
+                self.invalidations += 1
+                self._release(structure.value)
+        return ScResult.OK
@@ -0,0 +1,23 @@
+"""
+Marking of temporary elements created by agents
+"""
+
+from sc_client.client import generate_elements
+from sc_client.constants import sc_type
+from sc_client.models import ScAddr, ScConstruction
+from sc_kpm import ScKeynodes
+
+# Совпадает с services.sc_garbage_collector
+TRANSIENT_CLASS = "concept_transient_element"
+
+
+def mark_transient(*elements: ScAddr) -> None:
+    """
+    Помечает созданные агентом элементы (ссылки-результаты) временными:
+    сборщик удаляет из результатов действия только помеченные ссылки
+    """
+    transient_class = ScKeynodes.resolve(TRANSIENT_CLASS, sc_type.CONST_NODE_CLASS)
+    construction = ScConstruction()
+    for element in elements:
+        construction.generate_connector(sc_type.CONST_PERM_POS_ARC, transient_class, element)
+    generate_elements(construction)
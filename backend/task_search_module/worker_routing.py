@@ -0,0 +1,51 @@
+"""
+Routing of actions between several agent worker processes
+"""
+
+import logging
+from typing import Optional
+from sc_client.models import ScAddr
+from sc_client.constants import sc_type
+from sc_kpm import ScAgentClassic, ScKeynodes, ScResult
+from sc_kpm.utils.action_utils import check_action_class, finish_action_with_status
+from .action_deadline import ActionCancelled, ActionDeadline
+
+WORKER_CLASS_PREFIX = "agent_worker_"
+
+
+def worker_class_idtf(worker_id: int) -> str:
+    """Класс действий, адресованных воркеру worker_id"""
+    return f"{WORKER_CLASS_PREFIX}{worker_id}"
+
+
+class RoutedScAgent(ScAgentClassic):
+    """
+    ScAgentClassic, который в пуле воркеров обрабатывает только свои действия:
+    диспетчер добавляет действие в класс agent_worker_<id> до его инициирования.
+    Без worker_id агент обрабатывает все действия своего класса.
+
+    На время обработки срок действия становится текущим для потока (check_deadline);
+    при его истечении или отмене действие завершается неуспешно.
+    """
+
+    def __init__(self, action_class_name: str, worker_id: Optional[int] = None):
+        super().__init__(action_class_name)
+        self._worker_id = worker_id
+        self._worker_class = None
+        if worker_id is not None:
+            self._worker_class = ScKeynodes.resolve(worker_class_idtf(worker_id), sc_type.CONST_NODE_CLASS)
+
+    def _callback(self, event_element: ScAddr, event_connector: ScAddr, action_element: ScAddr) -> ScResult:
+        if self._worker_class is not None and not check_action_class(self._worker_class, action_element):
+            return ScResult.SKIP
+        # Класс действия проверяется до чтения срока: событие приходит всем агентам
+        if not check_action_class(self._action_class, action_element):
+            return ScResult.SKIP
+        self.logger.info("Confirmed action class")
+        with ActionDeadline.for_action(action_element).activate():
+            try:
+                return self.on_event(event_element, event_connector, action_element)
+            except ActionCancelled as e:
+                logging.warning(f"{type(self).__name__} stopped action {action_element.value}: {e}")
+                finish_action_with_status(action_element, False)
+                return ScResult.ERROR
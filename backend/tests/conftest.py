@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули backend импортируются так же, как при запуске main.py из этой директории
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,131 @@
+import pytest
+from sc_client.constants import sc_type
+from sc_client.models import ScAddr
+
+from task_search_module import signature_prefilter
+from task_search_module.signature_prefilter import TaskSignatures
+
+# Измерения сигнатуры: класс понятия и отношение
+TRIANGLE = ("class", 3)
+SIDE = ("relation", 4)
+
+
+class StaticIndex:
+    version = 1
+
+
+def candidates(*structures):
+    return [{"structure": ScAddr(structure)} for structure in structures]
+
+
+@pytest.fixture(params=["numpy", "loop"])
+def signatures(request, monkeypatch):
+    """
+    Матрица задана вручную: структура 20 - 2 треугольника и 1 связка стороны,
+    21 - 1 треугольник, 22 - 3 треугольника и 2 связки
+    """
+    rows = [[2, 1], [1, 0], [3, 2]]
+    if request.param == "numpy":
+        np = pytest.importorskip("numpy")
+        matrix = np.array(rows, dtype=np.int32)
+    else:
+        monkeypatch.setattr(signature_prefilter, "np", None)
+        matrix = rows
+    result = TaskSignatures(StaticIndex(), mode="counts")
+    result._rows = {20: 0, 21: 1, 22: 2}
+    result._columns = {TRIANGLE: 0, SIDE: 1}
+    result._matrix = matrix
+    result._version = StaticIndex.version
+    return result
+
+
+def kept(signatures, required, structures=(20, 21, 22, 23)):
+    return [candidate["structure"].value for candidate in signatures.prefilter(candidates(*structures), required)]
+
+
+def test_counts_keeps_candidates_with_at_least_required(signatures):
+    assert kept(signatures, {TRIANGLE: 2, SIDE: 1}) == [20, 22]
+    assert kept(signatures, {TRIANGLE: 3, SIDE: 2}) == [22]
+    # Структуры 23 нет в матрице - у неё нет ни одного измерения
+    assert signatures.dropped == 2 + 3
+
+
+def test_presence_requires_only_one_element(signatures):
+    signatures.mode = "presence"
+    assert kept(signatures, {TRIANGLE: 3, SIDE: 2}) == [20, 22]
+
+
+def test_unknown_dimension_drops_everything(signatures):
+    assert kept(signatures, {("class", 77): 1}) == []
+
+
+def test_off_and_empty_signature_keep_candidates(signatures):
+    assert kept(signatures, {}) == [20, 21, 22, 23]
+    signatures.mode = "off"
+    assert kept(signatures, {TRIANGLE: 9}) == [20, 21, 22, 23]
+
+
+class Result(dict):
+    def get(self, alias):
+        return ScAddr(self[alias])
+
+
+# Входная структура 500. Класс 3 (треугольники): 101 и 102 - безымянные (переменные),
+# 110 - именованный. Класс 8: только безымянный 103. Отношение 4 над рёбрами:
+# 95 - A(10)-B(11), 96 - B(11)-A(10) (та же пара), 97 - X(12)-A(10), X - переменная
+CLASS_MEMBERS = [(3, 90, 101), (3, 91, 102), (3, 92, 110), (8, 93, 103)]
+RELATION_CONNECTORS = [(95, 10, 11), (96, 11, 10), (97, 12, 10)]
+MEMBERS = {90, 91, 92, 93, 95, 96, 97, 99}
+VARIABLES = {101, 102, 103, 12}
+
+
+def stub_search(template):
+    # Шаблон классов - три тройки, шаблон отношений - четыре
+    if len(template.triple_list) == 3:
+        return [Result(_class=cls, _arc=arc, _member=member) for cls, arc, member in CLASS_MEMBERS]
+    return [
+        Result(_connector=connector, _rel_arc=99, _relation=4, _source=source, _target=target)
+        for connector, source, target in RELATION_CONNECTORS
+    ]
+
+
+def stub_types(*addrs):
+    return [sc_type.CONST_COMMON_EDGE if addr.value in (95, 96, 97) else sc_type.CONST_NODE_NON_ROLE
+            for addr in addrs]
+
+
+@pytest.fixture
+def stubbed_client(monkeypatch):
+    monkeypatch.setattr(signature_prefilter.client, "search_by_template", stub_search)
+    monkeypatch.setattr(signature_prefilter.client, "get_elements_types", stub_types)
+
+
+def is_concrete(element: ScAddr) -> bool:
+    return element.value not in VARIABLES
+
+
+def test_input_signature_counts_distinct_concrete_elements(stubbed_client):
+    signature = TaskSignatures.input_signature(ScAddr(500), MEMBERS, is_concrete, is_concrete)
+    # Переменные члены не считаются; ребро в обратную сторону - та же пара; 97 - с переменным концом
+    assert signature == {TRIANGLE: 1, ("class", 8): 1, SIDE: 1}
+
+
+def test_input_signature_floor_is_one(stubbed_client):
+    signature = TaskSignatures.input_signature(ScAddr(500), MEMBERS, is_concrete, lambda element: False)
+    assert signature[SIDE] == 1
+    assert signature[("class", 8)] == 1
+
+
+def test_input_signature_skips_variable_kinds_and_foreign_elements(stubbed_client):
+    # Класс 3 - переменная (безымянный), дуга 93 не в структуре - класс 8 не строит паттерн
+    signature = TaskSignatures.input_signature(
+        ScAddr(500), MEMBERS - {93}, lambda element: element.value not in VARIABLES | {3}, is_concrete
+    )
+    assert signature == {SIDE: 1}
+
+
+def test_input_signature_counts_distinct_pairs(stubbed_client):
+    signature = TaskSignatures.input_signature(ScAddr(500), MEMBERS, is_concrete, lambda element: True)
+    # 95 и 96 - одно ребро A-B, 97 - X-A
+    assert signature[SIDE] == 2
+    assert signature[TRIANGLE] == 1
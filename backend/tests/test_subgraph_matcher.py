@@ -0,0 +1,54 @@
+from sc_client.constants import sc_type
+from sc_client.models import ScAddr
+
+from task_search_module.subgraph_matcher import CandidateGraph, LocalPattern
+
+# Узлы-члены кандидата и отношение
+A, B, RELATION = 1, 2, 40
+
+
+def build_graph(connector_type) -> CandidateGraph:
+    """Кандидат с одним коннектором B -> A, помеченным отношением"""
+    return CandidateGraph(
+        members={A: sc_type.CONST_NODE, B: sc_type.CONST_NODE, RELATION: sc_type.CONST_NODE_NON_ROLE},
+        connectors=[(100, B, A, connector_type)],
+        relations={100: {RELATION}}
+    )
+
+
+def triple(source: int, target: int) -> LocalPattern:
+    return LocalPattern("triple", connector=(ScAddr(source), sc_type.VAR_PERM_POS_ARC, ScAddr(target), None))
+
+
+def quintuple(source: int, connector_type, target: int) -> LocalPattern:
+    return LocalPattern("quintuple", connector=(ScAddr(source), connector_type, ScAddr(target), ScAddr(RELATION)))
+
+
+def test_perm_arc_is_matched_only_in_its_direction():
+    graph = build_graph(sc_type.CONST_PERM_POS_ARC)
+    assert graph.match(triple(B, A)) is True
+    assert graph.match(triple(A, B)) is False
+
+
+def test_common_arc_is_matched_only_in_its_direction():
+    graph = build_graph(sc_type.CONST_COMMON_ARC)
+    assert graph.match(quintuple(B, sc_type.VAR_COMMON_ARC, A)) is True
+    assert graph.match(quintuple(A, sc_type.VAR_COMMON_ARC, B)) is False
+
+
+def test_common_edge_is_matched_in_both_directions():
+    graph = build_graph(sc_type.CONST_COMMON_EDGE)
+    assert graph.match(quintuple(B, sc_type.VAR_COMMON_EDGE, A)) is True
+    assert graph.match(quintuple(A, sc_type.VAR_COMMON_EDGE, B)) is True
+
+
+def test_variable_ends_respect_arc_direction():
+    graph = build_graph(sc_type.CONST_COMMON_ARC)
+    pattern = LocalPattern(
+        "quintuple",
+        variables={"_source": sc_type.VAR_NODE, "_target": sc_type.VAR_NODE},
+        connector=("_source", sc_type.VAR_COMMON_ARC, ScAddr(A), ScAddr(RELATION))
+    )
+    assert graph.match(pattern) is True
+    pattern.connector = (ScAddr(A), sc_type.VAR_COMMON_ARC, "_target", ScAddr(RELATION))
+    assert graph.match(pattern) is False